@@ -3,6 +3,12 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Es el perfil recomendado en producción: las vistas que esperan al banco o al
+geo-ip (pedidos/pasarela.py) son async y no bloquean al resto de peticiones.
+Para levantarlo con gunicorn + uvicorn:
+
+    gunicorn core.asgi:application -c core/gunicorn_asgi.py
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -14,3 +20,15 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# El loop de uvicorn vive lo que el worker: el cliente del banco puede quedarse abierto (pool)
+from pedidos import pasarela
+
+pasarela.usar_pool_por_loop()
+
+# Cada worker carga este módulo: se calienta antes de atender al primer cliente
+from django.conf import settings
+
+if settings.CALENTAR_AL_INICIO:
+    from pedidos.arranque import calentar
+    calentar()
@@ -0,0 +1,24 @@
+# --- PERFIL DE DESPLIEGUE ASGI ---
+# gunicorn core.asgi:application -c core/gunicorn_asgi.py
+#
+# Cada worker uvicorn corre un event loop: mientras un pago espera al banco
+# (hasta BANCO_TIMEOUT) el mismo worker sigue atendiendo menú y carrito. Las
+# vistas sync (casi todas) corren en el pool de hilos de asgiref, así que no
+# hace falta subir la cantidad de workers para absorber bancos lentos.
+#
+# Con la caché por defecto (LocMem, una por proceso) va un solo worker: con
+# varios, cada uno tendría su propia versión del catálogo y de los roles.
+# Para más workers hay que configurar CACHE_BACKEND compartida (core/settings.py).
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = 'uvicorn.workers.UvicornWorker'
+cache_compartida = 'locmem' not in os.getenv('CACHE_BACKEND', 'locmem').lower()
+workers = int(os.getenv('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count() * 2) if cache_compartida else 1))
+if workers > 1 and not cache_compartida:
+    raise RuntimeError(f"WEB_CONCURRENCY={workers} necesita una CACHE_BACKEND compartida (LocMem es por proceso)")
+# Más que el timeout del banco: si el banco no responde, la vista avisa al cliente antes de que gunicorn corte
+timeout = int(float(os.getenv('BANCO_TIMEOUT', 15))) + 15
+graceful_timeout = 30
+keepalive = 5
@@ -54,8 +54,13 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # ===============================
 MIDDLEWARE = [
+    # Primero: mide la petición completa (ver pedidos/instrumentacion.py)
+    'pedidos.instrumentacion.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise que también sirve en modo async (ASGI, ver pedidos/estaticos.py)
+    'pedidos.estaticos.EstaticosMiddleware',
+    # Resuelve el restaurante por Host antes de la sesión (solo con MULTINEGOCIO)
+    'pedidos.tenencia.NegocioMiddleware',
 
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,6 +102,132 @@ DATABASES = {
     )
 }
 
+# Réplica de solo lectura para reportes, exportación e historial (ver
+# pedidos/replica.py). En local sirve un segundo archivo SQLite:
+#   DATABASE_REPLICA_URL=sqlite:///replica.sqlite3 + manage.py sincronizar_replica
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.parse(os.environ['DATABASE_REPLICA_URL'], conn_max_age=600)
+    # En las pruebas la réplica es la misma base de prueba
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['pedidos.replica.RouterReplica']
+# Segundos de atraso tolerados antes de volver al primario, y cada cuánto se mide
+REPLICA_RETRASO_MAXIMO = float(os.getenv('REPLICA_RETRASO_MAXIMO', 10))
+REPLICA_CHEQUEO_SEGUNDOS = int(os.getenv('REPLICA_CHEQUEO_SEGUNDOS', 5))
+
+# ===============================
+# CACHÉ
+# ===============================
+# LocMem es por proceso: sirve con un solo worker. Con varios procesos (más
+# workers, procesar_tareas) hace falta una caché compartida, por ejemplo
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache con
+# CACHE_LOCATION en una carpeta común, para que todos vean la misma versión
+# del catálogo, los roles y la posición de los repartidores.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodback'),
+        # Con MULTINEGOCIO cada negocio tiene sus propias claves (ver pedidos/tenencia.py)
+        'KEY_FUNCTION': 'pedidos.tenencia.clave_cache',
+    }
+}
+CACHE_COMPARTIDA = 'locmem' not in CACHES['default']['BACKEND'].lower()
+
+# Varios restaurantes en este despliegue, reconocidos por el Host (modelo Negocio).
+# Apagado: un solo restaurante, como siempre.
+MULTINEGOCIO = os.getenv('MULTINEGOCIO', 'False') == 'True'
+NEGOCIO_CACHE_TTL = int(os.getenv('NEGOCIO_CACHE_TTL', 300))
+
+# Menú público cacheado completo (ver menu_publico_cacheado en pedidos/views.py)
+MENU_CACHE_PUBLICO = os.getenv('MENU_CACHE_PUBLICO', 'False') == 'True'
+# Segundos que el HTML vive en la caché de Django (se invalida solo al cambiar el catálogo)
+MENU_CACHE_TTL = int(os.getenv('MENU_CACHE_TTL', 60 * 60 * 24))
+# max-age para el proxy / navegador (corto: el estado abierto/cerrado cambia con la hora)
+MENU_CACHE_MAX_AGE = int(os.getenv('MENU_CACHE_MAX_AGE', 60))
+
+# Horario compilado (pedidos/horario.py): días hacia adelante y vida en caché.
+# El TTL acota cuánto tarda otro worker en ver un cambio si la caché no es compartida.
+HORARIO_VENTANA_DIAS = int(os.getenv('HORARIO_VENTANA_DIAS', 7))
+HORARIO_CACHE_TTL = int(os.getenv('HORARIO_CACHE_TTL', 300))
+
+# Capacidad de la cocina (pedidos/capacidad.py): vida máxima de la foto de carga
+# y ventana (minutos) para medir el ritmo de despacho.
+CAPACIDAD_CACHE_TTL = int(os.getenv('CAPACIDAD_CACHE_TTL', 30))
+CAPACIDAD_VENTANA_MINUTOS = int(os.getenv('CAPACIDAD_VENTANA_MINUTOS', 60))
+
+# Agotados (pedidos/disponibilidad.py): vida de los bitmaps en caché y cada
+# cuántos segundos el menú abierto pregunta si cambiaron.
+DISPONIBILIDAD_CACHE_TTL = int(os.getenv('DISPONIBILIDAD_CACHE_TTL', 30))
+DISPONIBILIDAD_POLL_SEGUNDOS = int(os.getenv('DISPONIBILIDAD_POLL_SEGUNDOS', 15))
+
+# Autocompletar clientes en el checkout: búsquedas por IP, por teléfono y ventana (segundos)
+CLIENTE_BUSQUEDA_LIMITE = int(os.getenv('CLIENTE_BUSQUEDA_LIMITE', 10))
+CLIENTE_BUSQUEDA_POR_TELEFONO = int(os.getenv('CLIENTE_BUSQUEDA_POR_TELEFONO', 5))
+CLIENTE_BUSQUEDA_VENTANA = int(os.getenv('CLIENTE_BUSQUEDA_VENTANA', 300))
+# Proxies propios delante de Django (el de Railway agrega uno a X-Forwarded-For).
+# La IP del cliente es la que anotó el último de ellos; 0 = usar REMOTE_ADDR.
+PROXIES_CONFIABLES = int(os.getenv('PROXIES_CONFIABLES', 1 if 'RAILWAY_ENVIRONMENT' in os.environ else 0))
+
+# Grupos del staff cacheados (pedidos/roles.py); se invalidan al cambiar la pertenencia
+ROLES_CACHE_TTL = int(os.getenv('ROLES_CACHE_TTL', 600))
+
+# Calentar plantillas y cachés al cargar cada worker (pedidos/arranque.py)
+CALENTAR_AL_INICIO = os.getenv('CALENTAR_AL_INICIO', 'True') == 'True'
+
+# Banco (Wompi) y geo-ip (pedidos/pasarela.py): timeouts en segundos y
+# conexiones que cada proceso mantiene abiertas hacia ellos.
+BANCO_TIMEOUT = float(os.getenv('BANCO_TIMEOUT', 15))
+BANCO_TIMEOUT_CONEXION = float(os.getenv('BANCO_TIMEOUT_CONEXION', 5))
+BANCO_MAX_CONEXIONES = int(os.getenv('BANCO_MAX_CONEXIONES', 20))
+GEOIP_TIMEOUT = float(os.getenv('GEOIP_TIMEOUT', 3))
+
+# Cola de tareas en segundo plano (pedidos/tareas.py). Con TAREAS_EN_COLA=True
+# hace falta `manage.py procesar_tareas` corriendo (con una caché compartida:
+# es otro proceso y sus invalidaciones deben llegar a los workers web); si no,
+# las tareas corren dentro de la petición como siempre.
+TAREAS_EN_COLA = os.getenv('TAREAS_EN_COLA', 'False') == 'True'
+# Primer reintento (segundos); cada fallo duplica la espera (tope 1 hora)
+TAREAS_REINTENTO_SEGUNDOS = int(os.getenv('TAREAS_REINTENTO_SEGUNDOS', 30))
+# Una tarea CORRIENDO por más de esto se da por colgada (trabajador caído)
+TAREAS_TIMEOUT = int(os.getenv('TAREAS_TIMEOUT', 600))
+# Cada cuánto el trabajador rescata colgadas y programa las periódicas
+TAREAS_MANTENIMIENTO_SEGUNDOS = int(os.getenv('TAREAS_MANTENIMIENTO_SEGUNDOS', 60))
+# Días que se guardan las tareas terminadas bien (para las estadísticas)
+TAREAS_RETENCION_DIAS = int(os.getenv('TAREAS_RETENCION_DIAS', 7))
+
+# GPS de los repartidores (pedidos/telemetria.py): los puntos se juntan en
+# memoria y se guardan en lote cada TELEMETRIA_VACIAR_SEGUNDOS (0 = sin hilo)
+# o al llegar a TELEMETRIA_LOTE puntos.
+# La última posición vive en la caché: sin una compartida cada worker vería
+# la suya, así que por defecto solo se activa con CACHE_COMPARTIDA.
+TELEMETRIA_ACTIVA = os.getenv('TELEMETRIA_ACTIVA', str(CACHE_COMPARTIDA)) == 'True'
+# Vida del token del GPS (segundos); la página de reparto lo renueva al refrescarse
+TELEMETRIA_TOKEN_TTL = int(os.getenv('TELEMETRIA_TOKEN_TTL', 600))
+TELEMETRIA_VACIAR_SEGUNDOS = float(os.getenv('TELEMETRIA_VACIAR_SEGUNDOS', 5))
+TELEMETRIA_LOTE = int(os.getenv('TELEMETRIA_LOTE', 1000))
+# Tope del buffer por proceso (si la base no responde, se descarta lo nuevo)
+TELEMETRIA_MAX_BUFFER = int(os.getenv('TELEMETRIA_MAX_BUFFER', 50000))
+# Puntos a menos de estos metros de la recta del recorrido no se guardan
+TELEMETRIA_TOLERANCIA_METROS = float(os.getenv('TELEMETRIA_TOLERANCIA_METROS', 10))
+# Segundos sin reportar tras los que el tracker deja de mostrar al repartidor
+TELEMETRIA_POSICION_TTL = int(os.getenv('TELEMETRIA_POSICION_TTL', 120))
+# Días que se guarda el recorrido
+TELEMETRIA_RETENCION_DIAS = int(os.getenv('TELEMETRIA_RETENCION_DIAS', 30))
+
+# ===============================
+# INSTRUMENTACIÓN (PANEL /dashboard/rendimiento/)
+# ===============================
+# Fracción de peticiones que se miden (0 = apagado, 1 = todas). Apagado por
+# defecto: medir envuelve cada consulta y puede correr cProfile, y las
+# muestras guardan rutas y plantillas SQL; se enciende por variable de entorno
+# solo mientras se investiga.
+PERFIL_MUESTREO = float(os.getenv('PERFIL_MUESTREO', 0))
+# Cuántas muestras se guardan en memoria por worker
+PERFIL_BUFFER = int(os.getenv('PERFIL_BUFFER', 500))
+# cProfile en las peticiones medidas; solo se guarda si tardan más de PERFIL_LENTO_MS
+PERFIL_CPROFILE = os.getenv('PERFIL_CPROFILE', 'False') == 'True'
+PERFIL_LENTO_MS = int(os.getenv('PERFIL_LENTO_MS', 500))
+
 # ===============================
 # PASSWORDS
 # ===============================
@@ -155,4 +286,22 @@ SESSION_SAVE_EVERY_REQUEST = False
 
 # 3. (Opcional) Si cierran el navegador por error y vuelven a abrir,
 # siguen logueados (siempre y cuando estén dentro de las 15h).
-SESSION_EXPIRE_AT_BROWSER_CLOSE = False
\ No newline at end of file
+SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+
+# --- LOGS ESTRUCTURADOS ---
+# Todo pasa por una cola en memoria; un hilo aparte escribe líneas JSON en stdout
+# (ver pedidos/observabilidad.py). Railway recoge stdout tal cual.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'json': {'class': 'pedidos.observabilidad.ColaJSONHandler'},
+    },
+    'root': {'handlers': ['json'], 'level': os.getenv('LOG_LEVEL', 'INFO')},
+    'loggers': {
+        # Django ya manda sus errores por 'django'; que suban al root (JSON) sin duplicar en consola
+        'django': {'handlers': [], 'level': os.getenv('LOG_LEVEL', 'INFO'), 'propagate': True},
+        # httpx registra cada llamada al banco en INFO; ya las medimos en instrumentación
+        'httpx': {'level': 'WARNING'},
+    },
+}
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Cada worker carga este módulo: se calienta antes de atender al primer cliente
+from django.conf import settings
+
+if settings.CALENTAR_AL_INICIO:
+    from pedidos.arranque import calentar
+    calentar()
@@ -1,8 +1,18 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from .models import Categoria, Producto, Cliente, Pedido, DetallePedido, ConfiguracionNegocio, DiaEspecial, OpcionProducto, Extra
+from .models import Categoria, Producto, Cliente, Pedido, DetallePedido, ConfiguracionNegocio, DiaEspecial, OpcionProducto, Extra, TurnoHorario, ReglaHorario, PedidoArchivado, VentaProductoArchivada, Negocio, Tarea, PosicionRepartidor
 from decouple import config 
+from .clientes import normalizar_telefono
+from .imagenes import url_miniatura
+from .replica import lectura_replica
 
 # --- NUEVO: CONFIGURACIÓN DE VARIANTES (INLINE) ---
 class OpcionProductoInline(admin.TabularInline):
@@ -31,7 +41,7 @@ class ProductoAdmin(admin.ModelAdmin):
     
     def mostrar_imagen(self, obj):
         if obj.imagen:
-            return format_html('<img src="{}" width="40" height="40" style="border-radius:5px;" />', obj.imagen.url)
+            return format_html('<img src="{}" width="40" height="40" style="border-radius:5px; object-fit:cover;" />', url_miniatura(obj, 80))
         return "❌"
     mostrar_imagen.short_description = "Foto"
 
@@ -39,18 +49,99 @@ class ProductoAdmin(admin.ModelAdmin):
 class DetallePedidoInline(admin.TabularInline):
     model = DetallePedido
     extra = 0
-    readonly_fields = ('subtotal',)
+    readonly_fields = ('extras_total', 'subtotal')
     # Los extras se pueden editar aquí si es necesario
     filter_horizontal = ('extras',)
+    # Sin <select> con todo el catálogo en cada línea
+    autocomplete_fields = ('producto',)
+    raw_id_fields = ('opcion',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto', 'opcion').prefetch_related('extras')
+
+# --- LISTA DE PEDIDOS CON MUCHAS FILAS ---
+# COUNT(*) acotado, sin el segundo conteo de la tabla completa, y "Más antiguos"
+# por cursor (?antes=<id>) en lugar de OFFSET para ir más allá del límite.
+
+ANTES_VAR = 'antes'
+
+class PaginadorEstimado(Paginator):
+    """Cuenta hasta LIMITE filas; más allá usa la estimación de Postgres (sin filtros) o el propio límite."""
+    LIMITE = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        contados = qs.order_by()[:self.LIMITE + 1].count()
+        if contados <= self.LIMITE:
+            return contados
+        if connection.vendor == 'postgresql' and not qs.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [qs.model._meta.db_table])
+                fila = cursor.fetchone()
+            if fila and fila[0] > self.LIMITE:
+                return fila[0]
+        return self.LIMITE
+
+class ChangeListPedidos(ChangeList):
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(ANTES_VAR, None)
+        return params
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        antes = self.params.get(ANTES_VAR, '')
+        return qs.filter(id__lt=int(antes)) if antes.isdigit() else qs
+
+    def get_results(self, request):
+        super().get_results(request)
+        # El cursor solo tiene sentido con el orden por defecto (id descendente)
+        self.url_anteriores = None
+        if ORDER_VAR not in self.params and self.multi_page:
+            ultimo = self.result_list[len(self.result_list) - 1] if len(self.result_list) else None
+            if ultimo is not None:
+                self.url_anteriores = self.get_query_string({ANTES_VAR: ultimo.id}, remove=['p'])
+
+def filtro_busqueda_pedidos(termino, campo_telefono):
+    """
+    Q de la búsqueda de pedidos (activos o archivados) solo con índices: id
+    exacto, teléfono normalizado y prefijo de Cliente.nombre_busqueda como
+    rango (sirve igual en SQLite y Postgres). None si no hay término.
+    """
+    termino = termino.strip()
+    if not termino:
+        return None
+    filtro = Q()
+    if termino.isdigit() and len(termino) < 8:
+        filtro |= Q(id=int(termino))
+    telefono = normalizar_telefono(termino)
+    if telefono:
+        filtro |= Q(**{campo_telefono: telefono})
+    prefijo = Cliente.texto_busqueda(termino)
+    if prefijo and not telefono:
+        filtro |= Q(cliente__nombre_busqueda__gte=prefijo, cliente__nombre_busqueda__lt=prefijo + '\uffff')
+    return filtro
 
 # 3. LA TORRE DE CONTROL (Pedidos)
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
     list_display = ('id', 'cliente_info', 'estado_color', 'metodo_pago', 'status_gps', 'acciones_mapa', 'total_final', 'fecha_creacion')
     list_filter = ('estado', 'metodo_pago', 'fecha_creacion', 'es_pedido_whatsapp')
-    search_fields = ('cliente__nombre', 'cliente__telefono', 'id')
+    search_fields = ('cliente__nombre', 'cliente__telefono', 'id')  # ver get_search_results
+    search_help_text = "Número de pedido, teléfono completo o inicio del nombre del cliente."
     inlines = [DetallePedidoInline]
     readonly_fields = ('total_productos', 'comision_plataforma', 'total_final', 'latitud', 'longitud', 'mapa_visual')
+    list_select_related = ('cliente',)
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListPedidos
+
+    def get_search_results(self, request, queryset, search_term):
+        filtro = filtro_busqueda_pedidos(search_term, 'cliente__telefono')
+        return (queryset if filtro is None else queryset.filter(filtro)), False
 
     def cliente_info(self, obj): return f"{obj.cliente.nombre} ({obj.cliente.telefono})"
     cliente_info.short_description = "Cliente"
@@ -93,15 +184,41 @@ class PedidoAdmin(admin.ModelAdmin):
         return "No hay ubicación registrada"
     mapa_visual.short_description = "Ubicación Exacta"
 
-admin.site.register(Categoria)
+    def changelist_view(self, request, extra_context=None):
+        # La lista (GET) puede leer de la réplica; las acciones masivas (POST) van al primario
+        if request.method == 'GET':
+            return lectura_replica(self._changelist_view)(request, extra_context)
+        return self._changelist_view(request, extra_context)
+
+    def _changelist_view(self, request, extra_context=None):
+        # Si la búsqueda también coincide con pedidos archivados, avisamos con un enlace
+        termino = request.GET.get('q', '').strip()
+        filtro = filtro_busqueda_pedidos(termino, 'telefono')
+        if filtro is not None:
+            archivados = PedidoArchivado.objects.filter(filtro).count()
+            if archivados:
+                url = reverse('admin:pedidos_pedidoarchivado_changelist') + '?' + urlencode({'q': termino})
+                messages.info(request, format_html('{} pedido(s) archivado(s) coinciden: <a href="{}">ver en el archivo</a>', archivados, url))
+        return super().changelist_view(request, extra_context)
+
+@admin.register(Categoria)
+class CategoriaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'orden', 'estacion')
+    list_editable = ('orden', 'estacion')
 admin.site.register(Cliente)
 
 # --- NUEVOS REGISTROS ---
 
+# Turnos por día (almuerzo / cena). Sin turnos, el día usa el horario global.
+class TurnoHorarioInline(admin.TabularInline):
+    model = TurnoHorario
+    extra = 0
+
 @admin.register(ConfiguracionNegocio)
 class ConfigAdmin(admin.ModelAdmin):
     # Agregamos 'fecha_vencimiento' para que puedas editarla y probar el bloqueo
     list_display = ('nombre_negocio', 'fecha_vencimiento', 'hora_apertura', 'hora_cierre')
+    inlines = [TurnoHorarioInline]
     
     # Esto asegura que solo haya UN registro de configuración
     def has_add_permission(self, request):
@@ -113,4 +230,77 @@ class ConfigAdmin(admin.ModelAdmin):
 class DiaEspecialAdmin(admin.ModelAdmin):
     list_display = ('fecha', 'abierto', 'motivo')
     list_filter = ('abierto',)
-    ordering = ('fecha',)
\ No newline at end of file
+    ordering = ('fecha',)
+
+@admin.register(ReglaHorario)
+class ReglaHorarioAdmin(admin.ModelAdmin):
+    list_display = ('tipo', 'abierto', 'motivo', 'mes', 'dia', 'dia_semana', 'ordinal', 'fecha_inicio', 'fecha_fin')
+    list_filter = ('tipo', 'abierto')
+
+
+# Pedidos viejos movidos por 'manage.py archivar_pedidos'. Solo lectura.
+@admin.register(PedidoArchivado)
+class PedidoArchivadoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre_cliente', 'telefono', 'estado', 'metodo_pago', 'total_final', 'fecha_creacion')
+    list_filter = ('estado', 'metodo_pago')
+    search_fields = ('=id', 'telefono', 'nombre_cliente')  # ver get_search_results
+    search_help_text = "Número de pedido, teléfono completo o inicio del nombre del cliente."
+    date_hierarchy = 'fecha_creacion'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Las mismas búsquedas por índice que PedidoAdmin: es la tabla más grande
+        filtro = filtro_busqueda_pedidos(search_term, 'telefono')
+        return (queryset if filtro is None else queryset.filter(filtro)), False
+
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
+
+@admin.register(VentaProductoArchivada)
+class VentaProductoArchivadaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'cantidad', 'dinero')
+    ordering = ('-cantidad',)
+
+# Restaurantes del despliegue compartido (MULTINEGOCIO). Solo superusuarios.
+@admin.register(Negocio)
+class NegocioAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'dominio', 'activo')
+    list_filter = ('activo',)
+    search_fields = ('nombre', 'dominio')
+    filter_horizontal = ('usuarios',)
+
+    def has_module_permission(self, request): return request.user.is_superuser
+    def has_view_permission(self, request, obj=None): return request.user.is_superuser
+    def has_add_permission(self, request): return request.user.is_superuser
+    def has_change_permission(self, request, obj=None): return request.user.is_superuser
+    def has_delete_permission(self, request, obj=None): return request.user.is_superuser
+
+# Cola de tareas en segundo plano (manage.py procesar_tareas). Solo lectura;
+# "reintentar" vuelve a poner las fallidas (no periódicas) en la cola.
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre', 'estado', 'intentos', 'ejecutar_en', 'duracion_ms', 'terminada')
+    list_filter = ('estado', 'nombre', 'periodica')
+    search_fields = ('=id', 'nombre')
+    readonly_fields = [f.name for f in Tarea._meta.fields]
+    actions = ['reintentar']
+
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
+
+    @admin.action(description="Reintentar las fallidas")
+    def reintentar(self, request, queryset):
+        from django.utils import timezone
+        n = queryset.filter(estado='FALLIDA', periodica=False).update(estado='PENDIENTE', intentos=0, ejecutar_en=timezone.now())
+        self.message_user(request, f"{n} tareas de vuelta en la cola.", messages.SUCCESS)
+
+# Recorrido guardado de los repartidores (ya simplificado, ver telemetria.py). Solo lectura.
+@admin.register(PosicionRepartidor)
+class PosicionRepartidorAdmin(admin.ModelAdmin):
+    list_display = ('repartidor', 'registrada', 'latitud', 'longitud', 'precision')
+    list_filter = ('repartidor',)
+    date_hierarchy = 'registrada'
+    list_select_related = ('repartidor',)
+    readonly_fields = [f.name for f in PosicionRepartidor._meta.fields]
+
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
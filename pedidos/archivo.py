@@ -0,0 +1,117 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import DetallePedido, Pedido, PedidoArchivado, VentaProductoArchivada
+
+# --- ARCHIVO DE PEDIDOS TERMINADOS ---
+# Los pedidos ENTREGADO/CANCELADO más viejos que N días pasan a
+# PedidoArchivado (una fila por pedido, líneas en JSON) por lotes, cada lote en
+# su propia transacción. Lo vendido se suma a VentaProductoArchivada para que
+# el top de productos no cambie. Pensado para cron (manage.py archivar_pedidos).
+
+ESTADOS_ARCHIVABLES = ('ENTREGADO', 'CANCELADO')
+DIAS_MINIMOS = 8  # la gráfica de finanzas lee los últimos 7 días de las tablas calientes
+
+
+def _lineas(pedido):
+    return [
+        {
+            'producto_id': d.producto_id,
+            'producto': d.producto.nombre,
+            'opcion_id': d.opcion_id,
+            'opcion': d.opcion.nombre if d.opcion else "",
+            'extras_ids': [e.id for e in d.extras.all()],
+            'extras': [e.nombre for e in d.extras.all()],
+            'cantidad': d.cantidad,
+            'precio_unitario': str(d.precio_unitario),
+            'subtotal': str(d.subtotal),
+        }
+        for d in pedido.detalles.all()
+    ]
+
+def _archivar(pedido):
+    return PedidoArchivado(
+        id=pedido.id, negocio_id=pedido.negocio_id, cliente_id=pedido.cliente_id, telefono=pedido.cliente.telefono,
+        nombre_cliente=f"{pedido.cliente.nombre} {pedido.cliente.apellido}".strip(),
+        fecha_creacion=pedido.fecha_creacion, estado=pedido.estado, metodo_pago=pedido.metodo_pago,
+        direccion_entrega=pedido.direccion_entrega, es_pedido_whatsapp=pedido.es_pedido_whatsapp,
+        total_productos=pedido.total_productos, comision_plataforma=pedido.comision_plataforma,
+        total_final=pedido.total_final, dispositivo=pedido.dispositivo, lineas=_lineas(pedido),
+    )
+
+def _acumular_ventas(pedidos):
+    """Suma las líneas de los pedidos ENTREGADO del lote al acumulado por producto."""
+    ventas, negocios = {}, {}  # el cron corre sin negocio activo: cada fila lleva el de su producto
+    for pedido in pedidos:
+        if pedido.estado != 'ENTREGADO':
+            continue
+        for d in pedido.detalles.all():
+            nombre, cantidad, dinero = ventas.get(d.producto_id, (d.producto.nombre, 0, Decimal('0')))
+            ventas[d.producto_id] = (nombre, cantidad + d.cantidad, dinero + (d.subtotal or 0))
+            negocios[d.producto_id] = d.producto.negocio_id
+    if not ventas:
+        return
+
+    existentes = {v.producto_id: v for v in VentaProductoArchivada.objects.select_for_update().filter(producto_id__in=ventas)}
+    nuevas = []
+    for producto_id, (nombre, cantidad, dinero) in ventas.items():
+        fila = existentes.get(producto_id)
+        if fila is None:
+            nuevas.append(VentaProductoArchivada(producto_id=producto_id, negocio_id=negocios[producto_id],
+                                                 nombre=nombre, cantidad=cantidad, dinero=dinero))
+        else:
+            fila.nombre, fila.cantidad, fila.dinero = nombre, fila.cantidad + cantidad, fila.dinero + dinero
+    VentaProductoArchivada.objects.bulk_update(existentes.values(), ['nombre', 'cantidad', 'dinero'])
+    VentaProductoArchivada.objects.bulk_create(nuevas)
+
+def archivar_pedidos(dias=90, lote=500, ahora=None):
+    """Archiva los pedidos terminados con más de 'dias' días. Retorna cuántos movió."""
+    dias = max(dias, DIAS_MINIMOS)
+    corte = (ahora or timezone.now()) - timedelta(days=dias)
+    candidatos = Pedido.objects.filter(estado__in=ESTADOS_ARCHIVABLES, fecha_creacion__lt=corte)
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(candidatos.order_by('id').values_list('id', flat=True)[:lote])
+            if not ids:
+                break
+            pedidos = list(
+                Pedido.objects.filter(id__in=ids).select_related('cliente')
+                .prefetch_related('detalles__producto', 'detalles__opcion', 'detalles__extras')
+            )
+            PedidoArchivado.objects.bulk_create([_archivar(p) for p in pedidos])
+            _acumular_ventas(pedidos)
+
+            # Borrado directo (sin señales): actualizar_total_pedido re-guardaría
+            # cada pedido por cada línea borrada, y nada de esto está en cocina.
+            for qs in (DetallePedido.extras.through.objects.filter(
+                           detallepedido_id__in=DetallePedido.objects.filter(pedido_id__in=ids).values('id')),
+                       DetallePedido.objects.filter(pedido_id__in=ids),
+                       Pedido.objects.filter(id__in=ids)):
+                qs._raw_delete(qs.db)
+        total += len(ids)
+    return total
+
+# --- LECTURA (CALIENTE + ARCHIVO) ---
+
+def top_productos(limite=5):
+    """Top de productos de siempre: pedidos vigentes + acumulado archivado."""
+    vivos = (DetallePedido.objects.filter(pedido__estado__in=['RECIBIDO', 'COCINA', 'RUTA', 'ENTREGADO'])
+             .values('producto_id', 'producto__nombre')
+             .annotate(total_vendido=Sum('cantidad'), dinero_generado=Sum('subtotal')))
+    filas = {
+        f['producto_id']: {'producto__nombre': f['producto__nombre'], 'total_vendido': f['total_vendido'],
+                           'dinero_generado': f['dinero_generado'] or 0}
+        for f in vivos
+    }
+    for v in VentaProductoArchivada.objects.all():
+        clave = v.producto_id or f"archivado-{v.id}"
+        fila = filas.setdefault(clave, {'producto__nombre': v.nombre, 'total_vendido': 0, 'dinero_generado': 0})
+        fila['total_vendido'] += v.cantidad
+        fila['dinero_generado'] += v.dinero
+    return sorted(filas.values(), key=lambda f: f['total_vendido'], reverse=True)[:limite]
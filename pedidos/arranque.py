@@ -0,0 +1,98 @@
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+# --- ARRANQUE DEL WORKER (CALENTAMIENTO) ---
+# Tras un reinicio o un escalado, el primer cliente pagaba todo lo perezoso:
+# importar las vistas (urlconf), compilar plantillas, crear la configuración y
+# llenar las cachés de catálogo, horario, agotados y roles. calentar() lo hace
+# antes de atender (core/wsgi.py y core/asgi.py la llaman al cargar el worker)
+# y /salud/listo/ responde 503 hasta que terminó.
+
+# Las que ven los clientes y el staff en cada turno
+PLANTILLAS_CALIENTES = (
+    'pedidos/menu.html',
+    'pedidos/checkout.html',
+    'pedidos/partials/cart_summary.html',
+    'pedidos/order_tracker.html',
+    'pedidos/exito.html',
+    'registration/login.html',
+    'pedidos/dashboard_admin.html',
+    'pedidos/dashboard_delivery.html',
+    'pedidos/dashboard_cocina.html',
+    'pedidos/mostrador.html',
+)
+
+_estado = {'listo': False, 'ms': None}
+
+
+def estado():
+    """{'listo': bool, 'ms': duración del último calentamiento}."""
+    return dict(_estado)
+
+def calentar_plantillas():
+    """Compila las plantillas calientes en el loader cacheado de este proceso."""
+    for nombre in PLANTILLAS_CALIENTES:
+        get_template(nombre)
+
+def calentar_caches():
+    """Catálogo (índices del mostrador y de la búsqueda), horario (crea la configuración si falta), carga, agotados, roles del staff y menú público."""
+    from .busqueda import obtener_indice_busqueda
+    from .capacidad import obtener_carga
+    from .catalogo import version_catalogo
+    from .disponibilidad import obtener_disponibilidad
+    from .horario import obtener_indice
+    from .mostrador import obtener_indice_catalogo
+    from .roles import grupos_de
+
+    version_catalogo()
+    obtener_indice_catalogo()
+    obtener_indice_busqueda()
+    obtener_indice()
+    obtener_carga()
+    obtener_disponibilidad()
+    staff = User.objects.filter(Q(is_superuser=True) | Q(groups__name__in=['Administradores', 'Repartidores']))
+    if settings.CACHE_COMPARTIDA:  # con LocMem los roles no se cachean (pedidos/roles.py)
+        for usuario in staff.filter(is_active=True).distinct():
+            grupos_de(usuario)
+
+    if settings.MENU_CACHE_PUBLICO:
+        from .views import html_menu_publico, huella_menu_publico, suscripcion_activa, verificar_admision
+        if suscripcion_activa():
+            abierto, mensaje_estado, _ = verificar_admision()
+            html_menu_publico(huella_menu_publico(abierto, mensaje_estado), abierto, mensaje_estado)
+
+def _calentar_negocios():
+    if not settings.MULTINEGOCIO:
+        calentar_caches()
+        return
+    from .models import Negocio
+    from .tenencia import negocio_activo
+    for negocio_id in Negocio.objects.filter(activo=True).values_list('id', flat=True):
+        with negocio_activo(negocio_id):
+            calentar_caches()
+
+def calentar():
+    """
+    Deja el worker listo para el primer cliente. Nunca rompe el arranque: si
+    la base no responde se registra y /salud/listo/ lo reintenta.
+    """
+    inicio = time.perf_counter()
+    try:
+        get_resolver().url_patterns  # importa las vistas y todo lo que cuelga de ellas
+        calentar_plantillas()
+        _calentar_negocios()
+    except Exception:
+        logger.exception("No se pudo calentar el worker")
+        return False
+    _estado['ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+    _estado['listo'] = True
+    logger.info("Worker calentado", extra={'ms': _estado['ms']})
+    return True
@@ -0,0 +1,536 @@
+import asyncio
+import json
+import math
+import os
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import cycle, islice
+from datetime import time as hora, timedelta
+from decimal import Decimal
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import pasarela
+from .models import (
+    Categoria, Cliente, ConfiguracionNegocio, DetallePedido, Extra, OpcionProducto, Pedido, Producto,
+)
+
+# --- DATOS SEMBRADOS ---
+
+def sembrar_datos(categorias=8, productos=12, opciones=3, extras=10, pedidos=2000, dias=30, semilla=42):
+    """
+    Llena la base (vacía) con un catálogo y un historial de pedidos
+    reproducibles. 'productos' y 'opciones' son por categoría / por producto.
+    """
+    rng = random.Random(semilla)
+
+    ConfiguracionNegocio.objects.all().delete()
+    ConfiguracionNegocio.objects.create(
+        hora_apertura=hora(0, 0), hora_cierre=hora(23, 59, 59),
+        fecha_vencimiento=timezone.localdate() + timedelta(days=365),
+    )
+
+    lista_extras = Extra.objects.bulk_create([
+        Extra(nombre=f"Extra {i}", precio=Decimal(rng.randint(25, 150)) / 100) for i in range(extras)
+    ])
+    lista_categorias = Categoria.objects.bulk_create([
+        Categoria(nombre=f"Categoría {i}", orden=i) for i in range(categorias)
+    ])
+    lista_productos = Producto.objects.bulk_create([
+        Producto(categoria=c, nombre=f"Producto {c.orden}-{i}", descripcion="Receta de la casa.",
+                 precio=Decimal(rng.randint(150, 1200)) / 100)
+        for c in lista_categorias for i in range(productos)
+    ])
+    lista_opciones = OpcionProducto.objects.bulk_create([
+        OpcionProducto(producto=p, nombre=f"Opción {i}", precio_extra=Decimal(rng.randint(0, 100)) / 100)
+        for p in lista_productos for i in range(opciones)
+    ])
+    if lista_extras:
+        Producto.extras.through.objects.bulk_create([
+            Producto.extras.through(producto_id=p.id, extra_id=e.id)
+            for p in lista_productos for e in rng.sample(lista_extras, min(3, len(lista_extras)))
+        ])
+
+    opciones_por_producto = {}
+    for o in lista_opciones:
+        opciones_por_producto.setdefault(o.producto_id, []).append(o)
+
+    clientes = Cliente.objects.bulk_create([
+        Cliente(telefono=f"7{i:07d}", nombre=f"Cliente {i}", apellido="Bench", direccion_ultima="Col. Escalón")
+        for i in range(max(1, pedidos // 5))
+    ])
+
+    estados = ['ENTREGADO'] * 12 + ['CANCELADO', 'RECIBIDO', 'COCINA', 'RUTA', 'PENDIENTE']
+    nuevos_pedidos, lineas = [], []
+    for _ in range(pedidos):
+        metodo = rng.choice(['EFECTIVO', 'TARJETA'])
+        pedido = Pedido(cliente=rng.choice(clientes), direccion_entrega="Col. Escalón",
+                        metodo_pago=metodo, estado=rng.choice(estados))
+        total = Decimal('0.00')
+        for producto in rng.sample(lista_productos, rng.randint(1, 4)):
+            opcion = rng.choice(opciones_por_producto[producto.id]) if producto.id in opciones_por_producto else None
+            cantidad = rng.randint(1, 3)
+            subtotal = cantidad * (producto.precio + (opcion.precio_extra if opcion else 0))
+            total += subtotal
+            lineas.append((pedido, DetallePedido(producto=producto, opcion=opcion, cantidad=cantidad,
+                                                 precio_unitario=producto.precio, subtotal=subtotal)))
+        pedido.total_productos = total
+        pedido.comision_plataforma = (total * Decimal('0.05')).quantize(Decimal('0.01')) if metodo == 'TARJETA' else 0
+        pedido.total_final = total + pedido.comision_plataforma
+        nuevos_pedidos.append(pedido)
+
+    Pedido.objects.bulk_create(nuevos_pedidos, batch_size=500)
+    for pedido, detalle in lineas:
+        detalle.pedido = pedido
+    DetallePedido.objects.bulk_create([d for _, d in lineas], batch_size=1000)
+
+    # Repartimos las fechas en los últimos 'dias' para que las métricas tengan historia
+    ahora = timezone.now()
+    por_dia = {}
+    for pedido in nuevos_pedidos:
+        por_dia.setdefault(rng.randint(0, dias - 1), []).append(pedido.id)
+    for dia, ids in por_dia.items():
+        Pedido.objects.filter(id__in=ids).update(fecha_creacion=ahora - timedelta(days=dia))
+
+    admin = User.objects.create_superuser('bench_admin', 'bench@example.com', 'bench')
+
+    return {
+        'admin_id': admin.id,
+        'productos': [(p.id, [o.id for o in opciones_por_producto.get(p.id, [])]) for p in lista_productos],
+        'pedidos_activos': list(Pedido.objects.exclude(estado__in=['ENTREGADO', 'CANCELADO']).values_list('id', flat=True)[:200]),
+    }
+
+# --- ESCENARIOS ---
+# Cada escenario recibe (client, datos, rng) y hace UNA petición medida.
+# 'preparar' (opcional) corre antes, fuera del cronómetro.
+
+def _carrito_aleatorio(datos, rng, items=3):
+    cart = {}
+    for prod_id, opciones in rng.sample(datos['productos'], items):
+        cart[f"{prod_id}-{rng.choice(opciones) if opciones else 0}-0"] = rng.randint(1, 2)
+    return cart
+
+def _poner_carrito(client, cart):
+    session = client.session
+    session['cart'] = cart
+    session.save()
+
+def _preparar_menu(client, datos, rng):
+    _poner_carrito(client, _carrito_aleatorio(datos, rng))
+
+def _menu(client, datos, rng):
+    return client.get(reverse('menu'))
+
+def _cart_add(client, datos, rng):
+    prod_id, opciones = rng.choice(datos['productos'])
+    post = {'opcion_id': rng.choice(opciones)} if opciones else {}
+    return client.post(reverse('add_to_cart', args=[prod_id]), post)
+
+def _preparar_checkout(client, datos, rng):
+    _poner_carrito(client, _carrito_aleatorio(datos, rng))
+
+def _checkout(client, datos, rng):
+    return client.post(reverse('checkout'), {
+        'telefono': f"6{rng.randint(0, 9999999):07d}", 'nombre': "Bench", 'apellido': "Cliente",
+        'direccion': "Col. Escalón", 'metodo_pago': 'EFECTIVO', 'latitud': '13.69', 'longitud': '-89.21',
+    })
+
+def _order_status(client, datos, rng):
+    return client.get(reverse('api_order_status', args=[rng.choice(datos['pedidos_activos'])]))
+
+def _preparar_staff(client, datos, rng):
+    client.force_login(User.objects.get(id=datos['admin_id']))
+
+def _dashboard_sync(client, datos, rng):
+    return client.get(reverse('dashboard_admin'), {'sync_mode': 'true'})
+
+def _metricas(client, datos, rng):
+    return client.get(reverse('dashboard_metrics'))
+
+ESCENARIOS = {
+    'menu': (_preparar_menu, _menu, 'cada'),
+    'cart_add': (None, _cart_add, 'una'),
+    'checkout': (_preparar_checkout, _checkout, 'cada'),
+    'api_order_status': (None, _order_status, 'una'),
+    'dashboard_sync': (_preparar_staff, _dashboard_sync, 'una'),
+    'dashboard_metrics': (_preparar_staff, _metricas, 'una'),
+}
+
+# --- MEDICIÓN ---
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(ordenados) - 1)
+    return ordenados[f] + (ordenados[c] - ordenados[f]) * (k - f)
+
+def correr_escenario(nombre, datos, iteraciones=200, concurrencia=4, semilla=42):
+    """Corre 'iteraciones' peticiones repartidas en 'concurrencia' hilos."""
+    preparar, peticion, modo_preparar = ESCENARIOS[nombre]
+    tiempos, consultas, errores = [], [], []
+    candado = threading.Lock()
+
+    def trabajador(n, indice):
+        rng = random.Random(semilla + indice)
+        client = Client(raise_request_exception=False)
+        locales_t, locales_q, locales_e = [], [], 0
+        try:
+            if preparar and modo_preparar == 'una':
+                preparar(client, datos, rng)
+            for _ in range(n):
+                if preparar and modo_preparar == 'cada':
+                    preparar(client, datos, rng)
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    response = peticion(client, datos, rng)
+                    locales_t.append((time.perf_counter() - inicio) * 1000)
+                locales_q.append(len(ctx.captured_queries))
+                if response.status_code >= 400:
+                    locales_e += 1
+        finally:
+            connection.close()
+            with candado:
+                tiempos.extend(locales_t)
+                consultas.extend(locales_q)
+                errores.append(locales_e)
+
+    reparto = [iteraciones // concurrencia + (1 if i < iteraciones % concurrencia else 0) for i in range(concurrencia)]
+    hilos = [threading.Thread(target=trabajador, args=(n, i)) for i, n in enumerate(reparto) if n]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+
+    return {
+        'peticiones': len(tiempos),
+        'errores': sum(errores),
+        'concurrencia': concurrencia,
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+        'media_ms': round(statistics.fmean(tiempos), 3) if tiempos else 0.0,
+        'consultas_por_peticion': round(statistics.fmean(consultas), 2) if consultas else 0.0,
+        'consultas_max': max(consultas, default=0),
+        'rps': round(len(tiempos) / duracion, 2) if duracion else 0.0,
+    }
+
+def comparar(actual, base, tolerancia=0.2):
+    """Lista de regresiones (texto) de 'actual' contra un baseline anterior."""
+    regresiones = []
+    for nombre, res in actual['escenarios'].items():
+        anterior = base.get('escenarios', {}).get(nombre)
+        if not anterior:
+            continue
+        if res['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f"{nombre}: p95 {anterior['p95_ms']}ms -> {res['p95_ms']}ms")
+        if res['consultas_por_peticion'] > anterior['consultas_por_peticion']:
+            regresiones.append(f"{nombre}: consultas {anterior['consultas_por_peticion']} -> {res['consultas_por_peticion']}")
+    return regresiones
+
+# --- BANCO LENTO: WSGI CONTRA ASGI ---
+# El mismo tráfico (pagos que esperan a un banco falso con latencia + menú)
+# en ráfaga: primero como gunicorn sync con N workers (N hilos), después como
+# un worker ASGI (un solo event loop). Se mide cuánto tarda el menú en salir.
+
+@contextmanager
+def banco_falso(latencia_ms):
+    """Servidor HTTP local que imita a Wompi (token + enlace) tardando latencia_ms por respuesta."""
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive: deja que el pool reutilice conexiones
+
+        def do_POST(self):
+            cuerpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latencia_ms / 1000)
+            if self.path.endswith('/token'):
+                datos = {'access_token': 'bench'}
+            else:
+                datos = {'urlEnlace': f"https://pago.bench/{json.loads(cuerpo)['IdentificadorEnlaceComercio']}"}
+            texto = json.dumps(datos).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(texto)))
+            self.end_headers()
+            self.wfile.write(texto)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    anteriores = {k: os.environ.get(k) for k in ('WOMPI_AUTH_URL', 'WOMPI_API_URL')}
+    os.environ.update(WOMPI_AUTH_URL=f"{base}/connect/token", WOMPI_API_URL=f"{base}/EnlacePago")
+    try:
+        yield
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        for clave, valor in anteriores.items():
+            if valor is None:
+                os.environ.pop(clave, None)
+            else:
+                os.environ[clave] = valor
+
+def _resumen_rafaga(tiempos, duracion):
+    return {
+        'duracion_s': round(duracion, 3),
+        'menu_p50_ms': round(percentil(tiempos['menu'], 50), 3),
+        'menu_p95_ms': round(percentil(tiempos['menu'], 95), 3),
+        'pago_p95_ms': round(percentil(tiempos['pago'], 95), 3),
+        'errores': tiempos['errores'],
+    }
+
+def _rafaga_wsgi(peticiones, trabajadores):
+    pendientes = queue.Queue()
+    for p in peticiones:
+        pendientes.put(p)
+    tiempos = {'menu': [], 'pago': [], 'errores': 0}
+    candado = threading.Lock()
+    inicio = time.perf_counter()
+
+    def trabajador():
+        client = Client(raise_request_exception=False)
+        try:
+            while True:
+                try:
+                    tipo, url = pendientes.get_nowait()
+                except queue.Empty:
+                    return
+                response = client.get(url)
+                with candado:
+                    tiempos[tipo].append((time.perf_counter() - inicio) * 1000)
+                    tiempos['errores'] += response.status_code >= 400
+        finally:
+            connection.close()
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(trabajadores)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return _resumen_rafaga(tiempos, time.perf_counter() - inicio)
+
+async def _rafaga_asgi(peticiones):
+    client = AsyncClient(raise_request_exception=False)
+    tiempos = {'menu': [], 'pago': [], 'errores': 0}
+    pasarela.usar_pool_por_loop()  # como core/asgi.py: un solo loop para toda la ráfaga
+    inicio = time.perf_counter()
+
+    async def una(tipo, url):
+        # Como ASGIHandler: el código sync de cada petición corre en su propio hilo
+        async with ThreadSensitiveContext():
+            response = await client.get(url)
+            await sync_to_async(lambda: connection.close())()
+        tiempos[tipo].append((time.perf_counter() - inicio) * 1000)
+        tiempos['errores'] += response.status_code >= 400
+
+    await asyncio.gather(*(una(tipo, url) for tipo, url in peticiones))
+    duracion = time.perf_counter() - inicio
+    await pasarela.cerrar_cliente_http()
+    pasarela.usar_pool_por_loop(False)
+    return _resumen_rafaga(tiempos, duracion)
+
+def correr_banco_lento(datos, latencia_ms=500, pagos=20, menus=100, trabajadores=4, semilla=42):
+    """
+    {'wsgi': {...}, 'asgi': {...}} con la misma ráfaga de pagos y menús. El
+    menú va con MENU_CACHE_PUBLICO: lo que se compara es la espera al banco,
+    no el costo de renderizar.
+    """
+    peticiones = [('pago', reverse('pagar_wompi', args=[i])) for i in islice(cycle(datos['pedidos_activos']), pagos)]
+    peticiones += [('menu', reverse('menu'))] * menus
+    random.Random(semilla).shuffle(peticiones)
+    with banco_falso(latencia_ms), override_settings(MENU_CACHE_PUBLICO=True):
+        return {
+            'wsgi': _rafaga_wsgi(peticiones, trabajadores),
+            'asgi': asyncio.run(_rafaga_asgi(peticiones)),
+        }
+
+# --- ARRANQUE EN FRÍO ---
+# Procesos nuevos contra la base del benchmark: cuánto tarda en cargar el
+# módulo WSGI (lo que hace gunicorn al levantar un worker) y el primer byte
+# del menú, sin calentar y con CALENTAR_AL_INICIO.
+
+SCRIPT_ARRANQUE = """
+import json, time
+inicio = time.perf_counter()
+import core.wsgi
+cargado = time.perf_counter()
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+estado = Client().get('/').status_code
+fin = time.perf_counter()
+print('ARRANQUE ' + json.dumps({'carga_ms': (cargado - inicio) * 1000, 'primer_byte_ms': (fin - cargado) * 1000, 'estado': estado}))
+"""
+
+def medir_arranque(archivo_db, repeticiones=3):
+    """{'frio': {...}, 'calentado': {...}} con la mediana de carga_ms y primer_byte_ms."""
+    resultados = {}
+    for modo, calentar in (('frio', 'False'), ('calentado', 'True')):
+        corridas = []
+        for _ in range(repeticiones):
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE='core.settings',
+                       DATABASE_URL=f"sqlite:///{archivo_db}", CALENTAR_AL_INICIO=calentar)
+            salida = subprocess.run([sys.executable, '-c', SCRIPT_ARRANQUE], env=env, cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True, check=True).stdout
+            linea = next(l for l in salida.splitlines() if l.startswith('ARRANQUE '))
+            corridas.append(json.loads(linea[len('ARRANQUE '):]))
+        resultados[modo] = {
+            'carga_ms': round(statistics.median(c['carga_ms'] for c in corridas), 1),
+            'primer_byte_ms': round(statistics.median(c['primer_byte_ms'] for c in corridas), 1),
+            'errores': sum(c['estado'] >= 400 for c in corridas),
+        }
+    return resultados
+
+# --- BÚSQUEDA DEL MENÚ ---
+# Un catálogo sintético grande (nombres, descripciones y opciones con tildes)
+# directo al índice, sin base: mide construir el índice y responder consultas
+# como las escribe un cliente (prefijos, sin tildes, con errores de tipeo).
+
+PLATOS = ["Hamburguesa", "Pizza", "Pupusa", "Tacos", "Burrito", "Ensalada", "Sándwich", "Alitas", "Costilla",
+          "Quesadilla", "Nachos", "Pollo", "Camarón", "Lasaña", "Pasta", "Sopa", "Empanada", "Tamal", "Licuado", "Café"]
+ADJETIVOS = ["Clásica", "Doble", "Picante", "Ahumado", "Especial", "Suprema", "Criolla", "Mexicana", "Hawaiana",
+             "Vegetariana", "Campestre", "Tradicional", "Crujiente", "Casera", "Gourmet", "Jalapeño", "Barbacoa", "Búfalo"]
+INGREDIENTES = ["queso", "tocino", "aguacate", "cebolla", "jalapeño", "champiñones", "piña", "frijol", "chicharrón",
+                "loroco", "ajo", "albahaca", "chipotle", "mozzarella", "cheddar", "pepperoni", "jamón", "chorizo"]
+OPCIONES_BUSQUEDA = ["Res", "Pollo", "Cerdo", "Vegetal", "Grande", "Mediana", "Personal", "Familiar"]
+
+def _catalogo_sintetico(productos, rng):
+    documentos = []
+    for i in range(productos):
+        plato, adjetivo = rng.choice(PLATOS), rng.choice(ADJETIVOS)
+        documentos.append({
+            'id': i + 1, 'nombre': f"{plato} {adjetivo} {i}", 'categoria': f"{plato}s", 'precio': '5.00',
+            'descripcion': "Con " + ", ".join(rng.sample(INGREDIENTES, 3)) + " de la casa.",
+            'opciones': " ".join(rng.sample(OPCIONES_BUSQUEDA, 3)),
+        })
+    return documentos
+
+def _consulta_cliente(rng):
+    """Lo que teclea un cliente: prefijos, sin tildes y a veces con una letra de menos o cambiada."""
+    palabras = [rng.choice(PLATOS), rng.choice(ADJETIVOS + INGREDIENTES)][:rng.randint(1, 2)]
+    tecleadas = []
+    for palabra in palabras:
+        palabra = palabra.lower()
+        if rng.random() < 0.5:
+            palabra = Cliente.texto_busqueda(palabra)
+        if rng.random() < 0.3 and len(palabra) > 4:
+            i = rng.randrange(1, len(palabra) - 1)
+            palabra = palabra[:i] + palabra[i + 1:] if rng.random() < 0.5 else palabra[:i] + palabra[i + 1] + palabra[i] + palabra[i + 2:]
+        if rng.random() < 0.3:
+            palabra = palabra[:rng.randint(2, len(palabra))]
+        tecleadas.append(palabra)
+    return " ".join(tecleadas)
+
+def medir_busqueda(productos=5000, consultas=1000, semilla=42):
+    """Construcción del índice y latencia de buscar() (p50/p95/p99/máx en ms) sobre un catálogo sintético."""
+    from .busqueda import IndiceBusqueda
+    rng = random.Random(semilla)
+    documentos = _catalogo_sintetico(productos, rng)
+
+    inicio = time.perf_counter()
+    indice = IndiceBusqueda(1, documentos)
+    construccion_ms = (time.perf_counter() - inicio) * 1000
+
+    textos = [_consulta_cliente(rng) for _ in range(consultas)]
+    tiempos, vacias = [], 0
+    for texto in textos:
+        inicio = time.perf_counter()
+        resultados = indice.buscar(texto)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        vacias += not resultados
+    return {
+        'productos': productos,
+        'palabras': len(indice.vocabulario),
+        'construccion_ms': round(construccion_ms, 1),
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+        'max_ms': round(max(tiempos, default=0), 3),
+        'sin_resultados': vacias,
+    }
+
+
+# --- GPS DE REPARTIDORES ---
+
+def _recorrido_sintetico(pings, rng, inicio):
+    """Un repartidor en moto: tramos rectos con giros y ruido de GPS, un punto por segundo."""
+    lat, lng, rumbo = 13.6929 + rng.uniform(-0.05, 0.05), -89.2182 + rng.uniform(-0.05, 0.05), rng.uniform(0, 360)
+    puntos = []
+    for i in range(pings):
+        if rng.random() < 0.05:
+            rumbo += rng.choice([-90, 90])
+        lat += 0.00008 * math.cos(math.radians(rumbo)) + rng.gauss(0, 0.00001)
+        lng += 0.00008 * math.sin(math.radians(rumbo)) + rng.gauss(0, 0.00001)
+        puntos.append({'lat': lat, 'lng': lng, 'precision': 8, 'ts': (inicio + i) * 1000})
+    return puntos
+
+def medir_telemetria(pings=3000, repartidores=30, semilla=42):
+    """
+    Pings de GPS (uno por petición, el peor caso) contra api_reparto_posicion
+    en un solo hilo: latencia, pings/s y consultas durante la recepción; luego
+    lo que tarda vaciar el buffer y cuántos puntos quedan tras simplificar.
+    """
+    from .telemetria import BUFFER, token_repartidor
+    rng = random.Random(semilla)
+    usuarios = User.objects.bulk_create([User(username=f"gps-bench-{semilla}-{i}") for i in range(repartidores)])
+    if usuarios[0].pk is None:
+        usuarios = list(User.objects.filter(username__startswith=f"gps-bench-{semilla}-").order_by('id'))
+    inicio = int(time.time()) - pings // repartidores - 60
+    envios = [(token_repartidor(u, None), _recorrido_sintetico(pings // repartidores, rng, inicio)) for u in usuarios]
+    url = reverse('api_reparto_posicion')
+
+    client = Client(raise_request_exception=False)
+    tiempos, errores = [], 0
+    with override_settings(TELEMETRIA_ACTIVA=True, TELEMETRIA_VACIAR_SEGUNDOS=0, TELEMETRIA_LOTE=10 ** 9,
+                           TELEMETRIA_MAX_BUFFER=10 ** 9):
+        BUFFER.vaciar()
+        with CaptureQueriesContext(connection) as ctx:
+            comienzo = time.perf_counter()
+            for i in range(pings // repartidores):
+                for token, recorrido in envios:
+                    cuerpo = json.dumps({'token': token, 'puntos': [recorrido[i]]})
+                    t0 = time.perf_counter()
+                    response = client.post(url, cuerpo, content_type='application/json')
+                    tiempos.append((time.perf_counter() - t0) * 1000)
+                    errores += response.status_code != 202
+            duracion = time.perf_counter() - comienzo
+        consultas = len(ctx.captured_queries)
+
+        pendientes = len(BUFFER)
+        t0 = time.perf_counter()
+        guardados = BUFFER.vaciar()
+        vaciar_ms = (time.perf_counter() - t0) * 1000
+    return {
+        'pings': len(tiempos),
+        'repartidores': repartidores,
+        'errores': errores,
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+        'pings_por_segundo': round(len(tiempos) / duracion, 1) if duracion else 0.0,
+        'consultas_recepcion': consultas,
+        'vaciar_ms': round(vaciar_ms, 1),
+        'puntos_guardados': guardados,
+        'reduccion_pct': round(100 * (1 - guardados / pendientes), 1) if pendientes else 0.0,
+    }
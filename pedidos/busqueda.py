@@ -0,0 +1,132 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from .catalogo import version_catalogo
+from .models import Cliente, OpcionProducto, Producto
+from .tenencia import id_negocio_actual
+
+# --- BÚSQUEDA DEL MENÚ (ÍNDICE INVERTIDO EN MEMORIA) ---
+# Un índice por proceso y negocio, reconstruido solo cuando sube
+# version_catalogo(). Cada palabra (sin tildes, minúsculas) de nombre,
+# descripción, opciones y categoría apunta a los productos donde aparece con
+# el peso de su campo; las palabras se encuentran por:
+#   - prefijo (vocabulario ordenado + bisect): "hambur" -> "hamburguesa",
+#   - trigramas (similitud de Jaccard): "amburgesa" -> "hamburguesa".
+# Cada palabra de la consulta debe encontrar algo; el puntaje suma el mejor
+# parecido por palabra × el peso del campo. Sin consultas a la base.
+
+PESOS = {'nombre': 3.0, 'categoria': 1.5, 'opciones': 1.0, 'descripcion': 0.5}
+SIMILITUD_MINIMA = 0.3
+MAX_PALABRAS = 6
+MAX_LARGO = 60
+MAX_PREFIJOS = 50  # "p" no debe recorrer medio vocabulario
+
+_indices = {}
+_PALABRA = re.compile(r'[a-z0-9]+')
+
+
+def palabras(texto):
+    return _PALABRA.findall(Cliente.texto_busqueda(texto))
+
+def trigramas(palabra):
+    relleno = f"  {palabra} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class IndiceBusqueda:
+    """
+    'productos': id -> datos para la respuesta. 'vocabulario': palabras
+    ordenadas. 'postings': palabra -> {producto_id: peso}. 'por_trigrama':
+    trigrama -> posiciones en el vocabulario.
+    """
+
+    def __init__(self, version, documentos):
+        self.version = version
+        self.productos = {}
+        postings = defaultdict(dict)
+        for doc in documentos:
+            self.productos[doc['id']] = {k: doc[k] for k in ('id', 'nombre', 'categoria', 'precio')}
+            for campo, peso in PESOS.items():
+                for palabra in palabras(doc[campo]):
+                    if postings[palabra].get(doc['id'], 0) < peso:
+                        postings[palabra][doc['id']] = peso
+
+        self.vocabulario = sorted(postings)
+        self.postings = [postings[p] for p in self.vocabulario]
+        self.trigramas = [trigramas(p) for p in self.vocabulario]
+        self.por_trigrama = defaultdict(list)
+        for posicion, grams in enumerate(self.trigramas):
+            for gram in grams:
+                self.por_trigrama[gram].append(posicion)
+
+    @classmethod
+    def construir(cls, version):
+        """Dos consultas: productos visibles con su categoría, y los nombres de sus opciones."""
+        documentos = {
+            p.id: {'id': p.id, 'nombre': p.nombre, 'categoria': p.categoria.nombre, 'precio': str(p.precio),
+                   'descripcion': p.descripcion or "", 'opciones': ""}
+            for p in Producto.objects.filter(disponible=True).select_related('categoria')
+        }
+        opciones = OpcionProducto.objects.filter(producto_id__in=documentos).values_list('producto_id', 'nombre')
+        for producto_id, nombre in opciones:
+            documentos[producto_id]['opciones'] += f" {nombre}"
+        return cls(version, documentos.values())
+
+    def _parecidas(self, palabra):
+        """{posición en el vocabulario: similitud} de las palabras que se parecen a la de la consulta."""
+        parecidas = {}
+        inicio = bisect_left(self.vocabulario, palabra)
+        for posicion in range(inicio, min(inicio + MAX_PREFIJOS, len(self.vocabulario))):
+            if not self.vocabulario[posicion].startswith(palabra):
+                break
+            parecidas[posicion] = 1.0 if self.vocabulario[posicion] == palabra else 0.9
+
+        if len(palabra) >= 3:
+            grams = trigramas(palabra)
+            compartidos = defaultdict(int)
+            for gram in grams:
+                for posicion in self.por_trigrama.get(gram, ()):
+                    compartidos[posicion] += 1
+            for posicion, n in compartidos.items():
+                similitud = n / (len(grams) + len(self.trigramas[posicion]) - n)
+                if similitud >= SIMILITUD_MINIMA and similitud > parecidas.get(posicion, 0):
+                    parecidas[posicion] = similitud
+        return parecidas
+
+    def buscar(self, texto, limite=20):
+        """Productos ordenados por puntaje (y nombre). Todas las palabras deben encontrar algo."""
+        consulta = list(dict.fromkeys(palabras(texto[:MAX_LARGO])))[:MAX_PALABRAS]
+        if not consulta:
+            return []
+
+        puntajes = None
+        for palabra in consulta:
+            mejores = {}
+            for posicion, similitud in self._parecidas(palabra).items():
+                for producto_id, peso in self.postings[posicion].items():
+                    puntaje = similitud * peso
+                    if puntaje > mejores.get(producto_id, 0):
+                        mejores[producto_id] = puntaje
+            if puntajes is None:
+                puntajes = mejores
+            else:
+                puntajes = {pid: puntajes[pid] + p for pid, p in mejores.items() if pid in puntajes}
+            if not puntajes:
+                return []
+
+        # Con miles de coincidencias ("de") no ordenamos todo: solo los primeros 'limite'
+        orden = heapq.nsmallest(limite, puntajes.items(), key=lambda par: (-par[1], self.productos[par[0]]['nombre']))
+        return [{**self.productos[pid], 'puntaje': round(puntaje, 3)} for pid, puntaje in orden]
+
+
+def obtener_indice_busqueda():
+    """Índice del negocio actual; solo se reconstruye si cambió la versión del catálogo."""
+    negocio_id = id_negocio_actual()
+    version = version_catalogo()
+    indice = _indices.get(negocio_id)
+    if indice is None or indice.version != version:
+        indice = IndiceBusqueda.construir(version)
+        _indices[negocio_id] = indice
+    return indice
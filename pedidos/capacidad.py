@@ -0,0 +1,95 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import ConfiguracionNegocio, Pedido
+
+# --- CAPACIDAD DE LA COCINA ---
+# Una foto de la carga (pedidos y unidades en RECIBIDO/COCINA, ritmo reciente
+# de despacho y los límites del negocio) vive en la caché. Menú y checkout la
+# leen sin consultas; se recalcula al crear/mover/borrar un pedido (señales en
+# models.py) o cuando vence CAPACIDAD_CACHE_TTL.
+
+CLAVE_CARGA = 'cocina:carga'
+ESTADOS_EN_COCINA = ('RECIBIDO', 'COCINA')
+ESTADOS_DESPACHADOS = ('RUTA', 'ENTREGADO')
+MUESTRA_MINIMA = 3  # con menos despachos en la ventana usamos el ritmo configurado
+
+
+class CargaCocina:
+    def __init__(self, pedidos, unidades, ritmo_hora, minutos_base, max_pedidos, max_unidades, max_espera):
+        self.pedidos = pedidos        # {estado: n}
+        self.unidades = unidades      # {estado: n}
+        self.ritmo_hora = ritmo_hora  # pedidos que salen de cocina por hora
+        self.minutos_base = minutos_base
+        self.max_pedidos = max_pedidos
+        self.max_unidades = max_unidades
+        self.max_espera = max_espera
+
+    @property
+    def en_cola(self):
+        return sum(self.pedidos.values())
+
+    @property
+    def unidades_en_cola(self):
+        return sum(self.unidades.values())
+
+    @property
+    def espera_minutos(self):
+        """Tiempo estimado para un pedido nuevo: preparación + lo que hay delante."""
+        if not self.ritmo_hora:
+            return self.minutos_base
+        return self.minutos_base + math.ceil(self.en_cola * 60 / self.ritmo_hora)
+
+    @property
+    def saturada(self):
+        return bool(
+            (self.max_pedidos and self.en_cola >= self.max_pedidos)
+            or (self.max_unidades and self.unidades_en_cola >= self.max_unidades)
+            or (self.max_espera and self.espera_minutos >= self.max_espera)
+        )
+
+    def admite(self):
+        """(admite, mensaje) para mostrar al cliente."""
+        if self.saturada:
+            return False, "🔥 La cocina está a tope. Pausamos los pedidos unos minutos, ¡vuelve pronto!"
+        return True, ""
+
+
+def calcular_carga(config, ahora=None):
+    ahora = ahora or timezone.now()
+    pedidos, unidades = {}, {}
+    filas = (Pedido.objects.filter(estado__in=ESTADOS_EN_COCINA)
+             .values('estado')
+             .annotate(n=Count('id', distinct=True), u=Sum('detalles__cantidad')))
+    for fila in filas:
+        pedidos[fila['estado']] = fila['n']
+        unidades[fila['estado']] = fila['u'] or 0
+
+    # Ritmo reciente: pedidos de la ventana que ya salieron de cocina
+    ventana = settings.CAPACIDAD_VENTANA_MINUTOS
+    despachados = Pedido.objects.filter(
+        fecha_creacion__gte=ahora - timedelta(minutes=ventana), estado__in=ESTADOS_DESPACHADOS,
+    ).count()
+    if despachados >= MUESTRA_MINIMA:
+        ritmo = despachados * 60 / ventana
+    else:
+        ritmo = config.cocina_pedidos_hora
+
+    return CargaCocina(pedidos, unidades, ritmo, config.cocina_minutos_base,
+                       config.cocina_max_pedidos, config.cocina_max_unidades, config.cocina_max_espera)
+
+def obtener_carga():
+    carga = cache.get(CLAVE_CARGA)
+    if carga is None:
+        config = ConfiguracionNegocio.objects.first() or ConfiguracionNegocio()
+        carga = calcular_carga(config)
+        cache.set(CLAVE_CARGA, carga, settings.CAPACIDAD_CACHE_TTL)
+    return carga
+
+def invalidar_carga():
+    cache.delete(CLAVE_CARGA)
@@ -0,0 +1,67 @@
+import re
+
+from .models import DetallePedido, Extra, OpcionProducto, PedidoArchivado, Producto
+
+# --- CLAVES DEL CARRITO ---
+# El carrito en sesión es {"producto-opcion-extras": cantidad}, con opcion = 0
+# si no hay y extras = ids separados por coma (o 0). Los precios no se
+# guardan: checkout siempre cobra los actuales.
+
+_ID = re.compile(r'[1-9][0-9]{0,17}')
+
+def ids_validos(valores):
+    """True si todos son ids positivos escritos como texto ('12'), como llegan del POST."""
+    return all(isinstance(v, str) and _ID.fullmatch(v) for v in valores)
+
+def clave_carrito(producto_id, opcion_id=None, extras_ids=()):
+    extras = sorted(str(e) for e in extras_ids)  # mismo orden que cart_add
+    return f"{producto_id}-{opcion_id or 0}-{','.join(extras) if extras else 0}"
+
+# --- REPETIR UN PEDIDO ---
+
+def _lineas_archivadas(archivado):
+    """Reconstruye (producto, opcion, extras, extras_pedidos, cantidad) desde el JSON del archivo."""
+    lineas = archivado.lineas
+    productos = Producto.objects.in_bulk({l['producto_id'] for l in lineas})
+    opciones = OpcionProducto.objects.in_bulk({l['opcion_id'] for l in lineas if l['opcion_id']})
+    extras = Extra.objects.in_bulk({e for l in lineas for e in l['extras_ids']})
+    for l in lineas:
+        opcion = opciones.get(l['opcion_id'])
+        if l['opcion_id'] and opcion is None:
+            opcion = OpcionProducto(nombre=l['opcion'], disponible=False)  # la borraron
+        yield (productos.get(l['producto_id']), opcion,
+               [extras[e] for e in l['extras_ids'] if e in extras], len(l['extras_ids']), l['cantidad'])
+
+def _lineas_pedido(pedido_id):
+    detalles = (DetallePedido.objects.filter(pedido_id=pedido_id)
+                .select_related('producto', 'opcion').prefetch_related('extras').order_by('id'))
+    for d in detalles:
+        extras = list(d.extras.all())
+        yield d.producto, d.opcion, extras, len(extras), d.cantidad
+
+def carrito_desde_pedido(pedido_id, archivado=False):
+    """
+    (cart, omitidos): cart listo para la sesión con las líneas que se pueden
+    volver a pedir; omitidos son textos para avisar al cliente de lo que quedó
+    fuera (producto u opción agotados, extras que ya no existen).
+    """
+    if archivado:
+        lineas = _lineas_archivadas(PedidoArchivado.objects.get(id=pedido_id))
+    else:
+        lineas = _lineas_pedido(pedido_id)
+
+    cart, omitidos = {}, []
+    for producto, opcion, extras, extras_pedidos, cantidad in lineas:
+        if producto is None or not producto.disponible:
+            omitidos.append(producto.nombre if producto else "Un producto que ya no está en el menú")
+            continue
+        if opcion is not None and not opcion.disponible:
+            omitidos.append(f"{producto.nombre} ({opcion.nombre})")
+            continue
+        vigentes = [e for e in extras if e.disponible]
+        if len(vigentes) < extras_pedidos:
+            omitidos.append(f"Algunos extras de {producto.nombre}")
+
+        clave = clave_carrito(producto.id, opcion.id if opcion else None, [e.id for e in vigentes])
+        cart[clave] = cart.get(clave, 0) + cantidad
+    return cart, omitidos
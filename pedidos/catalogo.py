@@ -0,0 +1,23 @@
+import time
+from django.core.cache import cache
+
+# --- VERSIÓN DEL CATÁLOGO ---
+# Cada cambio en categorías, productos, opciones o extras sube este número.
+# Es una marca de tiempo (segundos) para poder usarla también como Last-Modified.
+
+CLAVE_VERSION_CATALOGO = 'catalogo:version'
+
+def version_catalogo():
+    """Retorna la versión actual del catálogo (se crea la primera vez)."""
+    version = cache.get(CLAVE_VERSION_CATALOGO)
+    if version is None:
+        cache.add(CLAVE_VERSION_CATALOGO, int(time.time()), None)
+        version = cache.get(CLAVE_VERSION_CATALOGO)
+    return version
+
+def invalidar_catalogo():
+    """Sube la versión: todo lo cacheado con la versión anterior queda obsoleto."""
+    anterior = cache.get(CLAVE_VERSION_CATALOGO) or 0
+    nueva = max(int(time.time()), anterior + 1)
+    cache.set(CLAVE_VERSION_CATALOGO, nueva, None)
+    return nueva
@@ -0,0 +1,186 @@
+import re
+import uuid
+from heapq import merge
+
+from django.db import connection
+from django.db.models import Count, OuterRef, Subquery
+
+from .models import Cliente, DetallePedido, Pedido, PedidoArchivado
+from .tenencia import id_negocio_actual
+
+# --- CLIENTES QUE VUELVEN ---
+# Un solo formato para el teléfono (E.164, igual que manda el checkout:
+# '+50377778888') para que la búsqueda use el índice único de 'telefono'.
+
+CODIGO_SV = '503'
+MIN_PREFIJO = 4  # dígitos locales para empezar a buscar mientras se teclea
+
+def normalizar_telefono(texto):
+    """'7777-8888', '503 7777 8888', '+503 7777-8888' -> '+50377778888'. None si no sirve."""
+    if not texto:
+        return None
+    texto = texto.strip()
+    digitos = re.sub(r'\D', '', texto)
+    if digitos.startswith('00'):
+        digitos, texto = digitos[2:], '+' + digitos[2:]
+
+    if len(digitos) == 8 and digitos[0] in '267':
+        return f"+{CODIGO_SV}{digitos}"
+    if len(digitos) == 11 and digitos.startswith(CODIGO_SV) and digitos[3] in '267':
+        return f"+{digitos}"
+    if texto.startswith('+') and 8 <= len(digitos) <= 15 and not digitos.startswith(CODIGO_SV):
+        return f"+{digitos}"  # otro país: confiamos en el selector del checkout
+    return None
+
+def prefijo_telefono(texto):
+    """
+    Para buscar mientras se teclea: el número completo normalizado o, en El
+    Salvador, '+503' y los primeros MIN_PREFIJO dígitos o más ('7777 8' ->
+    '+50377778'). None si todavía no alcanza.
+    """
+    completo = normalizar_telefono(texto)
+    if completo:
+        return completo
+    digitos = re.sub(r'\D', '', texto or '')
+    if digitos.startswith('00'):
+        digitos = digitos[2:]
+    if digitos.startswith(CODIGO_SV):  # ningún número local empieza con 5
+        digitos = digitos[len(CODIGO_SV):]
+    if MIN_PREFIJO <= len(digitos) < 8 and digitos[0] in '267':
+        return f"+{CODIGO_SV}{digitos}"
+    return None
+
+def buscar_cliente(telefono):
+    """Cliente por teléfono exacto (ya normalizado) o None. Una consulta por índice único."""
+    return Cliente.objects.filter(telefono=telefono).only('nombre', 'apellido', 'direccion_ultima').first()
+
+def buscar_cliente_por_prefijo(prefijo):
+    """
+    El cliente cuyo teléfono empieza con 'prefijo' (de prefijo_telefono), solo
+    si es uno: con varios todavía falta teclear. LIKE 'prefijo%' va por el
+    índice de 'telefono' (en Postgres, el _like que Django crea para él).
+    """
+    encontrados = list(Cliente.objects.filter(telefono__startswith=prefijo)
+                       .only('nombre', 'apellido', 'direccion_ultima').order_by('telefono')[:2])
+    return encontrados[0] if len(encontrados) == 1 else None
+
+def guardar_cliente(telefono, nombre, apellido, direccion):
+    """
+    Crea o actualiza el cliente escribiendo solo lo que cambió: el que repite
+    con los mismos datos cuesta un SELECT y ningún UPDATE; si hay algo nuevo
+    va en un solo INSERT ... ON CONFLICT DO UPDATE con esos campos. Campos
+    vacíos no borran lo guardado.
+    """
+    datos = {'nombre': nombre or "", 'apellido': apellido or "", 'direccion_ultima': direccion or ""}
+    cliente = Cliente.objects.filter(telefono=telefono).first()
+    if cliente is None:
+        cambios = [campo for campo, valor in datos.items() if valor]
+    else:
+        cambios = [campo for campo, valor in datos.items() if valor and getattr(cliente, campo) != valor]
+        if not cambios:
+            return cliente
+
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        # Sin ON CONFLICT ... WHERE para el único parcial (cliente_telefono_sin_negocio)
+        if cliente is None:
+            cliente, creado = Cliente.objects.get_or_create(telefono=telefono, defaults=datos)
+            if creado:
+                return cliente
+        for campo in cambios:
+            setattr(cliente, campo, datos[campo])
+        cliente.save(update_fields=cambios)
+        return cliente
+
+    if cliente is not None:
+        for campo in cambios:
+            setattr(cliente, campo, datos[campo])
+        datos = {campo: getattr(cliente, campo) or "" for campo in datos}
+    datos['nombre_busqueda'] = Cliente.texto_busqueda(f"{datos['nombre']} {datos['apellido']}")
+    if {'nombre', 'apellido'} & set(cambios):
+        cambios.append('nombre_busqueda')
+    cliente_id = _upsert_cliente(id_negocio_actual(), telefono, datos, cambios)
+
+    if cliente is None:
+        cliente = Cliente(id=cliente_id, negocio_id=id_negocio_actual(), telefono=telefono, **datos)
+        cliente._state.adding, cliente._state.db = False, connection.alias
+    else:
+        cliente.nombre_busqueda = datos['nombre_busqueda']
+    return cliente
+
+def _upsert_cliente(negocio_id, telefono, datos, cambios):
+    """Id del cliente tras insertarlo o, si el teléfono ya existe en el negocio, actualizar 'cambios'."""
+    q = connection.ops.quote_name
+    columnas = ['negocio_id', 'telefono', *datos]
+    # El mismo índice único que usa el modelo: por negocio, o el parcial de los registros sin negocio
+    conflicto = f"({q('negocio_id')}, {q('telefono')})" if negocio_id else f"({q('telefono')}) WHERE {q('negocio_id')} IS NULL"
+    asignaciones = ", ".join(f"{q(c)} = excluded.{q(c)}" for c in cambios) or f"{q('telefono')} = excluded.{q('telefono')}"
+    sql = (
+        f"INSERT INTO {q(Cliente._meta.db_table)} ({', '.join(map(q, columnas))}) "
+        f"VALUES ({', '.join(['%s'] * len(columnas))}) "
+        f"ON CONFLICT {conflicto} DO UPDATE SET {asignaciones} RETURNING {q('id')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [negocio_id, telefono, *datos.values()])
+        return cursor.fetchone()[0]
+
+# --- DISPOSITIVO DEL CLIENTE (COOKIE FIRMADA) ---
+# El navegador recibe un id aleatorio en una cookie firmada y cada pedido hecho
+# desde él lo guarda en Pedido.dispositivo. El historial del perfil es el de
+# ese dispositivo, no el del teléfono: el teléfono lo teclea cualquiera y no se
+# verifica, así que no sirve para mostrar pedidos ni direcciones.
+
+COOKIE_DISPOSITIVO = 'fb_dispositivo'
+SAL_COOKIE = 'pedidos.dispositivo'
+DURACION_COOKIE = 60 * 60 * 24 * 365
+_DISPOSITIVO = re.compile(r'[0-9a-f]{32}')
+
+def nuevo_dispositivo():
+    return uuid.uuid4().hex
+
+def recordar_dispositivo(response, dispositivo):
+    response.set_signed_cookie(COOKIE_DISPOSITIVO, dispositivo, salt=SAL_COOKIE, max_age=DURACION_COOKIE,
+                               httponly=True, samesite='Lax')
+    return response
+
+def dispositivo_del_request(request):
+    """Id del dispositivo de la cookie firmada, o None si no hay / fue alterada / venció."""
+    valor = request.get_signed_cookie(COOKIE_DISPOSITIVO, default=None, salt=SAL_COOKIE, max_age=DURACION_COOKIE)
+    return valor if valor and _DISPOSITIVO.fullmatch(valor) else None
+
+def pidio_desde(cliente, dispositivo):
+    """¿Este cliente ya pidió desde este dispositivo? Solo entonces el autocompletar muestra su dirección."""
+    if not dispositivo:
+        return False
+    return (Pedido.objects.filter(dispositivo=dispositivo, cliente=cliente).exists()
+            or PedidoArchivado.objects.filter(dispositivo=dispositivo, cliente=cliente).exists())
+
+# --- HISTORIAL (PAGINACIÓN POR CURSOR) ---
+
+ESTADOS_FINALES = ('ENTREGADO', 'CANCELADO')
+_primer_producto = DetallePedido.objects.filter(pedido=OuterRef('pk')).order_by('id').values('producto__nombre')[:1]
+
+def historial_dispositivo(dispositivo, antes=None, por_pagina=20):
+    """
+    (pedidos, siguiente_cursor). Pedidos terminados del dispositivo con id <
+    antes, del más nuevo al más viejo, mezclando tablas calientes y archivo.
+    Cada fuente es una consulta por el índice (dispositivo, -id): el costo no
+    crece con el historial.
+    """
+    calientes = Pedido.objects.filter(dispositivo=dispositivo, estado__in=ESTADOS_FINALES)
+    archivados = PedidoArchivado.objects.filter(dispositivo=dispositivo)
+    if antes:
+        calientes, archivados = calientes.filter(id__lt=antes), archivados.filter(id__lt=antes)
+
+    calientes = calientes.order_by('-id').annotate(
+        num_lineas=Count('detalles'), primer_producto=Subquery(_primer_producto),
+    )[:por_pagina + 1]
+    archivados = archivados.order_by('-id')[:por_pagina + 1]
+
+    pedidos = list(merge(calientes, archivados, key=lambda p: p.id, reverse=True))[:por_pagina + 1]
+    if len(pedidos) > por_pagina:
+        return pedidos[:por_pagina], pedidos[por_pagina - 1].id
+    return pedidos, None
+
+def activos_dispositivo(dispositivo):
+    return (Pedido.objects.filter(dispositivo=dispositivo).exclude(estado__in=ESTADOS_FINALES)
+            .order_by('-id').annotate(num_lineas=Count('detalles')))
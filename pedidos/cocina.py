@@ -0,0 +1,96 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Aggregate, CharField, Count, OuterRef, Subquery, Sum
+
+from .models import DetallePedido
+
+# --- PANTALLA DE COCINA (KDS) ---
+# La cocina trabaja por producto, no por ticket: sumamos las líneas de todos
+# los pedidos en COCINA por estación + producto + opción + combinación de
+# extras, en una sola consulta agrupada. Un contador en caché
+# ('cocina:version') sube cada vez que un pedido entra o sale de COCINA; la
+# pantalla solo vuelve a pedir el tablero cuando cambia.
+
+CLAVE_VERSION_COCINA = 'cocina:version'
+SEPARADOR_EXTRAS = '|'
+
+
+class ConcatenarGrupo(Aggregate):
+    """GROUP_CONCAT / STRING_AGG según el motor (los extras de una línea en un texto)."""
+    function = 'GROUP_CONCAT'
+    template = "%(function)s(%(expressions)s, '" + SEPARADOR_EXTRAS + "')"
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='STRING_AGG',
+                              template="%(function)s(%(expressions)s::text, '" + SEPARADOR_EXTRAS + "')",
+                              **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection,
+                              template="%(function)s(%(expressions)s SEPARATOR '" + SEPARADOR_EXTRAS + "')",
+                              **extra_context)
+
+
+def tablero_cocina():
+    """
+    [{'estacion', 'items': [{'producto', 'opcion', 'extras', 'cantidad', 'pedidos', 'clave'}]}]
+    ordenado por estación y, dentro, por cantidad (lo que más hay que cocinar arriba).
+    """
+    extras_linea = (DetallePedido.extras.through.objects
+                    .filter(detallepedido_id=OuterRef('pk'))
+                    .values('detallepedido_id')
+                    .annotate(nombres=ConcatenarGrupo('extra__nombre'))
+                    .values('nombres'))
+
+    filas = (DetallePedido.objects.filter(pedido__estado='COCINA')
+             .annotate(combo=Subquery(extras_linea))
+             .values('producto__categoria__estacion', 'producto_id', 'producto__nombre',
+                     'opcion_id', 'opcion__nombre', 'combo')
+             .annotate(cantidad=Sum('cantidad'), pedidos=Count('pedido_id', distinct=True))
+             .order_by())
+
+    # El orden dentro del GROUP_CONCAT no está garantizado: normalizamos la
+    # combinación y juntamos los grupos que solo difieren en el orden.
+    grupos = {}
+    for f in filas:
+        extras = tuple(sorted(f['combo'].split(SEPARADOR_EXTRAS))) if f['combo'] else ()
+        estacion = f['producto__categoria__estacion'] or "Cocina"
+        clave = (estacion, f['producto_id'], f['opcion_id'] or 0, extras)
+        item = grupos.get(clave)
+        if item is None:
+            grupos[clave] = {
+                'estacion': estacion,
+                'producto': f['producto__nombre'],
+                'opcion': f['opcion__nombre'] or "",
+                'extras': list(extras),
+                'cantidad': f['cantidad'],
+                'pedidos': f['pedidos'],
+                'clave': f"{f['producto_id']}-{f['opcion_id'] or 0}-{'+'.join(extras)}",
+            }
+        else:
+            item['cantidad'] += f['cantidad']
+            item['pedidos'] += f['pedidos']
+
+    estaciones = {}
+    for item in grupos.values():
+        estaciones.setdefault(item.pop('estacion'), []).append(item)
+    return [
+        {'estacion': nombre, 'items': sorted(items, key=lambda i: (-i['cantidad'], i['producto']))}
+        for nombre, items in sorted(estaciones.items())
+    ]
+
+def version_cocina():
+    """Versión actual del tablero (marca de tiempo inicial para no repetirse si la caché se vacía)."""
+    version = cache.get(CLAVE_VERSION_COCINA)
+    if version is None:
+        cache.add(CLAVE_VERSION_COCINA, int(time.time()), None)
+        version = cache.get(CLAVE_VERSION_COCINA)
+    return version
+
+def avisar_cambio_cocina():
+    try:
+        cache.incr(CLAVE_VERSION_COCINA)
+    except ValueError:
+        cache.add(CLAVE_VERSION_COCINA, int(time.time()), None)
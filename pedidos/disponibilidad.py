@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .carrito import ids_validos
+from .models import Extra, OpcionProducto, Producto
+
+# --- DISPONIBILIDAD (AGOTADOS) ---
+# Tres bitmaps (enteros de Python) con un bit encendido por cada id agotado:
+# productos, opciones y extras. Viven en la caché con una versión; el menú
+# abierto pregunta con su versión y solo recibe algo si cambió, y checkout
+# valida el carrito completo contra los bitmaps sin consultar la base.
+
+CLAVE_ESTADO = 'disponibilidad:estado'
+CLAVE_VERSION = 'disponibilidad:version'
+
+
+def _bitmap(ids):
+    bits = 0
+    for i in ids:
+        bits |= 1 << i
+    return bits
+
+def _hex(bits):
+    return format(bits, 'x')
+
+
+class Disponibilidad:
+    def __init__(self, version, productos, opciones, extras):
+        self.version = version
+        self.productos, self.opciones, self.extras = productos, opciones, extras
+
+    def producto_agotado(self, producto_id):
+        return bool(self.productos >> int(producto_id) & 1)
+
+    def opcion_agotada(self, opcion_id):
+        return bool(self.opciones >> int(opcion_id) & 1)
+
+    def extra_agotado(self, extra_id):
+        return bool(self.extras >> int(extra_id) & 1)
+
+    def para_json(self):
+        """Bitmaps en hexadecimal: el navegador los lee con BigInt."""
+        return {'version': self.version, 'productos': _hex(self.productos),
+                'opciones': _hex(self.opciones), 'extras': _hex(self.extras)}
+
+    def claves_agotadas(self, cart):
+        """
+        Claves del carrito ("prod-opcion-extras") con algo agotado. Sin
+        consultas. Una clave que no se entiende (carritos de antes de validar
+        cart_add) cuenta como agotada: checkout la quita en vez de fallar.
+        """
+        agotadas = []
+        for clave in cart:
+            partes = clave.split('-')
+            opciones = [partes[1]] if len(partes) > 1 and partes[1] != "0" else []
+            extras = partes[2].split(',') if len(partes) > 2 and partes[2] != "0" else []
+            if len(partes) > 3 or not ids_validos([partes[0], *opciones, *extras]):
+                agotadas.append(clave)
+            elif (self.producto_agotado(partes[0]) or any(map(self.opcion_agotada, opciones))
+                    or any(map(self.extra_agotado, extras))):
+                agotadas.append(clave)
+        return agotadas
+
+
+def version_disponibilidad():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, int(time.time()), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+def obtener_disponibilidad():
+    estado = cache.get(CLAVE_ESTADO)
+    version = version_disponibilidad()
+    if estado is None or estado.version != version:
+        estado = Disponibilidad(
+            version,
+            _bitmap(Producto.objects.filter(disponible=False).values_list('id', flat=True)),
+            _bitmap(OpcionProducto.objects.filter(disponible=False).values_list('id', flat=True)),
+            _bitmap(Extra.objects.filter(disponible=False).values_list('id', flat=True)),
+        )
+        cache.set(CLAVE_ESTADO, estado, settings.DISPONIBILIDAD_CACHE_TTL)
+    return estado
+
+def invalidar_disponibilidad():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, int(time.time()), None)
@@ -0,0 +1,34 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+# --- ARCHIVOS ESTÁTICOS EN WSGI Y ASGI ---
+# WhiteNoiseMiddleware es solo sync: bajo ASGI obligaría a Django a pasar cada
+# petición por un hilo, y las vistas async de pago quedarían ocupando uno
+# mientras esperan al banco. Esta versión sirve igual los estáticos (búsqueda
+# en memoria + archivo abierto) y deja pasar el resto sin cambiar de modo.
+
+
+class EstaticosMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _archivo(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self._archivo(request)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,214 @@
+import calendar
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ConfiguracionNegocio, DiaEspecial, ReglaHorario, TurnoHorario
+
+# --- MOTOR DE HORARIO ---
+# Prioridad para decidir un día: DiaEspecial (fecha puntual) > ReglaHorario
+# (recurrente) > turnos semanales > horario global de la configuración.
+# resolver_dias() decide un rango de días con 3 consultas en total, y
+# compilar_indice() convierte unos días en intervalos ordenados para
+# responder "¿está abierto a esta hora?" con una búsqueda binaria.
+
+NOMBRES_DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+ORDEN_REGLAS = {'ANUAL': 0, 'NESIMO': 1, 'RANGO': 2}  # la más específica gana
+
+def dias_abiertos(config):
+    """Los 7 switches globales en orden de weekday() (0 = lunes)."""
+    return [
+        config.lunes_abierto, config.martes_abierto, config.miercoles_abierto,
+        config.jueves_abierto, config.viernes_abierto, config.sabado_abierto,
+        config.domingo_abierto
+    ]
+
+def excepciones_en_rango(desde, hasta):
+    """{fecha: DiaEspecial} entre desde y hasta (inclusive), en una consulta."""
+    return {e.fecha: e for e in DiaEspecial.objects.filter(fecha__range=(desde, hasta))}
+
+def turnos_por_dia(config):
+    """{weekday: [(apertura, cierre), ...]} de los turnos configurados."""
+    turnos = {}
+    for t in TurnoHorario.objects.filter(configuracion=config):
+        turnos.setdefault(t.dia_semana, []).append((t.hora_apertura, t.hora_cierre))
+    return turnos
+
+def resolver_dias(config, desde, hasta):
+    """
+    {fecha: dia} para cada fecha del rango, donde dia es un dict con:
+    abierto, turnos [(apertura, cierre)], motivo, origen ('global', 'regla',
+    'excepcion') y excepcion (el DiaEspecial o None).
+    """
+    excepciones = excepciones_en_rango(desde, hasta)
+    reglas = sorted(ReglaHorario.objects.all(), key=lambda r: ORDEN_REGLAS.get(r.tipo, 9))
+    turnos = turnos_por_dia(config)
+    defaults_globales = dias_abiertos(config)
+    horario_global = [(config.hora_apertura, config.hora_cierre)]
+
+    dias = {}
+    fecha = desde
+    while fecha <= hasta:
+        idx = fecha.weekday()
+        turnos_semana = turnos.get(idx, horario_global)
+        dia = {'abierto': defaults_globales[idx], 'turnos': turnos_semana, 'motivo': "",
+               'origen': 'global', 'excepcion': None}
+
+        manda = excepciones.get(fecha) or next((r for r in reglas if r.aplica(fecha)), None)
+        if manda is not None:
+            dia['origen'] = 'excepcion' if isinstance(manda, DiaEspecial) else 'regla'
+            dia['excepcion'] = manda if isinstance(manda, DiaEspecial) else None
+            dia['abierto'] = manda.abierto
+            dia['motivo'] = manda.motivo or ""
+            if manda.hora_apertura or manda.hora_cierre:
+                dia['turnos'] = [(manda.hora_apertura or config.hora_apertura,
+                                  manda.hora_cierre or config.hora_cierre)]
+
+        dias[fecha] = dia
+        fecha += timedelta(days=1)
+    return dias
+
+# --- AGENDA (PANTALLA DE CONFIGURACIÓN) ---
+
+def construir_agenda(config, desde, dias=7, hoy=None):
+    hoy = hoy or date.today()
+    resueltos = resolver_dias(config, desde, desde + timedelta(days=dias - 1))
+
+    agenda = []
+    for fecha_iter, dia in resueltos.items():
+        idx = fecha_iter.weekday()
+        diferencia = (fecha_iter - hoy).days
+        agenda.append({
+            'fecha': fecha_iter,
+            'fecha_str': fecha_iter.strftime("%Y-%m-%d"),
+            'nombre_dia': "HOY" if diferencia == 0 else ("MAÑANA" if diferencia == 1 else NOMBRES_DIAS[idx]),
+            'fecha_fmt': fecha_iter.strftime("%d/%m"),
+            'abierto': dia['abierto'],
+            'hora_ini': dia['turnos'][0][0],
+            'hora_fin': dia['turnos'][-1][1],
+            'turnos': dia['turnos'],
+            'motivo': dia['motivo'],
+            'id_db': dia['excepcion'].id if dia['excepcion'] else None,
+            'es_excepcion': dia['origen'] == 'excepcion',
+            'es_regla': dia['origen'] == 'regla',
+        })
+    return agenda
+
+def calendario_mes(config, anio, mes):
+    """Agenda de un mes completo, lista para JSON."""
+    dias = calendar.monthrange(anio, mes)[1]
+    return [
+        {
+            'fecha': d['fecha_str'],
+            'dia_semana': d['fecha'].weekday(),
+            'abierto': d['abierto'],
+            'hora_apertura': d['hora_ini'].strftime('%H:%M'),
+            'hora_cierre': d['hora_fin'].strftime('%H:%M'),
+            'turnos': [(a.strftime('%H:%M'), c.strftime('%H:%M')) for a, c in d['turnos']],
+            'motivo': d['motivo'] or "",
+            'es_excepcion': d['es_excepcion'],
+            'es_regla': d['es_regla'],
+        }
+        for d in construir_agenda(config, date(anio, mes, 1), dias)
+    ]
+
+def limpiar_excepciones_pasadas(hoy=None):
+    """Borra los DiaEspecial que ya pasaron. Retorna cuántos borró."""
+    borrados, _ = DiaEspecial.objects.filter(fecha__lt=hoy or date.today()).delete()
+    return borrados
+
+# --- ÍNDICE COMPILADO (¿ABIERTO AHORA?) ---
+
+class IndiceHorario:
+    """
+    Intervalos [inicio, fin] disjuntos (fin inclusive, como el horario original)
+    ordenados por inicio, más lo necesario para armar el mensaje de cierre y validar la
+    suscripción sin tocar la base.
+    """
+
+    def __init__(self, desde, hasta, intervalos, dias, mensaje_cierre, fecha_vencimiento):
+        self.desde, self.hasta = desde, hasta
+        self.intervalos = intervalos
+        self.inicios = [i[0] for i in intervalos]
+        self.dias = dias
+        self.mensaje_cierre = mensaje_cierre
+        self.fecha_vencimiento = fecha_vencimiento
+
+    def cubre(self, fecha):
+        return self.desde <= fecha <= self.hasta
+
+    def suscripcion_activa(self, hoy):
+        return not (self.fecha_vencimiento and hoy >= self.fecha_vencimiento)
+
+    def abierto_en(self, momento):
+        i = bisect_right(self.inicios, momento) - 1
+        return i >= 0 and momento <= self.intervalos[i][1]
+
+    def estado_en(self, momento):
+        """(abierto, mensaje) igual que verificar_estado_negocio()."""
+        if self.abierto_en(momento):
+            return True, ""
+
+        dia = self.dias.get(momento.date())
+        if dia is None:
+            return False, self.mensaje_cierre
+        if not dia['abierto']:
+            if dia['origen'] != 'global':
+                return False, f"{self.mensaje_cierre} ({dia['motivo']})"
+            return False, self.mensaje_cierre
+
+        rangos = ", ".join(
+            f"{a.strftime('%I:%M %p').lower()} - {c.strftime('%I:%M %p').lower()}" for a, c in dia['turnos']
+        )
+        return False, f"{self.mensaje_cierre} (Hoy: {rangos})"
+
+def compilar_indice(config, desde, dias):
+    hasta = desde + timedelta(days=dias - 1)
+    resueltos = resolver_dias(config, desde, hasta)
+
+    intervalos = []
+    for fecha, dia in resueltos.items():
+        if not dia['abierto']:
+            continue
+        for apertura, cierre in dia['turnos']:
+            inicio = datetime.combine(fecha, apertura)
+            fin = datetime.combine(fecha if apertura < cierre else fecha + timedelta(days=1), cierre)
+            intervalos.append((inicio, fin))
+    intervalos.sort()
+
+    # Fusionamos los que se traslapan (p. ej. un turno que cruza la medianoche
+    # con el primero del día siguiente) para que queden disjuntos.
+    fusionados = []
+    for inicio, fin in intervalos:
+        if fusionados and inicio <= fusionados[-1][1]:
+            fusionados[-1] = (fusionados[-1][0], max(fusionados[-1][1], fin))
+        else:
+            fusionados.append((inicio, fin))
+
+    dias_msg = {f: {'abierto': d['abierto'], 'turnos': d['turnos'], 'motivo': d['motivo'], 'origen': d['origen']}
+                for f, d in resueltos.items()}
+    return IndiceHorario(desde, hasta, fusionados, dias_msg, config.mensaje_cierre, config.fecha_vencimiento)
+
+CLAVE_INDICE = 'horario:indice'
+
+def obtener_indice(hoy=None):
+    """
+    Índice compilado desde la caché. Solo se recompila si no está, si el día
+    cayó fuera de la ventana o si algo del horario cambió (señales en models.py).
+    """
+    hoy = hoy or date.today()
+    indice = cache.get(CLAVE_INDICE)
+    if indice is None or not indice.cubre(hoy):
+        config = ConfiguracionNegocio.objects.first()
+        if not config:
+            config = ConfiguracionNegocio.objects.create()
+            config.refresh_from_db()
+        # Desde ayer: un turno de anoche que cruza la medianoche sigue vigente hoy
+        indice = compilar_indice(config, hoy - timedelta(days=1), settings.HORARIO_VENTANA_DIAS + 1)
+        cache.set(CLAVE_INDICE, indice, settings.HORARIO_CACHE_TTL)
+    return indice
+
+def invalidar_horario():
+    cache.delete(CLAVE_INDICE)
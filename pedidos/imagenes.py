@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# --- VARIANTES DE IMAGEN (MINIATURAS RESPONSIVAS) ---
+# Cada foto de producto se guarda además en estos anchos, en WebP y JPEG,
+# junto al original: productos/foto.jpeg -> productos/foto_w320.webp
+
+ANCHOS = (80, 160, 320, 640, 960)
+FORMATOS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+CALIDAD = 80
+
+def nombre_variante(nombre_original, ancho, formato):
+    base, _ = os.path.splitext(nombre_original)
+    return f"{base}_w{ancho}.{formato}"
+
+def generar_variantes(nombre_original, storage=None):
+    """
+    Genera las variantes de una imagen ya subida. Retorna el dict que se guarda
+    en Producto.imagen_variantes:
+    {'original': nombre, 'ancho': px, 'webp': {'320': nombre, ...}, 'jpeg': {...}}
+    No agranda: solo se generan anchos menores al original.
+    """
+    storage = storage or default_storage
+    with storage.open(nombre_original, 'rb') as f:
+        imagen = Image.open(f)
+        imagen = ImageOps.exif_transpose(imagen)
+        imagen.load()
+
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'transparency' in imagen.info else 'RGB')
+
+    resultado = {'original': nombre_original, 'ancho': imagen.width}
+    for formato, formato_pil in FORMATOS.items():
+        resultado[formato] = {}
+        for ancho in ANCHOS:
+            if ancho >= imagen.width:
+                break
+            alto = round(imagen.height * ancho / imagen.width)
+            copia = imagen.resize((ancho, alto), Image.LANCZOS)
+            if formato_pil == 'JPEG' and copia.mode != 'RGB':
+                copia = copia.convert('RGB')
+
+            buffer = BytesIO()
+            copia.save(buffer, formato_pil, quality=CALIDAD, optimize=True)
+            nombre = nombre_variante(nombre_original, ancho, formato)
+            if storage.exists(nombre):
+                storage.delete(nombre)
+            resultado[formato][str(ancho)] = storage.save(nombre, ContentFile(buffer.getvalue()))
+    return resultado
+
+def _generar_en_proceso(args):
+    producto_id, nombre_original = args
+    try:
+        return producto_id, generar_variantes(nombre_original), None
+    except Exception as e:
+        return producto_id, None, str(e)
+
+def generar_variantes_lote(pendientes, procesos=None):
+    """
+    pendientes: lista de (producto_id, nombre_imagen).
+    Las imágenes se procesan en paralelo (Pillow es CPU puro). Retorna una
+    lista de (producto_id, variantes, error).
+    """
+    if procesos == 1:
+        return [_generar_en_proceso(p) for p in pendientes]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return list(pool.map(_generar_en_proceso, pendientes))
+
+def srcset(variantes, formato, url_original=None):
+    """Arma el atributo srcset a partir de Producto.imagen_variantes."""
+    partes = [
+        f"{default_storage.url(nombre)} {ancho}w"
+        for ancho, nombre in sorted(variantes.get(formato, {}).items(), key=lambda x: int(x[0]))
+    ]
+    if url_original and variantes.get('ancho'):
+        partes.append(f"{url_original} {variantes['ancho']}w")
+    return ", ".join(partes)
+
+def url_miniatura(producto, ancho):
+    """URL de la variante JPEG más chica que cubra 'ancho' px (o la original)."""
+    variantes = producto.imagen_variantes or {}
+    if variantes.get('original') == producto.imagen.name:
+        for w, nombre in sorted(variantes.get('jpeg', {}).items(), key=lambda x: int(x[0])):
+            if int(w) >= ancho:
+                return default_storage.url(nombre)
+    return producto.imagen.url
@@ -0,0 +1,337 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from .catalogo import invalidar_catalogo
+from .models import Categoria, Extra, OpcionProducto, Producto
+
+# --- IMPORTAR / EXPORTAR EL CATÁLOGO ---
+# El catálogo completo (categorías, extras, productos con sus opciones y los
+# extras que aceptan) como JSON o CSV. Al importar se compara en memoria con la
+# base y solo se escribe lo que cambió, con bulk_create/bulk_update en una
+# transacción: sin señales por fila y una sola subida de versión del catálogo.
+#
+# Las filas se reconocen por nombre (categoría, extra, producto; opción dentro
+# de su producto). Nada se borra: con 'retirar' lo que no viene en el archivo
+# queda como no disponible, porque los pedidos viejos siguen apuntando a ello.
+
+CAMPOS_CSV = ['tipo', 'nombre', 'categoria', 'producto', 'descripcion', 'precio', 'disponible', 'orden', 'estacion', 'extras']
+SEPARADOR_EXTRAS = '|'
+CENTAVOS = Decimal('0.01')
+
+
+# --- EXPORTAR ---
+
+def exportar_catalogo():
+    """El catálogo como dict listo para json.dumps (4 consultas)."""
+    productos = (Producto.objects.select_related('categoria').prefetch_related('opciones', 'extras')
+                 .order_by('categoria__orden', 'categoria_id', 'id'))
+    return {
+        'categorias': [
+            {'nombre': c.nombre, 'orden': c.orden, 'estacion': c.estacion}
+            for c in Categoria.objects.order_by('orden', 'id')
+        ],
+        'extras': [
+            {'nombre': e.nombre, 'precio': str(e.precio), 'disponible': e.disponible}
+            for e in Extra.objects.order_by('id')
+        ],
+        'productos': [
+            {
+                'nombre': p.nombre, 'categoria': p.categoria.nombre, 'descripcion': p.descripcion or "",
+                'precio': str(p.precio), 'disponible': p.disponible,
+                'opciones': [
+                    {'nombre': o.nombre, 'precio_extra': str(o.precio_extra), 'disponible': o.disponible}
+                    for o in sorted(p.opciones.all(), key=lambda o: o.id)
+                ],
+                'extras': [e.nombre for e in sorted(p.extras.all(), key=lambda e: e.id)],
+            }
+            for p in productos
+        ],
+    }
+
+def catalogo_a_csv(datos):
+    """Una fila por categoría, extra, producto y opción (columna 'tipo')."""
+    salida = io.StringIO()
+    escritor = csv.DictWriter(salida, fieldnames=CAMPOS_CSV)
+    escritor.writeheader()
+    for c in datos['categorias']:
+        escritor.writerow({'tipo': 'categoria', **c})
+    for e in datos['extras']:
+        escritor.writerow({'tipo': 'extra', **e})
+    for p in datos['productos']:
+        escritor.writerow({
+            'tipo': 'producto', 'nombre': p['nombre'], 'categoria': p['categoria'], 'descripcion': p['descripcion'],
+            'precio': p['precio'], 'disponible': p['disponible'], 'extras': SEPARADOR_EXTRAS.join(p['extras']),
+        })
+        for o in p['opciones']:
+            escritor.writerow({
+                'tipo': 'opcion', 'nombre': o['nombre'], 'producto': p['nombre'],
+                'precio': o['precio_extra'], 'disponible': o['disponible'],
+            })
+    return salida.getvalue()
+
+
+# --- LEER ARCHIVOS ---
+
+def catalogo_desde_csv(texto):
+    datos = {'categorias': [], 'extras': [], 'productos': []}
+    productos = {}
+    for n, fila in enumerate(csv.DictReader(io.StringIO(texto)), start=2):
+        tipo = (fila.get('tipo') or '').strip().lower()
+        if tipo == 'categoria':
+            datos['categorias'].append({k: fila[k] for k in ('nombre', 'orden', 'estacion') if fila.get(k) not in (None, '')})
+        elif tipo == 'extra':
+            datos['extras'].append({'nombre': fila['nombre'], 'precio': fila['precio'], 'disponible': fila.get('disponible', '')})
+        elif tipo == 'producto':
+            producto = {
+                'nombre': fila['nombre'], 'categoria': fila['categoria'], 'descripcion': fila.get('descripcion', ''),
+                'precio': fila['precio'], 'disponible': fila.get('disponible', ''), 'opciones': [],
+                'extras': [e.strip() for e in (fila.get('extras') or '').split(SEPARADOR_EXTRAS) if e.strip()],
+            }
+            productos[producto['nombre'].strip()] = producto
+            datos['productos'].append(producto)
+        elif tipo == 'opcion':
+            producto = productos.get((fila.get('producto') or '').strip())
+            if producto is None:
+                raise ValidationError(f"Fila {n}: la opción '{fila['nombre']}' va después de su producto.")
+            producto['opciones'].append({'nombre': fila['nombre'], 'precio_extra': fila['precio'], 'disponible': fila.get('disponible', '')})
+        else:
+            raise ValidationError(f"Fila {n}: tipo '{tipo}' desconocido.")
+    return datos
+
+def leer_catalogo(texto, formato):
+    """Texto del archivo a dict. formato: 'json' o 'csv'."""
+    if formato == 'csv':
+        return catalogo_desde_csv(texto)
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError as e:
+        raise ValidationError(f"JSON inválido: {e}")
+
+
+# --- NORMALIZAR ---
+
+def _decimal(valor, donde):
+    try:
+        return Decimal(str(valor).strip() or '0').quantize(CENTAVOS)
+    except InvalidOperation:
+        raise ValidationError(f"{donde}: precio inválido '{valor}'.")
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() not in ('0', 'false', 'no', 'falso', 'n')  # vacío = disponible
+
+def _entero(valor, donde):
+    try:
+        return int(valor or 0)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{donde}: número inválido '{valor}'.")
+
+def _filas(valor, que):
+    """La lista de filas (dicts) de una sección; None o ausente = vacía."""
+    if valor is None:
+        return []
+    if not isinstance(valor, list) or not all(isinstance(fila, dict) for fila in valor):
+        raise ValidationError(f"{que}: se esperaba una lista de objetos.")
+    return valor
+
+def _nombre(fila, donde):
+    nombre = str(fila.get('nombre') or '').strip()
+    if not nombre:
+        raise ValidationError(f"{donde}: falta el nombre.")
+    return nombre
+
+def _sin_repetir(nombres, que):
+    vistos = set()
+    for nombre in nombres:
+        if nombre in vistos:
+            raise ValidationError(f"{que} repetido en el archivo: '{nombre}'.")
+        vistos.add(nombre)
+
+
+# --- IMPORTAR (DIFF + APLICAR) ---
+
+class _Cambios:
+    """Objetos nuevos y cambiados de un modelo, con los campos que cambiaron."""
+    def __init__(self):
+        self.nuevos, self.cambiados, self.campos = [], [], set()
+
+    def comparar(self, obj, valores):
+        campos = [k for k, v in valores.items() if getattr(obj, k) != v]
+        for k in campos:
+            setattr(obj, k, valores[k])
+        if campos:
+            self.cambiados.append(obj)
+            self.campos.update(campos)
+
+    def aplicar(self, modelo):
+        if self.nuevos:
+            modelo.objects.bulk_create(self.nuevos, batch_size=500)
+        if self.cambiados:
+            modelo.objects.bulk_update(self.cambiados, sorted(self.campos), batch_size=500)
+
+    def resumen(self):
+        return {'nuevos': len(self.nuevos), 'cambiados': len(self.cambiados)}
+
+def _rellenar_ids(modelo, nuevos, por_nombre):
+    """Bases sin RETURNING en bulk_create (MySQL): recuperamos los ids por nombre."""
+    if not nuevos or connection.features.can_return_rows_from_bulk_insert:
+        return
+    ids = dict(modelo.objects.filter(nombre__in=[o.nombre for o in nuevos]).order_by('id').values_list('nombre', 'id'))
+    for obj in nuevos:
+        obj.pk = ids[obj.nombre]
+        por_nombre[obj.nombre] = obj
+
+def _por_nombre(queryset):
+    """{nombre: obj}; si la base tiene nombres repetidos gana el más viejo."""
+    mapa = {}
+    for obj in queryset.order_by('-id'):
+        mapa[obj.nombre] = obj
+    return mapa
+
+def importar_catalogo(datos, retirar=False, simular=False):
+    """
+    Aplica el catálogo 'datos' (ver exportar_catalogo) y retorna el resumen
+    {modelo: {'nuevos', 'cambiados'[, 'retirados']}, 'enlaces_extras': {...}}.
+    Con simular=True calcula lo mismo pero deshace todo al final.
+    """
+    if not isinstance(datos, dict):
+        raise ValidationError("El catálogo debe ser un objeto con 'categorias', 'extras' y 'productos'.")
+    categorias_in = _filas(datos.get('categorias'), "Categorías")
+    extras_in = _filas(datos.get('extras'), "Extras")
+    productos_in = _filas(datos.get('productos'), "Productos")
+    for fila in productos_in:
+        _filas(fila.get('opciones'), f"Opciones de '{fila.get('nombre')}'")
+        if not isinstance(fila.get('extras') or [], list):
+            raise ValidationError(f"Producto '{fila.get('nombre')}': 'extras' debe ser una lista de nombres.")
+    _sin_repetir([_nombre(c, "Categoría") for c in categorias_in], "Categoría")
+    _sin_repetir([_nombre(e, "Extra") for e in extras_in], "Extra")
+    _sin_repetir([_nombre(p, "Producto") for p in productos_in], "Producto")
+
+    with transaction.atomic():
+        categorias = _por_nombre(Categoria.objects.all())
+        extras = _por_nombre(Extra.objects.all())
+        productos = _por_nombre(Producto.objects.all())
+        resumen = {}
+
+        # 1. Categorías
+        cambios = _Cambios()
+        for fila in categorias_in:
+            nombre = _nombre(fila, "Categoría")
+            valores = {}
+            if 'orden' in fila:
+                valores['orden'] = _entero(fila['orden'], f"Categoría '{nombre}'")
+            if 'estacion' in fila:
+                valores['estacion'] = str(fila['estacion']).strip() or "Cocina"
+            if nombre in categorias:
+                cambios.comparar(categorias[nombre], valores)
+            else:
+                categorias[nombre] = Categoria(nombre=nombre, **valores)
+                cambios.nuevos.append(categorias[nombre])
+        cambios.aplicar(Categoria)
+        _rellenar_ids(Categoria, cambios.nuevos, categorias)
+        resumen['categorias'] = cambios.resumen()
+
+        # 2. Extras
+        cambios = _Cambios()
+        for fila in extras_in:
+            nombre = _nombre(fila, "Extra")
+            valores = {'precio': _decimal(fila.get('precio'), f"Extra '{nombre}'"),
+                       'disponible': _booleano(fila.get('disponible', True))}
+            if nombre in extras:
+                cambios.comparar(extras[nombre], valores)
+            else:
+                extras[nombre] = Extra(nombre=nombre, **valores)
+                cambios.nuevos.append(extras[nombre])
+        cambios.aplicar(Extra)
+        _rellenar_ids(Extra, cambios.nuevos, extras)
+        resumen['extras'] = cambios.resumen()
+
+        # 3. Productos
+        cambios = _Cambios()
+        for fila in productos_in:
+            nombre = _nombre(fila, "Producto")
+            categoria = categorias.get(str(fila.get('categoria') or '').strip())
+            if categoria is None:
+                raise ValidationError(f"Producto '{nombre}': la categoría '{fila.get('categoria')}' no existe.")
+            valores = {'categoria_id': categoria.pk, 'descripcion': fila.get('descripcion') or "",
+                       'precio': _decimal(fila.get('precio'), f"Producto '{nombre}'"),
+                       'disponible': _booleano(fila.get('disponible', True))}
+            if nombre in productos:
+                if productos[nombre].descripcion is None and not valores['descripcion']:
+                    valores['descripcion'] = None  # NULL y "" son lo mismo para el menú
+                cambios.comparar(productos[nombre], valores)
+            else:
+                productos[nombre] = Producto(nombre=nombre, **valores)
+                cambios.nuevos.append(productos[nombre])
+        cambios.aplicar(Producto)
+        _rellenar_ids(Producto, cambios.nuevos, productos)
+        resumen['productos'] = cambios.resumen()
+
+        # 4. Opciones de los productos del archivo
+        importados = [productos[_nombre(f, "Producto")] for f in productos_in]
+        ids_importados = [p.pk for p in importados]
+        opciones = {(o.producto_id, o.nombre): o for o in OpcionProducto.objects.filter(producto_id__in=ids_importados).order_by('-id')}
+        cambios, vistas = _Cambios(), set()
+        for producto, fila in zip(importados, productos_in):
+            nombres = [_nombre(o, f"Opción de '{producto.nombre}'") for o in fila.get('opciones') or []]
+            _sin_repetir(nombres, f"Opción de '{producto.nombre}'")
+            for nombre, o in zip(nombres, fila.get('opciones') or []):
+                valores = {'precio_extra': _decimal(o.get('precio_extra'), f"Opción '{nombre}'"),
+                           'disponible': _booleano(o.get('disponible', True))}
+                clave = (producto.pk, nombre)
+                vistas.add(clave)
+                if clave in opciones:
+                    cambios.comparar(opciones[clave], valores)
+                else:
+                    cambios.nuevos.append(OpcionProducto(producto_id=producto.pk, nombre=nombre, **valores))
+        cambios.aplicar(OpcionProducto)
+        resumen['opciones'] = cambios.resumen()
+        if retirar:
+            sobran = [o.pk for clave, o in opciones.items() if clave not in vistas and o.disponible]
+            resumen['opciones']['retirados'] = OpcionProducto.objects.filter(pk__in=sobran).update(disponible=False)
+
+        # 5. Extras que acepta cada producto (tabla intermedia)
+        Enlace = Producto.extras.through
+        enlaces = {(p, e): pk for pk, p, e in Enlace.objects.filter(producto_id__in=ids_importados).values_list('id', 'producto_id', 'extra_id')}
+        actuales = set(enlaces)
+        deseados = set()
+        for producto, fila in zip(importados, productos_in):
+            for nombre in fila.get('extras') or []:
+                extra = extras.get(str(nombre).strip())
+                if extra is None:
+                    raise ValidationError(f"Producto '{producto.nombre}': el extra '{nombre}' no existe.")
+                deseados.add((producto.pk, extra.pk))
+        Enlace.objects.bulk_create([Enlace(producto_id=p, extra_id=e) for p, e in deseados - actuales], batch_size=500)
+        quitar = actuales - deseados
+        if quitar:
+            Enlace.objects.filter(pk__in=[enlaces[k] for k in quitar]).delete()
+        resumen['enlaces_extras'] = {'nuevos': len(deseados - actuales), 'quitados': len(quitar)}
+
+        if retirar:
+            resumen['productos']['retirados'] = (Producto.objects.exclude(pk__in=ids_importados)
+                                                 .filter(disponible=True).update(disponible=False))
+            resumen['extras']['retirados'] = (Extra.objects.exclude(pk__in=[extras[_nombre(e, "Extra")].pk for e in extras_in])
+                                              .filter(disponible=True).update(disponible=False))
+
+        if simular:
+            transaction.set_rollback(True)
+        else:
+            # bulk_* y update() no disparan señales: una sola invalidación al confirmar
+            from .disponibilidad import invalidar_disponibilidad
+            transaction.on_commit(invalidar_catalogo)
+            transaction.on_commit(invalidar_disponibilidad)
+    return resumen
+
+def describir_resumen(resumen):
+    """Texto corto para mensajes y la consola."""
+    partes = []
+    for modelo, cuentas in resumen.items():
+        detalle = ", ".join(f"{n} {k}" for k, n in cuentas.items() if n)
+        partes.append(f"{modelo.replace('_', ' ')}: {detalle or 'sin cambios'}")
+    return " · ".join(partes)
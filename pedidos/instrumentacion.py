@@ -0,0 +1,236 @@
+import cProfile
+import io
+import pstats
+import random
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.utils import timezone
+
+# --- INSTRUMENTACIÓN POR PETICIÓN ---
+# Una muestra de las peticiones (PERFIL_MUESTREO) se mide completa: tiempo,
+# consultas SQL (cuántas, cuánto tardan, repetidas), aciertos de caché y
+# tiempo esperando HTTP externo. Se guardan en un buffer circular en memoria
+# (PERFIL_BUFFER) que lee el panel /dashboard/rendimiento/.
+
+_medicion_actual = ContextVar('medicion_actual', default=None)
+_buffer = deque(maxlen=getattr(settings, 'PERFIL_BUFFER', 500))
+_candado = threading.Lock()
+_SIN_VALOR = object()
+
+# Una plantilla SQL repetida esta cantidad de veces en una petición es un N+1
+UMBRAL_N_MAS_1 = 5
+
+
+class Medicion:
+    def __init__(self):
+        self.consultas = 0
+        self.ms_db = 0.0
+        self.plantillas = Counter()   # SQL sin parámetros -> veces (N+1)
+        self.exactas = Counter()      # (SQL, parámetros) -> veces (duplicadas)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.ms_http = 0.0
+        self.llamadas_http = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper de Django: se llama en cada consulta
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.ms_db += (time.perf_counter() - inicio) * 1000
+            self.consultas += 1
+            self.plantillas[sql] += 1
+            try:
+                self.exactas[(sql, repr(params))] += 1
+            except Exception:
+                pass
+
+
+@contextmanager
+def medir_http():
+    """Envolver cada llamada a un servicio externo (banco, geo-ip...)."""
+    medicion = _medicion_actual.get()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if medicion is not None:
+            medicion.ms_http += (time.perf_counter() - inicio) * 1000
+            medicion.llamadas_http += 1
+
+
+def _instrumentar_cache(cache):
+    """Cuenta hits/misses de get/get_many. Se aplica una sola vez por instancia."""
+    if getattr(cache, '_instrumentada', False):
+        return
+    get_original, get_many_original = cache.get, cache.get_many
+
+    def get(key, default=None, version=None):
+        valor = get_original(key, _SIN_VALOR, version=version)
+        medicion = _medicion_actual.get()
+        if medicion is not None:
+            if valor is _SIN_VALOR: medicion.cache_misses += 1
+            else: medicion.cache_hits += 1
+        return default if valor is _SIN_VALOR else valor
+
+    def get_many(keys, version=None):
+        keys = list(keys)
+        valores = get_many_original(keys, version=version)
+        medicion = _medicion_actual.get()
+        if medicion is not None:
+            medicion.cache_hits += len(valores)
+            medicion.cache_misses += len(keys) - len(valores)
+        return valores
+
+    cache.get, cache.get_many = get, get_many
+    cache._instrumentada = True
+
+
+class InstrumentacionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _muestrear():
+        muestreo = getattr(settings, 'PERFIL_MUESTREO', 0)
+        return muestreo and random.random() < muestreo
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._muestrear():
+            return self.get_response(request)
+
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        perfil = None
+        if getattr(settings, 'PERFIL_CPROFILE', False):
+            perfil = cProfile.Profile()
+
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(medicion))
+                for alias in settings.CACHES:
+                    _instrumentar_cache(caches[alias])
+                if perfil is not None:
+                    try:
+                        perfil.enable()
+                    except ValueError:
+                        # Otro profiler activo en este proceso (hilo vecino): seguimos sin cProfile
+                        perfil = None
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if perfil is not None:
+                        perfil.disable()
+        finally:
+            _medicion_actual.reset(token)
+
+        ms = (time.perf_counter() - inicio) * 1000
+        texto_perfil = None
+        if perfil is not None and ms >= getattr(settings, 'PERFIL_LENTO_MS', 500):
+            salida = io.StringIO()
+            pstats.Stats(perfil, stream=salida).sort_stats('cumulative').print_stats(25)
+            texto_perfil = salida.getvalue()
+
+        self._registrar(request, response, medicion, ms, texto_perfil)
+        return response
+
+    async def __acall__(self, request):
+        # Bajo ASGI el ORM corre en otro hilo (sync_to_async), así que aquí solo
+        # se miden tiempo, caché y HTTP externo; las consultas quedan en 0.
+        if not self._muestrear():
+            return await self.get_response(request)
+
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        for alias in settings.CACHES:
+            _instrumentar_cache(caches[alias])
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        self._registrar(request, response, medicion, (time.perf_counter() - inicio) * 1000, None)
+        return response
+
+    @staticmethod
+    def _registrar(request, response, medicion, ms, texto_perfil):
+        match = getattr(request, 'resolver_match', None)
+        registrar({
+            'fecha': timezone.now(),
+            'vista': match.view_name if match else request.path,
+            'metodo': request.method,
+            'ruta': request.path,
+            'estado': response.status_code,
+            'ms': ms,
+            'consultas': medicion.consultas,
+            'ms_db': medicion.ms_db,
+            'duplicadas': sum(n - 1 for n in medicion.exactas.values() if n > 1),
+            'n_mas_1': [(sql, n) for sql, n in medicion.plantillas.most_common(3) if n >= UMBRAL_N_MAS_1],
+            'cache_hits': medicion.cache_hits,
+            'cache_misses': medicion.cache_misses,
+            'ms_http': medicion.ms_http,
+            'llamadas_http': medicion.llamadas_http,
+            'perfil': texto_perfil,
+        })
+
+
+def registrar(muestra):
+    with _candado:
+        _buffer.append(muestra)
+
+def muestras():
+    with _candado:
+        return list(_buffer)
+
+def limpiar():
+    with _candado:
+        _buffer.clear()
+
+def resumen_por_vista(lista=None):
+    """Agrupa las muestras por vista, de la más lenta (p95) a la más rápida."""
+    grupos = {}
+    for m in (muestras() if lista is None else lista):
+        grupos.setdefault(m['vista'], []).append(m)
+
+    filas = []
+    for vista, items in grupos.items():
+        tiempos = sorted(m['ms'] for m in items)
+        patrones = Counter()
+        for m in items:
+            for sql, n in m['n_mas_1']:
+                patrones[sql] = max(patrones[sql], n)
+        filas.append({
+            'vista': vista,
+            'peticiones': len(items),
+            'p50_ms': tiempos[len(tiempos) // 2],
+            'p95_ms': tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))],
+            'max_ms': tiempos[-1],
+            'consultas': statistics.fmean(m['consultas'] for m in items),
+            'ms_db': statistics.fmean(m['ms_db'] for m in items),
+            'duplicadas': statistics.fmean(m['duplicadas'] for m in items),
+            'cache_hits': sum(m['cache_hits'] for m in items),
+            'cache_misses': sum(m['cache_misses'] for m in items),
+            'ms_http': statistics.fmean(m['ms_http'] for m in items),
+            'n_mas_1': patrones.most_common(3),
+        })
+    filas.sort(key=lambda f: f['p95_ms'], reverse=True)
+    return filas
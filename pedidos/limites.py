@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# --- LÍMITE DE PETICIONES POR CLAVE ---
+# Ventana fija en la caché: 'clave' suele ser la IP (o usuario) + la acción.
+# Con varios workers hace falta una caché compartida (Redis/Memcached) para
+# que el límite sea global; con LocMem es por proceso.
+
+def limite_excedido(clave, limite, ventana):
+    """True si 'clave' ya hizo más de 'limite' peticiones en esta ventana (segundos)."""
+    cubeta = f"limite:{clave}:{int(time.time()) // ventana}"
+    cache.add(cubeta, 0, ventana + 1)
+    try:
+        usadas = cache.incr(cubeta)
+    except ValueError:  # expiró entre add e incr
+        cache.set(cubeta, 1, ventana + 1)
+        usadas = 1
+    return usadas > limite
+
+def ip_cliente(request):
+    """
+    IP del cliente. El primer valor de X-Forwarded-For lo escribe el propio
+    cliente: se toma el que agregó el último de nuestros PROXIES_CONFIABLES
+    (contando desde el final); sin proxies, REMOTE_ADDR.
+    """
+    saltos = settings.PROXIES_CONFIABLES
+    if saltos:
+        reenviada = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(reenviada) >= saltos:
+            return reenviada[-saltos]
+    return request.META.get('REMOTE_ADDR', '')
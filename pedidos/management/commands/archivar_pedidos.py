@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from pedidos.archivo import archivar_pedidos
+
+
+class Command(BaseCommand):
+    help = "Mueve los pedidos ENTREGADO/CANCELADO viejos al archivo histórico. Pensado para cron diario."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90, help="Archivar pedidos con más de estos días (mínimo 8).")
+        parser.add_argument('--lote', type=int, default=500, help="Pedidos por transacción.")
+
+    def handle(self, *args, **options):
+        movidos = archivar_pedidos(dias=options['dias'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{movidos} pedidos archivados."))
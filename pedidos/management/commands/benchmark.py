@@ -0,0 +1,171 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+
+from pedidos.benchmark import (
+    ESCENARIOS, comparar, correr_banco_lento, correr_escenario, medir_arranque, medir_busqueda, medir_telemetria,
+    sembrar_datos,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de las rutas calientes (menú, carrito, checkout, tracker, dashboards) "
+        "sobre una base temporal con datos sembrados. Reporta p50/p95/p99, consultas por "
+        "petición y rps, y puede guardar/comparar un baseline JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categorias', type=int, default=8)
+        parser.add_argument('--productos', type=int, default=12, help="Productos por categoría.")
+        parser.add_argument('--opciones', type=int, default=3, help="Opciones por producto.")
+        parser.add_argument('--extras', type=int, default=10)
+        parser.add_argument('--pedidos', type=int, default=2000, help="Pedidos históricos.")
+        parser.add_argument('--iteraciones', type=int, default=200, help="Peticiones por escenario.")
+        parser.add_argument('--concurrencia', type=int, default=4, help="Hilos simultáneos.")
+        parser.add_argument('--escenarios', default=','.join(ESCENARIOS), help="Lista separada por comas.")
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help="Guardar resultados en este JSON (baseline).")
+        parser.add_argument('--comparar', help="Baseline JSON anterior contra el que comparar.")
+        parser.add_argument('--tolerancia', type=float, default=20, help="%% de p95 tolerado antes de marcar regresión.")
+        parser.add_argument('--banco-latencia-ms', type=int, default=0,
+                            help="Si es > 0, compara WSGI contra ASGI con pagos a un banco falso con esta latencia.")
+        parser.add_argument('--pagos', type=int, default=20, help="Pagos en la ráfaga del banco lento.")
+        parser.add_argument('--arranque', action='store_true',
+                            help="Mide carga del worker y primer byte en procesos nuevos, en frío y calentando (solo SQLite).")
+        parser.add_argument('--busqueda', type=int, default=0, metavar='PRODUCTOS',
+                            help="Si es > 0, mide el índice de búsqueda del menú con un catálogo sintético de este tamaño.")
+        parser.add_argument('--telemetria', type=int, default=0, metavar='PINGS',
+                            help="Si es > 0, manda este número de pings GPS de repartidores y mide la recepción en lote.")
+
+    def handle(self, *args, **options):
+        escenarios = [e.strip() for e in options['escenarios'].split(',') if e.strip()]
+        desconocidos = set(escenarios) - set(ESCENARIOS)
+        if desconocidos:
+            raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+        # Base temporal: nunca tocamos la base real. En SQLite usamos un archivo
+        # (no memoria) para que los hilos compartan datos y se bloqueen como en producción.
+        db = connections['default']
+        archivo_tmp = None
+        if db.vendor == 'sqlite':
+            archivo_tmp = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+            db.settings_dict['TEST']['NAME'] = archivo_tmp
+
+        estado_db = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            cache.clear()
+            self.stdout.write("Sembrando datos...")
+            datos = sembrar_datos(
+                categorias=options['categorias'], productos=options['productos'], opciones=options['opciones'],
+                extras=options['extras'], pedidos=options['pedidos'], semilla=options['semilla'],
+            )
+
+            resultados = {}
+            for nombre in escenarios:
+                res = correr_escenario(nombre, datos, options['iteraciones'], options['concurrencia'], options['semilla'])
+                resultados[nombre] = res
+                self.stdout.write(
+                    f"{nombre:<20} p50 {res['p50_ms']:>8.2f}ms  p95 {res['p95_ms']:>8.2f}ms  "
+                    f"p99 {res['p99_ms']:>8.2f}ms  {res['consultas_por_peticion']:>6.1f} q/pet  "
+                    f"{res['rps']:>8.1f} rps  errores {res['errores']}"
+                )
+
+            arranque = None
+            if options['arranque']:
+                if not archivo_tmp:
+                    raise CommandError("--arranque necesita SQLite: los procesos nuevos abren el mismo archivo.")
+                arranque = medir_arranque(archivo_tmp)
+                for modo, res in arranque.items():
+                    self.stdout.write(
+                        f"arranque {modo:<10} carga {res['carga_ms']:>8.1f}ms  primer byte {res['primer_byte_ms']:>8.1f}ms  "
+                        f"errores {res['errores']}"
+                    )
+
+            busqueda = None
+            if options['busqueda'] > 0:
+                busqueda = medir_busqueda(options['busqueda'], options['iteraciones'] * 5, options['semilla'])
+                self.stdout.write(
+                    f"busqueda {busqueda['productos']} productos  índice {busqueda['construccion_ms']:>8.1f}ms  "
+                    f"p50 {busqueda['p50_ms']:>6.3f}ms  p95 {busqueda['p95_ms']:>6.3f}ms  p99 {busqueda['p99_ms']:>6.3f}ms  "
+                    f"sin resultados {busqueda['sin_resultados']}"
+                )
+
+            telemetria = None
+            if options['telemetria'] > 0:
+                telemetria = medir_telemetria(options['telemetria'], semilla=options['semilla'])
+                self.stdout.write(
+                    f"telemetria {telemetria['pings']} pings  p50 {telemetria['p50_ms']:>6.3f}ms  "
+                    f"p95 {telemetria['p95_ms']:>6.3f}ms  {telemetria['pings_por_segundo']:>8.1f} pings/s  "
+                    f"{telemetria['consultas_recepcion']} consultas  vaciar {telemetria['vaciar_ms']:>7.1f}ms  "
+                    f"guardados {telemetria['puntos_guardados']} (-{telemetria['reduccion_pct']}%)  errores {telemetria['errores']}"
+                )
+
+            banco_lento = None
+            if options['banco_latencia_ms'] > 0:
+                if not datos['pedidos_activos']:
+                    raise CommandError("El banco lento necesita pedidos activos: use --pedidos > 0.")
+                banco_lento = correr_banco_lento(
+                    datos, latencia_ms=options['banco_latencia_ms'], pagos=options['pagos'],
+                    menus=options['iteraciones'], trabajadores=options['concurrencia'], semilla=options['semilla'],
+                )
+                for modo, res in banco_lento.items():
+                    self.stdout.write(
+                        f"banco_lento {modo:<8} menú p50 {res['menu_p50_ms']:>8.2f}ms  p95 {res['menu_p95_ms']:>8.2f}ms  "
+                        f"pagos p95 {res['pago_p95_ms']:>8.2f}ms  total {res['duracion_s']:>6.2f}s  errores {res['errores']}"
+                    )
+        finally:
+            teardown_databases(estado_db, verbosity=0)
+            if archivo_tmp and os.path.exists(archivo_tmp):
+                os.remove(archivo_tmp)
+
+        reporte = {
+            'fecha': timezone.now().isoformat(),
+            'commit': self._commit(),
+            'python': platform.python_version(),
+            'db': db.vendor,
+            'parametros': {k: options[k] for k in (
+                'categorias', 'productos', 'opciones', 'extras', 'pedidos', 'iteraciones', 'concurrencia', 'semilla'
+            )},
+            'escenarios': resultados,
+        }
+        if arranque:
+            reporte['arranque'] = arranque
+        if busqueda:
+            reporte['busqueda'] = busqueda
+        if telemetria:
+            reporte['telemetria'] = telemetria
+        if banco_lento:
+            reporte['banco_lento'] = banco_lento
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as f:
+                json.dump(reporte, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Baseline guardado en {options['salida']}"))
+
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as f:
+                base = json.load(f)
+            regresiones = comparar(reporte, base, options['tolerancia'] / 100)
+            if regresiones:
+                for r in regresiones:
+                    self.stdout.write(self.style.ERROR(f"REGRESIÓN {r}"))
+                raise CommandError(f"{len(regresiones)} regresiones contra {options['comparar']}")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones contra el baseline."))
+
+    def _commit(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except Exception:
+            return None
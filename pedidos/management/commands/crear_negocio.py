@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from pedidos.models import DelNegocio, Negocio
+
+
+class Command(BaseCommand):
+    help = "Da de alta un restaurante en el despliegue compartido (MULTINEGOCIO)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dominio', help="Host sin puerto, ej. pupuseria.foodback.app")
+        parser.add_argument('nombre')
+        parser.add_argument('--adoptar', action='store_true',
+                            help="Asigna a este negocio todo lo que aún no tiene negocio (despliegue de un solo restaurante).")
+
+    def handle(self, *args, **options):
+        dominio = options['dominio'].strip().lower()
+        if Negocio.objects.filter(dominio=dominio).exists():
+            raise CommandError(f"Ya existe un negocio con el dominio {dominio}.")
+
+        with transaction.atomic():
+            negocio = Negocio.objects.create(dominio=dominio, nombre=options['nombre'])
+            adoptados = 0
+            if options['adoptar']:
+                for modelo in DelNegocio.__subclasses__():
+                    adoptados += modelo._base_manager.filter(negocio__isnull=True).update(negocio=negocio)
+        self.stdout.write(self.style.SUCCESS(f"Negocio #{negocio.id} creado para {dominio} ({adoptados} registros adoptados)."))
@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos.importacion import catalogo_a_csv, exportar_catalogo
+from pedidos.models import Negocio
+from pedidos.replica import lecturas_en_replica
+from pedidos.tenencia import negocio_activo, negocio_por_dominio
+
+
+class Command(BaseCommand):
+    help = "Exporta el catálogo completo (categorías, extras, productos y opciones) como JSON o CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=['json', 'csv'], default='json')
+        parser.add_argument('--salida', help="Archivo destino. Sin esto se imprime en pantalla.")
+        parser.add_argument('--negocio', help="Dominio del negocio (solo con MULTINEGOCIO).")
+
+    def handle(self, *args, **options):
+        try:
+            with negocio_activo(negocio_por_dominio(options['negocio'])), lecturas_en_replica():
+                datos = exportar_catalogo()
+        except Negocio.DoesNotExist:
+            raise CommandError(f"No hay negocio con el dominio {options['negocio']}.")
+        if options['formato'] == 'csv':
+            texto = catalogo_a_csv(datos)
+        else:
+            texto = json.dumps(datos, ensure_ascii=False, indent=2)
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8', newline='') as f:
+                f.write(texto)
+            self.stdout.write(self.style.SUCCESS(f"{len(datos['productos'])} productos exportados a {options['salida']}."))
+        else:
+            self.stdout.write(texto)
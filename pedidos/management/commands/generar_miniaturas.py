@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from pedidos.catalogo import invalidar_catalogo
+from pedidos.imagenes import generar_variantes_lote
+from pedidos.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Genera las miniaturas WebP/JPEG de las fotos de productos (en paralelo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help="Regenerar aunque ya existan.")
+        parser.add_argument('--procesos', type=int, default=None, help="Procesos en paralelo (por defecto: núcleos del CPU).")
+
+    def handle(self, *args, **options):
+        pendientes = []
+        for producto in Producto.objects.exclude(imagen='').exclude(imagen=None).only('id', 'imagen', 'imagen_variantes'):
+            if options['todas'] or producto.imagen_variantes.get('original') != producto.imagen.name:
+                pendientes.append((producto.id, producto.imagen.name))
+
+        if not pendientes:
+            self.stdout.write("Todas las fotos ya tienen miniaturas.")
+            return
+
+        self.stdout.write(f"Generando miniaturas de {len(pendientes)} productos...")
+        listos = []
+        for producto_id, variantes, error in generar_variantes_lote(pendientes, options['procesos']):
+            if error:
+                self.stderr.write(f"  Producto #{producto_id}: {error}")
+            else:
+                listos.append(Producto(id=producto_id, imagen_variantes=variantes))
+
+        Producto.objects.bulk_update(listos, ['imagen_variantes'], batch_size=200)
+        invalidar_catalogo()
+        self.stdout.write(self.style.SUCCESS(f"{len(listos)} productos actualizados."))
@@ -0,0 +1,32 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos.importacion import describir_resumen, importar_catalogo, leer_catalogo
+from pedidos.models import Negocio
+from pedidos.tenencia import negocio_activo, negocio_por_dominio
+
+
+class Command(BaseCommand):
+    help = "Importa un catálogo JSON/CSV: compara con la base y aplica solo las diferencias en una transacción."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta al .json o .csv (formato de exportar_catalogo).")
+        parser.add_argument('--simular', action='store_true', help="Muestra las diferencias sin guardar nada.")
+        parser.add_argument('--retirar', action='store_true',
+                            help="Marca como no disponible lo que no venga en el archivo (no se borra nada).")
+        parser.add_argument('--negocio', help="Dominio del negocio (solo con MULTINEGOCIO).")
+
+    def handle(self, *args, **options):
+        formato = 'csv' if options['archivo'].lower().endswith('.csv') else 'json'
+        try:
+            with open(options['archivo'], encoding='utf-8-sig') as f:
+                datos = leer_catalogo(f.read(), formato)
+            with negocio_activo(negocio_por_dominio(options['negocio'])):
+                resumen = importar_catalogo(datos, retirar=options['retirar'], simular=options['simular'])
+        except Negocio.DoesNotExist:
+            raise CommandError(f"No hay negocio con el dominio {options['negocio']}.")
+        except (OSError, ValidationError) as e:
+            raise CommandError(e.messages[0] if isinstance(e, ValidationError) else str(e))
+
+        prefijo = "Simulación (nada guardado) — " if options['simular'] else ""
+        self.stdout.write(self.style.SUCCESS(prefijo + describir_resumen(resumen)))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pedidos.horario import limpiar_excepciones_pasadas
+
+
+class Command(BaseCommand):
+    help = "Borra los días especiales (excepciones de horario) que ya pasaron. Pensado para cron diario."
+
+    def handle(self, *args, **options):
+        borrados = limpiar_excepciones_pasadas()
+        self.stdout.write(self.style.SUCCESS(f"{borrados} excepciones pasadas borradas."))
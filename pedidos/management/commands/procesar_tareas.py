@@ -0,0 +1,49 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos.tareas import estadisticas, trabajar
+
+
+class Command(BaseCommand):
+    help = (
+        "Trabajador de la cola de tareas en segundo plano (pedidos/tareas.py). Corre hasta "
+        "SIGTERM/Ctrl+C; con --una-vez procesa lo vencido y termina (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=2, help="Tareas a la vez en un pool de hilos.")
+        parser.add_argument('--procesos', type=int, default=0,
+                            help="Si es > 0, usa un pool de procesos de este tamaño (tareas que usan CPU, como miniaturas).")
+        parser.add_argument('--intervalo', type=float, default=1.0, help="Segundos entre consultas cuando no hay nada.")
+        parser.add_argument('--una-vez', action='store_true', help="Procesa lo vencido y termina.")
+        parser.add_argument('--estadisticas', action='store_true', help="Solo muestra tiempos por tarea (últimas 24 h).")
+
+    def handle(self, *args, **options):
+        if options['estadisticas']:
+            for fila in estadisticas():
+                self.stdout.write(
+                    f"{fila['nombre']:<28} terminadas {fila['terminadas']:>6}  fallidas {fila['fallidas']:>4}  "
+                    f"pendientes {fila['pendientes']:>4}  media {fila['media_ms']:>9.2f}ms  máx {fila['max_ms'] or 0:>9.2f}ms"
+                )
+            return
+        if options['hilos'] < 1 and options['procesos'] < 1:
+            raise CommandError("Se necesita al menos un hilo o un proceso.")
+        if not settings.CACHE_COMPARTIDA:
+            # Las tareas invalidan cachés que leen los workers web (miniaturas_producto sube
+            # la versión del catálogo): con LocMem eso solo lo vería este proceso
+            raise CommandError("procesar_tareas necesita una CACHE_BACKEND compartida con los workers web "
+                               "(LocMem es por proceso). Ver CACHES en core/settings.py.")
+
+        detener = threading.Event()
+        for senal in (signal.SIGTERM, signal.SIGINT):
+            # Termina lo que está corriendo y sale (el despliegue reinicia sin perder tareas)
+            signal.signal(senal, lambda *_: detener.set())
+
+        self.stdout.write(f"Trabajador listo ({options['procesos'] or options['hilos']} "
+                          f"{'procesos' if options['procesos'] else 'hilos'}).")
+        corridas = trabajar(hilos=options['hilos'], procesos=options['procesos'], intervalo=options['intervalo'],
+                            una_vez=options['una_vez'], detener=detener)
+        self.stdout.write(self.style.SUCCESS(f"{corridas} tareas procesadas."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from pedidos.models import DetallePedido
+from pedidos.precios import rellenar_extras_total
+
+
+class Command(BaseCommand):
+    help = "Recalcula DetallePedido.extras_total por lotes (bulk_update). No cambia lo ya cobrado."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help="Líneas por lote.")
+
+    def handle(self, *args, **options):
+        cambiadas = rellenar_extras_total(DetallePedido, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{cambiadas} líneas actualizadas."))
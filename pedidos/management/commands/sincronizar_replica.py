@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import cache
+from django.db import connections
+
+from pedidos.replica import ALIAS, CLAVE_RETRASO, copiar_sqlite, replica_configurada
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia la base principal a la réplica para probar en local con dos archivos SQLite "
+        "(DATABASE_REPLICA_URL=sqlite:///replica.sqlite3). En Postgres la réplica la mantiene el servidor."
+    )
+
+    def handle(self, *args, **options):
+        if not replica_configurada():
+            raise CommandError("No hay réplica: defina DATABASE_REPLICA_URL.")
+        principal, replica = connections['default'], connections[ALIAS]
+        if principal.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError(
+                "Solo para dos archivos SQLite. Con dos bases Postgres locales use replicación del "
+                "servidor o recree la réplica con: createdb -T <principal> <replica>."
+            )
+        replica.close()
+        copiar_sqlite(principal.settings_dict['NAME'], replica.settings_dict['NAME'])
+        cache.delete(CLAVE_RETRASO)
+        self.stdout.write(self.style.SUCCESS(f"Réplica al día: {replica.settings_dict['NAME']}"))
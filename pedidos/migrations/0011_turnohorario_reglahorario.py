@@ -0,0 +1,46 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0010_producto_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnoHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('hora_apertura', models.TimeField()),
+                ('hora_cierre', models.TimeField(help_text='Si es menor que la apertura, el turno termina al día siguiente.')),
+                ('configuracion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnos', to='pedidos.configuracionnegocio')),
+            ],
+            options={
+                'verbose_name': '🕑 Turno',
+                'ordering': ['dia_semana', 'hora_apertura'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReglaHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ANUAL', 'Cada año en la misma fecha'), ('NESIMO', 'N-ésimo día de la semana del mes'), ('RANGO', 'Rango de fechas')], max_length=10)),
+                ('mes', models.PositiveSmallIntegerField(blank=True, help_text='1-12. En N-ésimo, vacío = todos los meses.', null=True)),
+                ('dia', models.PositiveSmallIntegerField(blank=True, help_text='Día del mes (tipo anual).', null=True)),
+                ('dia_semana', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], null=True)),
+                ('ordinal', models.SmallIntegerField(blank=True, choices=[(1, 'Primer'), (2, 'Segundo'), (3, 'Tercer'), (4, 'Cuarto'), (-1, 'Último')], null=True)),
+                ('fecha_inicio', models.DateField(blank=True, null=True)),
+                ('fecha_fin', models.DateField(blank=True, null=True)),
+                ('abierto', models.BooleanField(default=False)),
+                ('hora_apertura', models.TimeField(blank=True, null=True)),
+                ('hora_cierre', models.TimeField(blank=True, null=True)),
+                ('motivo', models.CharField(blank=True, max_length=100, null=True)),
+            ],
+            options={
+                'verbose_name': '🔁 Regla de Horario',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0011_turnohorario_reglahorario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracionnegocio',
+            name='cocina_minutos_base',
+            field=models.PositiveIntegerField(default=25, help_text='Minutos de preparación con la cocina vacía.'),
+        ),
+        migrations.AddField(
+            model_name='configuracionnegocio',
+            name='cocina_pedidos_hora',
+            field=models.PositiveIntegerField(default=20, help_text='Ritmo supuesto cuando no hay historial reciente.'),
+        ),
+        migrations.AddField(
+            model_name='configuracionnegocio',
+            name='cocina_max_pedidos',
+            field=models.PositiveIntegerField(default=0, help_text='Pedidos en cola que pausan la venta. 0 = sin límite.'),
+        ),
+        migrations.AddField(
+            model_name='configuracionnegocio',
+            name='cocina_max_unidades',
+            field=models.PositiveIntegerField(default=0, help_text='Unidades en cola que pausan la venta. 0 = sin límite.'),
+        ),
+        migrations.AddField(
+            model_name='configuracionnegocio',
+            name='cocina_max_espera',
+            field=models.PositiveIntegerField(default=0, help_text='Minutos de espera estimada que pausan la venta. 0 = sin límite.'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0012_configuracionnegocio_capacidad_cocina'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='estacion',
+            field=models.CharField(default='Cocina', help_text='Estación de la pantalla de cocina (Parrilla, Freidora...).', max_length=50),
+        ),
+    ]
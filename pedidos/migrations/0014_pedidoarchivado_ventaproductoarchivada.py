@@ -0,0 +1,47 @@
+# Generated by Django 4.2.17 on 2026-10-19 17:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0013_categoria_estacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaProductoArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('dinero', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('producto', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='pedidos.producto')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PedidoArchivado',
+            fields=[
+                ('id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('telefono', models.CharField(db_index=True, max_length=15)),
+                ('nombre_cliente', models.CharField(max_length=200)),
+                ('fecha_creacion', models.DateTimeField(db_index=True)),
+                ('estado', models.CharField(choices=[('PENDIENTE', '⏳ Pendiente de Pago'), ('RECIBIDO', '🔔 Recibido (Confirmado)'), ('COCINA', '🔥 En Cocina'), ('RUTA', '🏍️ En Ruta'), ('ENTREGADO', '✅ Entregado'), ('PROBLEMA', '⚠️ Problema / No Recibido'), ('CANCELADO', '❌ Cancelado')], max_length=20)),
+                ('metodo_pago', models.CharField(choices=[('EFECTIVO', 'Efectivo'), ('TARJETA', 'Tarjeta (Wompi)')], max_length=20)),
+                ('direccion_entrega', models.TextField(blank=True)),
+                ('es_pedido_whatsapp', models.BooleanField(default=False)),
+                ('total_productos', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('comision_plataforma', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_final', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('lineas', models.JSONField(default=list)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedidos_archivados', to='pedidos.cliente')),
+            ],
+            options={
+                'verbose_name': '🗄️ Pedido Archivado',
+                'verbose_name_plural': '🗄️ Pedidos Archivados',
+            },
+        ),
+    ]
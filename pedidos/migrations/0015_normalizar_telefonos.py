@@ -0,0 +1,45 @@
+import re
+
+from django.db import migrations
+
+
+def normalizar_telefono(texto):
+    # Copia congelada de pedidos.clientes.normalizar_telefono: la migración no cambia si esa función cambia
+    if not texto:
+        return None
+    texto = texto.strip()
+    digitos = re.sub(r'\D', '', texto)
+    if digitos.startswith('00'):
+        digitos, texto = digitos[2:], '+' + digitos[2:]
+
+    if len(digitos) == 8 and digitos[0] in '267':
+        return f"+503{digitos}"
+    if len(digitos) == 11 and digitos.startswith('503') and digitos[3] in '267':
+        return f"+{digitos}"
+    if texto.startswith('+') and 8 <= len(digitos) <= 15 and not digitos.startswith('503'):
+        return f"+{digitos}"
+    return None
+
+
+def normalizar(apps, schema_editor):
+    Cliente = apps.get_model('pedidos', 'Cliente')
+    ocupados = set(Cliente.objects.values_list('telefono', flat=True))
+    for cliente in Cliente.objects.all():
+        nuevo = normalizar_telefono(cliente.telefono)
+        # Si ya existe otro cliente con ese número lo dejamos como estaba
+        if nuevo and nuevo != cliente.telefono and nuevo not in ocupados:
+            ocupados.discard(cliente.telefono)
+            ocupados.add(nuevo)
+            cliente.telefono = nuevo
+            cliente.save(update_fields=['telefono'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0014_pedidoarchivado_ventaproductoarchivada'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+import unicodedata
+
+from django.db import migrations, models
+
+
+def texto_busqueda(texto):
+    # Copia congelada de Cliente.texto_busqueda: la migración no cambia si el modelo cambia
+    sin_tildes = unicodedata.normalize('NFKD', texto or "").encode('ascii', 'ignore').decode()
+    return " ".join(sin_tildes.lower().split())
+
+
+def llenar_nombre_busqueda(apps, schema_editor):
+    Cliente = apps.get_model('pedidos', 'Cliente')
+    lote = []
+    for cliente in Cliente.objects.only('id', 'nombre', 'apellido').iterator(chunk_size=2000):
+        cliente.nombre_busqueda = texto_busqueda(f"{cliente.nombre} {cliente.apellido}")
+        lote.append(cliente)
+        if len(lote) == 2000:
+            Cliente.objects.bulk_update(lote, ['nombre_busqueda'])
+            lote = []
+    Cliente.objects.bulk_update(lote, ['nombre_busqueda'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0016_indices_historial_cliente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='nombre_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha_creacion'], name='pedido_fecha_creacion'),
+        ),
+        migrations.RunPython(llenar_nombre_busqueda, migrations.RunPython.noop),
+    ]
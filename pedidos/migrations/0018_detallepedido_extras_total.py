@@ -0,0 +1,43 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def rellenar(apps, schema_editor):
+    # Copia congelada de pedidos.precios.rellenar_extras_total: la migración no cambia si esa función cambia
+    DetallePedido = apps.get_model('pedidos', 'DetallePedido')
+    Enlace = DetallePedido.extras.through
+
+    def dinero(valor):
+        return Decimal(str(valor or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    ultimo = 0
+    while True:
+        actuales = list(DetallePedido.objects.filter(id__gt=ultimo).order_by('id').values_list('id', 'extras_total')[:2000])
+        if not actuales:
+            return
+        ultimo = actuales[-1][0]
+        sumas = dict(
+            Enlace.objects.filter(detallepedido_id__in=[i for i, _ in actuales]).values('detallepedido_id')
+            .annotate(total=Sum('extra__precio')).values_list('detallepedido_id', 'total')
+        )
+        filas = [DetallePedido(id=i, extras_total=dinero(sumas.get(i))) for i, actual in actuales
+                 if actual != dinero(sumas.get(i))]
+        DetallePedido.objects.bulk_update(filas, ['extras_total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0017_busqueda_clientes_admin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallepedido',
+            name='extras_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
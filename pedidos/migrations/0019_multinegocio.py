@@ -0,0 +1,110 @@
+# Generated by Django 4.2.17 on 2026-10-19 17:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import pedidos.tenencia
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pedidos', '0018_detallepedido_extras_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Negocio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('dominio', models.CharField(help_text='Host sin puerto, ej. pupuseria.foodback.app', max_length=255, unique=True)),
+                ('activo', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': '🏪 Negocio',
+            },
+        ),
+        migrations.AlterField(
+            model_name='cliente',
+            name='telefono',
+            field=models.CharField(db_index=True, max_length=15),
+        ),
+        migrations.AlterField(
+            model_name='diaespecial',
+            name='fecha',
+            field=models.DateField(),
+        ),
+        migrations.AddField(
+            model_name='negocio',
+            name='usuarios',
+            field=models.ManyToManyField(blank=True, help_text='Staff que puede entrar a este negocio.', related_name='negocios', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='configuracionnegocio',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='diaespecial',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='extra',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='pedidoarchivado',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='reglahorario',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddField(
+            model_name='ventaproductoarchivada',
+            name='negocio',
+            field=models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio'),
+        ),
+        migrations.AddConstraint(
+            model_name='cliente',
+            constraint=models.UniqueConstraint(fields=('negocio', 'telefono'), name='cliente_telefono_por_negocio'),
+        ),
+        migrations.AddConstraint(
+            model_name='cliente',
+            constraint=models.UniqueConstraint(condition=models.Q(('negocio__isnull', True)), fields=('telefono',), name='cliente_telefono_sin_negocio'),
+        ),
+        migrations.AddConstraint(
+            model_name='diaespecial',
+            constraint=models.UniqueConstraint(fields=('negocio', 'fecha'), name='diaespecial_fecha_por_negocio'),
+        ),
+        migrations.AddConstraint(
+            model_name='diaespecial',
+            constraint=models.UniqueConstraint(condition=models.Q(('negocio__isnull', True)), fields=('fecha',), name='diaespecial_fecha_sin_negocio'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.17 on 2026-10-19 18:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import pedidos.tenencia
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0019_multinegocio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('PENDIENTE', '⏳ Pendiente'), ('CORRIENDO', '⚙️ Corriendo'), ('LISTA', '✅ Lista'), ('FALLIDA', '❌ Fallida')], default='PENDIENTE', max_length=10)),
+                ('ejecutar_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('periodica', models.BooleanField(default=False)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=3)),
+                ('reserva', models.CharField(blank=True, default='', max_length=64)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('iniciada', models.DateTimeField(blank=True, null=True)),
+                ('terminada', models.DateTimeField(blank=True, null=True)),
+                ('duracion_ms', models.FloatField(blank=True, null=True)),
+                ('negocio', models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio')),
+            ],
+            options={
+                'verbose_name': '⚙️ Tarea en segundo plano',
+                'verbose_name_plural': '⚙️ Tareas en segundo plano',
+                'indexes': [models.Index(fields=['estado', 'ejecutar_en'], name='tarea_estado_ejecutar_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tarea',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['PENDIENTE', 'CORRIENDO']), ('periodica', True)), fields=('nombre',), name='tarea_periodica_unica'),
+        ),
+    ]
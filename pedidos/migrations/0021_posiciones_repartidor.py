@@ -0,0 +1,34 @@
+# Generated by Django 4.2.17 on 2026-10-19 18:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import pedidos.tenencia
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pedidos', '0020_cola_tareas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosicionRepartidor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitud', models.FloatField()),
+                ('longitud', models.FloatField()),
+                ('precision', models.FloatField(blank=True, null=True)),
+                ('registrada', models.DateTimeField()),
+                ('negocio', models.ForeignKey(blank=True, default=pedidos.tenencia.id_negocio_actual, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.negocio')),
+                ('repartidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posiciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '📍 Posición de repartidor',
+                'verbose_name_plural': '📍 Posiciones de repartidores',
+                'indexes': [models.Index(fields=['repartidor', 'registrada'], name='posicion_repartidor_idx')],
+            },
+        ),
+    ]
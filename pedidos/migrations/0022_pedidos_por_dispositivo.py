@@ -0,0 +1,31 @@
+# Generated by Django 4.2.17 on 2026-10-19 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0021_posiciones_repartidor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='dispositivo',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='pedidoarchivado',
+            name='dispositivo',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['dispositivo', '-id'], name='pedido_dispositivo_id_desc'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidoarchivado',
+            index=models.Index(fields=['dispositivo', '-id'], name='archivado_dispositivo_id_desc'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-19 19:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0022_pedidos_por_dispositivo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pedido',
+            name='pedido_cliente_id_desc',
+        ),
+        migrations.RemoveIndex(
+            model_name='pedidoarchivado',
+            name='archivado_cliente_id_desc',
+        ),
+    ]
@@ -1,12 +1,51 @@
-from django.db import models
-from django.db.models import Sum
-from django.db.models.signals import post_save, post_delete
+import logging
+import unicodedata
+
+from django.db import models, transaction
+from django.db.models import Q, Sum
+from django.db.models.signals import post_save, post_delete, post_init, m2m_changed
 from django.dispatch import receiver
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
+from django.utils import timezone
 from datetime import date, timedelta # IMPORTANTE: Agregar esto
+from .catalogo import invalidar_catalogo
+from .precios import comision, dinero, subtotal_linea
+from .tenencia import PorNegocioManager, id_negocio_actual, olvidar_host
+from .observabilidad import PEDIDOS_ESTADO_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# --- MULTINEGOCIO (ver tenencia.py) ---
+class Negocio(models.Model):
+    """Un restaurante dentro de un despliegue compartido. Se reconoce por el Host."""
+    nombre = models.CharField(max_length=100)
+    dominio = models.CharField(max_length=255, unique=True, help_text="Host sin puerto, ej. pupuseria.foodback.app")
+    activo = models.BooleanField(default=True)
+    usuarios = models.ManyToManyField(User, blank=True, related_name='negocios', help_text="Staff que puede entrar a este negocio.")
+
+    def __str__(self): return f"{self.nombre} ({self.dominio})"
+    class Meta: verbose_name = "🏪 Negocio"
+
+class OpcionesPorNegocio(PorNegocioManager):
+    campo = 'producto__negocio'
+
+class TurnosPorNegocio(PorNegocioManager):
+    campo = 'configuracion__negocio'
+
+class DetallesPorNegocio(PorNegocioManager):
+    campo = 'pedido__negocio'
+
+class DelNegocio(models.Model):
+    """Base de los modelos que pertenecen a un negocio. Vacío = despliegue de un solo restaurante."""
+    negocio = models.ForeignKey(Negocio, null=True, blank=True, editable=False, on_delete=models.CASCADE,
+                                related_name='+', default=id_negocio_actual)
+    objects = PorNegocioManager()
+
+    class Meta:
+        abstract = True
 
 # --- NUEVO MODELO DE EXTRAS (Papas, Queso, Jalapeños...) ---
-class Extra(models.Model):
+class Extra(DelNegocio):
     nombre = models.CharField(max_length=100)
     precio = models.DecimalField(max_digits=6, decimal_places=2)
     disponible = models.BooleanField(default=True)
@@ -14,18 +53,21 @@ class Extra(models.Model):
     def __str__(self):
         return f"{self.nombre} (+${self.precio})"
 
-class Categoria(models.Model):
+class Categoria(DelNegocio):
     nombre = models.CharField(max_length=100)
     orden = models.IntegerField(default=0)
+    estacion = models.CharField(max_length=50, default="Cocina", help_text="Estación de la pantalla de cocina (Parrilla, Freidora...).")
     def __str__(self): return self.nombre
     class Meta: verbose_name_plural = "Categorías"
 
-class Producto(models.Model):
+class Producto(DelNegocio):
     categoria = models.ForeignKey(Categoria, related_name='productos', on_delete=models.CASCADE)
     nombre = models.CharField(max_length=200)
     descripcion = models.TextField(blank=True, null=True)
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     imagen = models.ImageField(upload_to='productos/', blank=True, null=True)
+    # Miniaturas generadas a partir de 'imagen' (ver pedidos/imagenes.py)
+    imagen_variantes = models.JSONField(default=dict, blank=True, editable=False)
     disponible = models.BooleanField(default=True)
     
     # NUEVO: Relación con los extras disponibles para este producto
@@ -39,21 +81,43 @@ class OpcionProducto(models.Model):
     nombre = models.CharField(max_length=100) # Ej: "Carne de Res", "Pollo"
     precio_extra = models.DecimalField(max_digits=6, decimal_places=2, default=0.00) 
     disponible = models.BooleanField(default=True)
+    objects = OpcionesPorNegocio()
 
     def __str__(self):
         signo = "+" if self.precio_extra > 0 else ""
         return f"{self.nombre} ({signo}${self.precio_extra})"
 
-class Cliente(models.Model):
-    telefono = models.CharField(max_length=15, unique=True)
+class Cliente(DelNegocio):
+    telefono = models.CharField(max_length=15, db_index=True)
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100)
     direccion_ultima = models.TextField(blank=True, null=True)
+    # "nombre apellido" en minúsculas y sin tildes: la búsqueda del admin va por prefijo sobre este índice
+    nombre_busqueda = models.CharField(max_length=201, blank=True, default="", editable=False, db_index=True)
+
+    @staticmethod
+    def texto_busqueda(texto):
+        sin_tildes = unicodedata.normalize('NFKD', texto or "").encode('ascii', 'ignore').decode()
+        return " ".join(sin_tildes.lower().split())
+
+    def save(self, *args, **kwargs):
+        self.nombre_busqueda = self.texto_busqueda(f"{self.nombre} {self.apellido}")
+        campos = kwargs.get('update_fields')
+        if campos is not None and {'nombre', 'apellido'} & set(campos):
+            kwargs['update_fields'] = {*campos, 'nombre_busqueda'}
+        super().save(*args, **kwargs)
+
     def __str__(self): return f"{self.nombre} {self.apellido} ({self.telefono})"
+    class Meta:
+        # Un teléfono por negocio (y único entre los registros sin negocio)
+        constraints = [
+            models.UniqueConstraint(fields=['negocio', 'telefono'], name='cliente_telefono_por_negocio'),
+            models.UniqueConstraint(fields=['telefono'], condition=models.Q(negocio__isnull=True), name='cliente_telefono_sin_negocio'),
+        ]
 
 # --- CEREBRO DEL TIEMPO ---
 
-class ConfiguracionNegocio(models.Model):
+class ConfiguracionNegocio(DelNegocio):
     nombre_negocio = models.CharField(max_length=100, default="FoodBack")
     hora_apertura = models.TimeField(default="08:00")
     hora_cierre = models.TimeField(default="22:00")
@@ -75,11 +139,18 @@ class ConfiguracionNegocio(models.Model):
     # Por defecto damos 30 días de gracia al crear la BD
     fecha_vencimiento = models.DateField(default=date.today() + timedelta(days=30), verbose_name="Vencimiento Suscripción")
 
+    # --- CAPACIDAD DE LA COCINA (ver capacidad.py) ---
+    cocina_minutos_base = models.PositiveIntegerField(default=25, help_text="Minutos de preparación con la cocina vacía.")
+    cocina_pedidos_hora = models.PositiveIntegerField(default=20, help_text="Ritmo supuesto cuando no hay historial reciente.")
+    cocina_max_pedidos = models.PositiveIntegerField(default=0, help_text="Pedidos en cola que pausan la venta. 0 = sin límite.")
+    cocina_max_unidades = models.PositiveIntegerField(default=0, help_text="Unidades en cola que pausan la venta. 0 = sin límite.")
+    cocina_max_espera = models.PositiveIntegerField(default=0, help_text="Minutos de espera estimada que pausan la venta. 0 = sin límite.")
+
     def __str__(self): return f"Configuración de {self.nombre_negocio}"
     class Meta: verbose_name = "⚙️ Configuración del Negocio"
 
-class DiaEspecial(models.Model):
-    fecha = models.DateField(unique=True) 
+class DiaEspecial(DelNegocio):
+    fecha = models.DateField() 
     abierto = models.BooleanField(default=False)
     hora_apertura = models.TimeField(blank=True, null=True) 
     hora_cierre = models.TimeField(blank=True, null=True)
@@ -88,9 +159,80 @@ class DiaEspecial(models.Model):
     def __str__(self):
         estado = "ABIERTO" if self.abierto else "CERRADO"
         return f"{self.fecha} - {estado} ({self.motivo})"
-    class Meta: verbose_name = "📅 Día Especial / Feriado"
+    class Meta:
+        verbose_name = "📅 Día Especial / Feriado"
+        constraints = [
+            models.UniqueConstraint(fields=['negocio', 'fecha'], name='diaespecial_fecha_por_negocio'),
+            models.UniqueConstraint(fields=['fecha'], condition=models.Q(negocio__isnull=True), name='diaespecial_fecha_sin_negocio'),
+        ]
+
+class TurnoHorario(models.Model):
+    """Un turno de un día de la semana (ej. almuerzo y cena). Si un día no tiene
+    turnos se usa el horario global de la configuración."""
+    DIAS_SEMANA = [(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')]
+
+    configuracion = models.ForeignKey(ConfiguracionNegocio, related_name='turnos', on_delete=models.CASCADE)
+    dia_semana = models.PositiveSmallIntegerField(choices=DIAS_SEMANA)
+    hora_apertura = models.TimeField()
+    hora_cierre = models.TimeField(help_text="Si es menor que la apertura, el turno termina al día siguiente.")
+    objects = TurnosPorNegocio()
+
+    def __str__(self):
+        return f"{self.get_dia_semana_display()} {self.hora_apertura:%H:%M}-{self.hora_cierre:%H:%M}"
+    class Meta:
+        verbose_name = "🕑 Turno"
+        ordering = ['dia_semana', 'hora_apertura']
+
+class ReglaHorario(DelNegocio):
+    """Excepción que se repite: cada 24 de diciembre, cada primer lunes, vacaciones..."""
+    TIPOS = [
+        ('ANUAL', 'Cada año en la misma fecha'),
+        ('NESIMO', 'N-ésimo día de la semana del mes'),
+        ('RANGO', 'Rango de fechas'),
+    ]
+    ORDINALES = [(1, 'Primer'), (2, 'Segundo'), (3, 'Tercer'), (4, 'Cuarto'), (-1, 'Último')]
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    mes = models.PositiveSmallIntegerField(blank=True, null=True, help_text="1-12. En N-ésimo, vacío = todos los meses.")
+    dia = models.PositiveSmallIntegerField(blank=True, null=True, help_text="Día del mes (tipo anual).")
+    dia_semana = models.PositiveSmallIntegerField(choices=TurnoHorario.DIAS_SEMANA, blank=True, null=True)
+    ordinal = models.SmallIntegerField(choices=ORDINALES, blank=True, null=True)
+    fecha_inicio = models.DateField(blank=True, null=True)
+    fecha_fin = models.DateField(blank=True, null=True)
 
-class Pedido(models.Model):
+    abierto = models.BooleanField(default=False)
+    hora_apertura = models.TimeField(blank=True, null=True)
+    hora_cierre = models.TimeField(blank=True, null=True)
+    motivo = models.CharField(max_length=100, blank=True, null=True)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.tipo == 'ANUAL' and not (self.mes and self.dia):
+            raise ValidationError("La regla anual necesita mes y día.")
+        if self.tipo == 'NESIMO' and (self.dia_semana is None or not self.ordinal):
+            raise ValidationError("La regla N-ésima necesita día de la semana y ordinal.")
+        if self.tipo == 'RANGO' and not (self.fecha_inicio and self.fecha_fin and self.fecha_inicio <= self.fecha_fin):
+            raise ValidationError("El rango necesita fecha de inicio y fin (inicio <= fin).")
+
+    def aplica(self, fecha):
+        if self.tipo == 'ANUAL':
+            return fecha.month == self.mes and fecha.day == self.dia
+        if self.tipo == 'RANGO':
+            return self.fecha_inicio <= fecha <= self.fecha_fin
+        if self.tipo == 'NESIMO':
+            if fecha.weekday() != self.dia_semana or (self.mes and fecha.month != self.mes):
+                return False
+            if self.ordinal == -1:
+                return (fecha + timedelta(days=7)).month != fecha.month
+            return (fecha.day - 1) // 7 + 1 == self.ordinal
+        return False
+
+    def __str__(self):
+        estado = "ABIERTO" if self.abierto else "CERRADO"
+        return f"{self.get_tipo_display()} - {estado} ({self.motivo or ''})"
+    class Meta: verbose_name = "🔁 Regla de Horario"
+
+class Pedido(DelNegocio):
     # --- ESTADOS PARA EL TRACKING ---
     ESTADOS = [
         ('PENDIENTE', '⏳ Pendiente de Pago'),
@@ -119,16 +261,23 @@ class Pedido(models.Model):
     comision_plataforma = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_final = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     es_pedido_whatsapp = models.BooleanField(default=False, verbose_name="¿Es pedido manual/WhatsApp?")
+    # Navegador desde el que se hizo el pedido (cookie firmada, ver clientes.py). Vacío = mostrador / WhatsApp
+    dispositivo = models.CharField(max_length=32, blank=True, default="", editable=False)
 
     def save(self, *args, **kwargs):
-        if self.metodo_pago == 'TARJETA':
-            self.comision_plataforma = float(self.total_productos) * 0.05
-        else:
-            self.comision_plataforma = 0
-            
-        self.total_final = float(self.total_productos) + float(self.comision_plataforma)
+        self.total_productos = dinero(self.total_productos)
+        self.comision_plataforma = comision(self.total_productos, self.metodo_pago)
+        self.total_final = self.total_productos + self.comision_plataforma
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            # Historial del perfil: WHERE dispositivo = ? ORDER BY id DESC
+            models.Index(fields=['dispositivo', '-id'], name='pedido_dispositivo_id_desc'),
+            # Filtro por fecha del admin y candidatos del archivo
+            models.Index(fields=['fecha_creacion'], name='pedido_fecha_creacion'),
+        ]
+
     def __str__(self): return f"Pedido #{self.id} - {self.cliente.nombre}"
 
 class DetallePedido(models.Model):
@@ -138,9 +287,12 @@ class DetallePedido(models.Model):
     
     # NUEVO: Extras elegidos por el cliente
     extras = models.ManyToManyField(Extra, blank=True)
+    objects = DetallesPorNegocio()
     
     cantidad = models.PositiveIntegerField(default=1)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, blank=True) 
+    # Suma de los extras elegidos; la mantiene recalcular_extras_total (m2m_changed)
+    extras_total = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, blank=True)
 
     def save(self, *args, **kwargs):
@@ -148,28 +300,294 @@ class DetallePedido(models.Model):
         if not self.precio_unitario:
             self.precio_unitario = self.producto.precio
         
-        # Calcular el precio real (Base + Extra de la opción + Extras checkbox)
+        # Precio real: base + extra de la opción + extras (ya sumados, sin leer la tabla M2M)
         extra_opcion = self.opcion.precio_extra if self.opcion else 0
-        
-        # SUMAR EXTRAS (Solo si el objeto ya existe, para evitar error M2M)
-        extra_extras = 0
-        if self.pk:
-            extra_extras = sum([e.precio for e in self.extras.all()])
-
-        precio_final = self.precio_unitario + extra_opcion + extra_extras
-        
-        # Calcular subtotal
-        self.subtotal = self.cantidad * precio_final
+        self.subtotal = subtotal_linea(self.cantidad, self.precio_unitario, extra_opcion, self.extras_total)
         super().save(*args, **kwargs)
     
     def __str__(self): 
         variante_str = f" ({self.opcion.nombre})" if self.opcion else ""
         return f"{self.cantidad}x {self.producto.nombre}{variante_str}"
 
+# --- ARCHIVO HISTÓRICO (ver archivo.py) ---
+# Pedidos ENTREGADO/CANCELADO viejos salen de las tablas calientes a una fila
+# compacta (las líneas van en JSON). Se conserva el mismo id.
+
+class PedidoArchivado(DelNegocio):
+    id = models.PositiveBigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, null=True, blank=True, related_name='pedidos_archivados')
+    telefono = models.CharField(max_length=15, db_index=True)
+    nombre_cliente = models.CharField(max_length=200)
+    fecha_creacion = models.DateTimeField(db_index=True)
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADOS)
+    metodo_pago = models.CharField(max_length=20, choices=Pedido.METODOS_PAGO)
+    direccion_entrega = models.TextField(blank=True)
+    es_pedido_whatsapp = models.BooleanField(default=False)
+    total_productos = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    comision_plataforma = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_final = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    dispositivo = models.CharField(max_length=32, blank=True, default="")
+    # [{'producto_id', 'producto', 'opcion_id', 'opcion', 'extras_ids', 'extras', 'cantidad', 'precio_unitario', 'subtotal'}]
+    lineas = models.JSONField(default=list)
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "🗄️ Pedido Archivado"
+        verbose_name_plural = "🗄️ Pedidos Archivados"
+        indexes = [
+            models.Index(fields=['dispositivo', '-id'], name='archivado_dispositivo_id_desc'),
+        ]
+
+    @property
+    def num_lineas(self): return len(self.lineas)
+
+    @property
+    def primer_producto(self): return self.lineas[0]['producto'] if self.lineas else ""
+
+    def __str__(self): return f"Pedido #{self.id} (archivado) - {self.nombre_cliente}"
+
+class VentaProductoArchivada(DelNegocio):
+    """Acumulado de lo vendido en pedidos ya archivados (para el top de productos)."""
+    producto = models.OneToOneField(Producto, on_delete=models.SET_NULL, null=True, blank=True)
+    nombre = models.CharField(max_length=200)
+    cantidad = models.PositiveIntegerField(default=0)
+    dinero = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self): return f"{self.nombre}: {self.cantidad}"
+
+# --- COLA DE TAREAS EN SEGUNDO PLANO (ver tareas.py) ---
+class Tarea(DelNegocio):
+    ESTADOS = [
+        ('PENDIENTE', '⏳ Pendiente'),
+        ('CORRIENDO', '⚙️ Corriendo'),
+        ('LISTA', '✅ Lista'),
+        ('FALLIDA', '❌ Fallida'),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='PENDIENTE')
+    ejecutar_en = models.DateTimeField(default=timezone.now)
+    periodica = models.BooleanField(default=False)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    # Marca de la reserva: en SQLite (sin SKIP LOCKED) dice qué trabajador se quedó con la tarea
+    reserva = models.CharField(max_length=64, blank=True, default="")
+    ultimo_error = models.TextField(blank=True, default="")
+    creada = models.DateTimeField(auto_now_add=True)
+    iniciada = models.DateTimeField(null=True, blank=True)
+    terminada = models.DateTimeField(null=True, blank=True)
+    duracion_ms = models.FloatField(null=True, blank=True)
+
+    def __str__(self): return f"{self.nombre} #{self.id} ({self.estado})"
+
+    class Meta:
+        verbose_name = "⚙️ Tarea en segundo plano"
+        verbose_name_plural = "⚙️ Tareas en segundo plano"
+        indexes = [models.Index(fields=['estado', 'ejecutar_en'], name='tarea_estado_ejecutar_idx')]
+        constraints = [
+            # Una sola ejecución pendiente (o en curso) por tarea periódica
+            models.UniqueConstraint(fields=['nombre'], condition=Q(periodica=True, estado__in=['PENDIENTE', 'CORRIENDO']),
+                                    name='tarea_periodica_unica'),
+        ]
+
+# --- RECORRIDO DE LOS REPARTIDORES (ver telemetria.py) ---
+class PosicionRepartidor(DelNegocio):
+    repartidor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posiciones')
+    latitud = models.FloatField()
+    longitud = models.FloatField()
+    precision = models.FloatField(null=True, blank=True)  # metros, según el teléfono
+    registrada = models.DateTimeField()
+
+    def __str__(self): return f"{self.repartidor} @ {self.latitud:.5f},{self.longitud:.5f}"
+
+    class Meta:
+        verbose_name = "📍 Posición de repartidor"
+        verbose_name_plural = "📍 Posiciones de repartidores"
+        indexes = [models.Index(fields=['repartidor', 'registrada'], name='posicion_repartidor_idx')]
+
 @receiver(post_save, sender=DetallePedido)
 @receiver(post_delete, sender=DetallePedido)
 def actualizar_total_pedido(sender, instance, **kwargs):
     pedido = instance.pedido
     nuevo_total = pedido.detalles.aggregate(total=Sum('subtotal'))['total'] or 0
     pedido.total_productos = nuevo_total
-    pedido.save()
\ No newline at end of file
+    pedido.save()
+
+# --- EXTRAS DE CADA LÍNEA (extras_total) ---
+
+@receiver(m2m_changed, sender=DetallePedido.extras.through)
+def recalcular_extras_total(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # extra.detallepedido_set.add/remove/clear: cada línea afectada
+        if action == 'pre_clear':
+            instance._detalles_limpiados = list(instance.detallepedido_set.values_list('id', flat=True))
+            return
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        ids = pk_set if action != 'post_clear' else getattr(instance, '_detalles_limpiados', [])
+        # Pueden ser muchas líneas, cada una recalcula su pedido: va a la cola de tareas
+        from .tareas import encolar, recalcular_lineas
+        encolar(recalcular_lineas, ids=sorted(ids))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        recalcular_lineas_extras([instance])
+
+def recalcular_lineas_extras(detalles):
+    for detalle in detalles:
+        detalle.extras_total = dinero(detalle.extras.aggregate(total=Sum('precio'))['total'])
+        detalle.save()
+
+# --- MÉTRICA: PEDIDOS QUE ENTRAN A CADA ESTADO ---
+
+@receiver(post_init, sender=Pedido)
+def recordar_estado_pedido(sender, instance, **kwargs):
+    instance._estado_original = instance.estado
+    instance._estado_carga = instance.estado
+    instance._estado_cocina = instance.estado
+
+@receiver(post_save, sender=Pedido)
+def contar_cambio_estado(sender, instance, created, **kwargs):
+    if created or instance.estado != instance._estado_original:
+        PEDIDOS_ESTADO_TOTAL.labels(instance.estado).inc()
+        instance._estado_original = instance.estado
+
+# --- MINIATURAS AL SUBIR LA FOTO ---
+
+@receiver(post_save, sender=Producto)
+def generar_miniaturas_producto(sender, instance, **kwargs):
+    nombre = instance.imagen.name if instance.imagen else ''
+    if nombre == instance.imagen_variantes.get('original', ''):
+        return
+    if not nombre:
+        instance.imagen_variantes = {}
+        # update() para no volver a disparar post_save
+        Producto.objects.filter(pk=instance.pk).update(imagen_variantes={})
+        invalidar_catalogo()
+        return
+    # Redimensionar y subir 10 variantes es lento: va a la cola de tareas
+    from django.conf import settings
+    from .tareas import encolar, miniaturas_producto
+    try:
+        with transaction.atomic():
+            encolar(miniaturas_producto, producto_id=instance.pk, nombre=nombre)
+    except Exception:
+        # Sin cola corre aquí mismo: un fallo de Pillow o del storage no tumba el
+        # guardado (la fila ya está escrita); sin variantes se sirve la original
+        logger.exception("No se pudieron generar las miniaturas del producto %s", instance.pk)
+        instance.imagen_variantes = {}
+        Producto.objects.filter(pk=instance.pk).update(imagen_variantes={})
+        invalidar_catalogo()
+        return
+    if not settings.TAREAS_EN_COLA:
+        instance.refresh_from_db(fields=['imagen_variantes'])
+
+# --- INVALIDACIÓN DEL CATÁLOGO (MENÚ CACHEADO) ---
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=OpcionProducto)
+@receiver(post_delete, sender=OpcionProducto)
+@receiver(post_save, sender=Extra)
+@receiver(post_delete, sender=Extra)
+@receiver(m2m_changed, sender=Producto.extras.through)
+def invalidar_catalogo_cacheado(sender, **kwargs):
+    if kwargs.get('action', '').startswith('pre_'): return
+    invalidar_catalogo()
+
+
+# --- INVALIDACIÓN DEL HORARIO COMPILADO ---
+
+@receiver(post_save, sender=ConfiguracionNegocio)
+@receiver(post_delete, sender=ConfiguracionNegocio)
+@receiver(post_save, sender=DiaEspecial)
+@receiver(post_delete, sender=DiaEspecial)
+@receiver(post_save, sender=TurnoHorario)
+@receiver(post_delete, sender=TurnoHorario)
+@receiver(post_save, sender=ReglaHorario)
+@receiver(post_delete, sender=ReglaHorario)
+def invalidar_horario_compilado(sender, **kwargs):
+    from .horario import invalidar_horario
+    invalidar_horario()
+
+
+# --- CARGA DE LA COCINA (CAPACIDAD) ---
+
+@receiver(post_save, sender=Pedido)
+def invalidar_carga_por_pedido(sender, instance, created, **kwargs):
+    # Solo si entra/sale de la cola. on_commit: en checkout los detalles se crean
+    # después del pedido y la foto debe incluir sus unidades.
+    if created or getattr(instance, '_estado_carga', None) != instance.estado:
+        instance._estado_carga = instance.estado
+        from .capacidad import invalidar_carga
+        transaction.on_commit(invalidar_carga)
+
+@receiver(post_delete, sender=Pedido)
+@receiver(post_save, sender=ConfiguracionNegocio)
+def invalidar_carga_cocina(sender, **kwargs):
+    from .capacidad import invalidar_carga
+    transaction.on_commit(invalidar_carga)
+
+
+# --- PANTALLA DE COCINA: AVISAR CUANDO CAMBIA EL TABLERO ---
+
+@receiver(post_save, sender=Pedido)
+def avisar_tablero_por_pedido(sender, instance, created, **kwargs):
+    # Entra a COCINA o sale de ella
+    anterior = None if created else getattr(instance, '_estado_cocina', None)
+    if anterior != instance.estado and 'COCINA' in (anterior, instance.estado):
+        from .cocina import avisar_cambio_cocina
+        transaction.on_commit(avisar_cambio_cocina)
+    instance._estado_cocina = instance.estado
+
+@receiver(post_delete, sender=Pedido)
+def avisar_tablero_por_pedido_borrado(sender, instance, **kwargs):
+    if instance.estado == 'COCINA':
+        from .cocina import avisar_cambio_cocina
+        transaction.on_commit(avisar_cambio_cocina)
+
+@receiver(post_save, sender=DetallePedido)
+@receiver(post_delete, sender=DetallePedido)
+def avisar_tablero_por_detalle(sender, instance, **kwargs):
+    # Líneas editadas (admin) de un pedido que ya está en cocina
+    if instance.pedido.estado == 'COCINA':
+        from .cocina import avisar_cambio_cocina
+        transaction.on_commit(avisar_cambio_cocina)
+
+
+# --- DISPONIBILIDAD: AGOTADOS EN VIVO ---
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=OpcionProducto)
+@receiver(post_delete, sender=OpcionProducto)
+@receiver(post_save, sender=Extra)
+@receiver(post_delete, sender=Extra)
+def invalidar_disponibilidad_catalogo(sender, **kwargs):
+    from .disponibilidad import invalidar_disponibilidad
+    transaction.on_commit(invalidar_disponibilidad)
+
+
+# --- MULTINEGOCIO: OLVIDAR EL HOST CACHEADO ---
+
+@receiver(post_save, sender=Negocio)
+@receiver(post_delete, sender=Negocio)
+@receiver(m2m_changed, sender=Negocio.usuarios.through)
+def olvidar_negocio_cacheado(sender, instance, **kwargs):
+    if isinstance(instance, Negocio):
+        olvidar_host(instance.dominio)
+    elif kwargs.get('pk_set'):  # user.negocios.add(...)
+        for dominio in Negocio.objects.filter(pk__in=kwargs['pk_set']).values_list('dominio', flat=True):
+            olvidar_host(dominio)
+
+
+# --- ROLES DEL STAFF CACHEADOS ---
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidar_roles_cacheados(sender, **kwargs):
+    if kwargs.get('action', '').startswith('pre_'): return
+    from .roles import invalidar_roles
+    invalidar_roles()
@@ -0,0 +1,210 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .catalogo import version_catalogo
+from .clientes import guardar_cliente, normalizar_telefono
+from .models import Cliente, DetallePedido, Extra, OpcionProducto, Pedido, Producto
+from .precios import dinero, subtotal_linea
+from .tenencia import id_negocio_actual
+
+# --- PEDIDOS POR TELÉFONO / WHATSAPP (MOSTRADOR) ---
+# El cajero arma el pedido con el teclado y lo manda entero en un solo POST
+# JSON. Los precios salen de un índice del catálogo que vive en la memoria del
+# proceso (uno por negocio), reconstruido solo cuando sube version_catalogo():
+# buscar un producto o validar un pedido no toca la base ni deserializa nada.
+# Con LocMem otro proceso puede tener un índice viejo: dentro de la
+# transacción se comparan los precios del pedido con la base (tres consultas)
+# y, si alguno cambió, el pedido se rechaza para que el cajero recargue.
+# Al guardar, las líneas y sus extras van en dos bulk_create con subtotal y
+# extras_total ya calculados: ni DetallePedido.save ni actualizar_total_pedido
+# ni recalcular_extras_total corren por cada fila (el pedido nace con su total).
+
+MAX_LINEAS = 50
+MAX_CANTIDAD = 99
+METODOS_MOSTRADOR = {metodo for metodo, _ in Pedido.METODOS_PAGO}
+
+_indices = {}
+
+
+def normalizar(texto):
+    return Cliente.texto_busqueda(texto)
+
+
+class IndiceCatalogo:
+    """Productos, opciones y extras por id, con precios en Decimal y el nombre normalizado para buscar."""
+
+    def __init__(self, version, productos, opciones, extras):
+        self.version = version
+        self.productos, self.opciones, self.extras = productos, opciones, extras
+
+    @classmethod
+    def construir(cls, version):
+        """Cuatro consultas para todo el catálogo."""
+        extras = {e.id: {'id': e.id, 'nombre': e.nombre, 'precio': dinero(e.precio)} for e in Extra.objects.all()}
+        productos = {}
+        for p in Producto.objects.select_related('categoria').order_by('categoria__orden', 'categoria__nombre', 'nombre'):
+            productos[p.id] = {
+                'id': p.id, 'nombre': p.nombre, 'categoria': p.categoria.nombre, 'precio': dinero(p.precio),
+                'opciones': [], 'extras': [], 'busqueda': normalizar(f"{p.nombre} {p.categoria.nombre}"),
+            }
+        opciones = {}
+        for o in OpcionProducto.objects.filter(producto_id__in=productos).order_by('id'):
+            opciones[o.id] = {'id': o.id, 'producto_id': o.producto_id, 'nombre': o.nombre, 'precio_extra': dinero(o.precio_extra)}
+            productos[o.producto_id]['opciones'].append(o.id)
+        relaciones = Producto.extras.through.objects.filter(producto_id__in=productos, extra_id__in=extras)
+        for producto_id, extra_id in relaciones.order_by('id').values_list('producto_id', 'extra_id'):
+            productos[producto_id]['extras'].append(extra_id)
+        return cls(version, productos, opciones, extras)
+
+    def buscar(self, texto, limite=10):
+        """Productos cuyo nombre o categoría contiene todas las palabras; primero los que empiezan igual."""
+        palabras = normalizar(texto).split()
+        if not palabras:
+            return []
+        encontrados = [p for p in self.productos.values() if all(palabra in p['busqueda'] for palabra in palabras)]
+        encontrados.sort(key=lambda p: not p['busqueda'].startswith(palabras[0]))
+        return encontrados[:limite]
+
+    @staticmethod
+    def productos_json(productos, disponibilidad):
+        return [{**p, 'precio': str(p['precio']), 'agotado': disponibilidad.producto_agotado(p['id'])} for p in productos]
+
+    def para_json(self, disponibilidad):
+        """El índice para el navegador (la búsqueda del cajero corre ahí), con los agotados marcados."""
+        return {
+            'version': self.version,
+            'productos': self.productos_json(self.productos.values(), disponibilidad),
+            'opciones': {
+                o['id']: {**o, 'precio_extra': str(o['precio_extra']), 'agotado': disponibilidad.opcion_agotada(o['id'])}
+                for o in self.opciones.values()
+            },
+            'extras': {
+                e['id']: {**e, 'precio': str(e['precio']), 'agotado': disponibilidad.extra_agotado(e['id'])}
+                for e in self.extras.values()
+            },
+        }
+
+
+def obtener_indice_catalogo():
+    """Índice del negocio actual; solo se reconstruye si cambió la versión del catálogo."""
+    negocio_id = id_negocio_actual()
+    version = version_catalogo()
+    indice = _indices.get(negocio_id)
+    if indice is None or indice.version != version:
+        indice = IndiceCatalogo.construir(version)
+        _indices[negocio_id] = indice
+    return indice
+
+
+# --- VALIDAR Y GUARDAR EL PEDIDO ---
+
+def _entero(valor, campo):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValidationError(f"'{campo}' debe ser un número entero.")
+
+def _lineas(datos, indice, disponibilidad):
+    """[(producto, opcion|None, [extras], cantidad)] validadas contra el índice y los agotados."""
+    lineas = datos.get('lineas')
+    if not isinstance(lineas, list) or not lineas:
+        raise ValidationError("El pedido no tiene productos.")
+    if len(lineas) > MAX_LINEAS:
+        raise ValidationError(f"Máximo {MAX_LINEAS} líneas por pedido.")
+
+    validas = []
+    for n, linea in enumerate(lineas, start=1):
+        if not isinstance(linea, dict):
+            raise ValidationError(f"Línea {n}: formato inválido.")
+        producto = indice.productos.get(_entero(linea.get('producto'), 'producto'))
+        if producto is None:
+            raise ValidationError(f"Línea {n}: el producto no existe.")
+        if disponibilidad.producto_agotado(producto['id']):
+            raise ValidationError(f"Línea {n}: {producto['nombre']} está agotado.")
+
+        opcion = None
+        if linea.get('opcion'):
+            opcion = indice.opciones.get(_entero(linea['opcion'], 'opcion'))
+            if opcion is None or opcion['producto_id'] != producto['id']:
+                raise ValidationError(f"Línea {n}: la opción no es de {producto['nombre']}.")
+            if disponibilidad.opcion_agotada(opcion['id']):
+                raise ValidationError(f"Línea {n}: {opcion['nombre']} está agotado.")
+
+        extras = []
+        for extra_id in dict.fromkeys(_entero(e, 'extras') for e in linea.get('extras') or []):
+            if extra_id not in producto['extras']:
+                raise ValidationError(f"Línea {n}: ese extra no aplica a {producto['nombre']}.")
+            if disponibilidad.extra_agotado(extra_id):
+                raise ValidationError(f"Línea {n}: {indice.extras[extra_id]['nombre']} está agotado.")
+            extras.append(indice.extras[extra_id])
+
+        cantidad = _entero(linea.get('cantidad', 1), 'cantidad')
+        if not 1 <= cantidad <= MAX_CANTIDAD:
+            raise ValidationError(f"Línea {n}: la cantidad va de 1 a {MAX_CANTIDAD}.")
+        validas.append((producto, opcion, extras, cantidad))
+    return validas
+
+def _verificar_precios(lineas):
+    """ValidationError si algún precio del índice ya no es el de la base."""
+    productos, opciones, extras = {}, {}, {}
+    for producto, opcion, extras_linea, _ in lineas:
+        productos[producto['id']] = producto['precio']
+        if opcion:
+            opciones[opcion['id']] = opcion['precio_extra']
+        extras.update((e['id'], e['precio']) for e in extras_linea)
+    for modelo, campo, esperados in ((Producto, 'precio', productos), (OpcionProducto, 'precio_extra', opciones),
+                                     (Extra, 'precio', extras)):
+        if not esperados:
+            continue
+        vigentes = {i: dinero(precio) for i, precio in modelo.objects.filter(id__in=esperados).values_list('id', campo)}
+        if vigentes != esperados:
+            raise ValidationError("El catálogo cambió mientras se armaba el pedido. Recargue y revise los precios.")
+
+def crear_pedido_mostrador(datos, indice, disponibilidad):
+    """
+    Valida el JSON del cajero y guarda cliente, pedido, líneas y extras en una
+    transacción. Lanza ValidationError sin escribir nada si algo no cuadra.
+    """
+    telefono = normalizar_telefono(str(datos.get('telefono') or ''))
+    if not telefono:
+        raise ValidationError("Teléfono inválido.")
+    metodo_pago = datos.get('metodo_pago') or 'EFECTIVO'
+    if metodo_pago not in METODOS_MOSTRADOR:
+        raise ValidationError("Método de pago inválido.")
+    lineas = _lineas(datos, indice, disponibilidad)
+    direccion = str(datos.get('direccion') or '').strip()
+
+    detalles, total = [], dinero(0)
+    for producto, opcion, extras, cantidad in lineas:
+        extras_total = dinero(sum(e['precio'] for e in extras))
+        precio_opcion = opcion['precio_extra'] if opcion else dinero(0)
+        subtotal = subtotal_linea(cantidad, producto['precio'], precio_opcion, extras_total)
+        total += subtotal
+        detalles.append(DetallePedido(
+            producto_id=producto['id'], opcion_id=opcion['id'] if opcion else None, cantidad=cantidad,
+            precio_unitario=producto['precio'], extras_total=extras_total, subtotal=subtotal,
+        ))
+
+    with transaction.atomic():
+        _verificar_precios(lineas)
+        cliente = guardar_cliente(telefono, str(datos.get('nombre') or '').strip(),
+                                  str(datos.get('apellido') or '').strip(), direccion)
+        pedido = Pedido.objects.create(
+            cliente=cliente, direccion_entrega=direccion, metodo_pago=metodo_pago,
+            es_pedido_whatsapp=bool(datos.get('whatsapp', True)), estado='RECIBIDO', total_productos=total,
+        )
+        for detalle in detalles:
+            detalle.pedido = pedido
+        DetallePedido.objects.bulk_create(detalles)
+        if detalles[0].pk is None:
+            # Motores sin RETURNING en inserts masivos (MySQL): los ids en orden de inserción
+            ids = DetallePedido.objects.filter(pedido=pedido).order_by('id').values_list('id', flat=True)
+            for detalle, detalle_id in zip(detalles, ids):
+                detalle.pk = detalle_id
+
+        Elegido = DetallePedido.extras.through
+        Elegido.objects.bulk_create([
+            Elegido(detallepedido_id=detalle.pk, extra_id=extra['id'])
+            for detalle, (_, _, extras, _) in zip(detalles, lineas) for extra in extras
+        ])
+    return pedido
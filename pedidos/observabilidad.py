@@ -0,0 +1,200 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# --- LOGS ESTRUCTURADOS (JSON, SIN BLOQUEAR LA PETICIÓN) ---
+# La vista solo mete el registro en una cola en memoria; un hilo aparte lo
+# formatea como una línea JSON y lo escribe en stdout.
+
+# Atributos que trae todo LogRecord; lo demás viene de extra={...}
+_ATRIBUTOS_BASE = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, dt_timezone.utc).isoformat(),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_BASE and not clave.startswith('_'):
+                data[clave] = valor
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ColaJSONHandler(QueueHandler):
+    """Handler para LOGGING: encola y deja que un QueueListener escriba JSON."""
+
+    def __init__(self, tamano=10000):
+        super().__init__(queue.Queue(tamano))
+        salida = logging.StreamHandler(sys.stdout)
+        salida.setFormatter(FormatoJSON())
+        self.listener = QueueListener(self.queue, salida, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # Igual que QueueHandler.prepare pero sin aplanar los campos extra ni perder la traza
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Preferimos perder un log antes que frenar una petición
+            METRICAS.contador('foodback_logs_descartados_total', "Logs descartados por cola llena").inc()
+
+
+# --- MÉTRICAS (FORMATO DE TEXTO PROMETHEUS) ---
+# Viven en memoria de cada worker; el endpoint /metrics las expone.
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ''
+    return '{' + ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)) + '}'
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self._valores = {}
+        self._candado = threading.Lock()
+
+    def labels(self, *valores):
+        return _Hijo(self, tuple(str(v) for v in valores))
+
+    def inc(self, cantidad=1, _clave=()):
+        with self._candado:
+            self._valores[_clave] = self._valores.get(_clave, 0) + cantidad
+
+    def exponer(self):
+        with self._candado:
+            valores = dict(self._valores)
+        for clave, valor in sorted(valores.items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}"
+
+
+class Histograma:
+    tipo = 'histogram'
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=None):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self._series = {}  # clave -> [conteos por bucket..., +Inf, suma]
+        self._candado = threading.Lock()
+
+    def labels(self, *valores):
+        return _Hijo(self, tuple(str(v) for v in valores))
+
+    def observe(self, valor, _clave=()):
+        i = bisect_left(self.buckets, valor)
+        with self._candado:
+            serie = self._series.setdefault(_clave, [0] * (len(self.buckets) + 1) + [0.0])
+            serie[i] += 1
+            serie[-1] += valor
+
+    @contextmanager
+    def medir(self, _clave=()):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, _clave)
+
+    def exponer(self):
+        with self._candado:
+            series = {k: list(v) for k, v in self._series.items()}
+        for clave, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, n in zip(self.buckets + ('+Inf',), serie[:-1]):
+                acumulado += n
+                yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas + ('le',), clave + (limite,))} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {serie[-1]}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}"
+
+
+class _Hijo:
+    """Serie con etiquetas ya fijadas: METRICA.labels('x').inc()"""
+
+    def __init__(self, metrica, clave):
+        self._metrica, self._clave = metrica, clave
+
+    def inc(self, cantidad=1):
+        self._metrica.inc(cantidad, _clave=self._clave)
+
+    def observe(self, valor):
+        self._metrica.observe(valor, _clave=self._clave)
+
+    def medir(self):
+        return self._metrica.medir(_clave=self._clave)
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._candado = threading.Lock()
+
+    def _obtener(self, clase, nombre, ayuda, etiquetas, **kwargs):
+        with self._candado:
+            if nombre not in self._metricas:
+                self._metricas[nombre] = clase(nombre, ayuda, etiquetas, **kwargs)
+            return self._metricas[nombre]
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._obtener(Contador, nombre, ayuda, etiquetas)
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=None):
+        return self._obtener(Histograma, nombre, ayuda, etiquetas, buckets=buckets)
+
+    def texto_prometheus(self):
+        lineas = []
+        with self._candado:
+            metricas = list(self._metricas.values())
+        for m in metricas:
+            lineas.append(f"# HELP {m.nombre} {m.ayuda}")
+            lineas.append(f"# TYPE {m.nombre} {m.tipo}")
+            lineas.extend(m.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+METRICAS = Registro()
+
+# Métricas del negocio (se registran aquí para que /metrics las liste desde el arranque)
+ENLACE_PAGO_SEGUNDOS = METRICAS.histograma(
+    'foodback_wompi_enlace_segundos', "Tiempo en crear un enlace de pago Wompi (auth + enlace)", ['tipo'])
+WEBHOOK_SEGUNDOS = METRICAS.histograma(
+    'foodback_webhook_segundos', "Tiempo procesando el webhook de Wompi", ['resultado'])
+PEDIDOS_ESTADO_TOTAL = METRICAS.contador(
+    'foodback_pedidos_estado_total', "Pedidos que entraron a cada estado", ['estado'])
+ERRORES_BANCO_TOTAL = METRICAS.contador(
+    'foodback_banco_errores_total', "Errores hablando con el banco", ['tipo', 'etapa'])
+TAREA_SEGUNDOS = METRICAS.histograma(
+    'foodback_tarea_segundos', "Duración de cada tarea en segundo plano", ['tarea', 'resultado'])
+TELEMETRIA_PUNTOS_TOTAL = METRICAS.contador(
+    'foodback_telemetria_puntos_total', "Puntos GPS de repartidores por destino", ['resultado'])
@@ -0,0 +1,115 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+from decouple import config
+from django.conf import settings
+
+from .instrumentacion import medir_http
+
+# --- BANCO Y GEO-IP (HTTP ASÍNCRONO) ---
+# Pagar un pedido, pagar la suscripción y ubicar la IP pasan casi todo su
+# tiempo esperando un servicio externo. Servidas por ASGI (core/asgi.py) son
+# vistas async: mientras esperan al banco el mismo proceso sigue atendiendo el
+# menú. Bajo ASGI el loop vive lo que el worker y un cliente httpx por loop
+# reutiliza conexiones (pool); core/asgi.py lo activa con usar_pool_por_loop().
+# Bajo WSGI cada petición corre en su propio loop, que muere con ella: se abre
+# y se cierra un cliente por llamada. Todas las llamadas tienen timeout
+# (BANCO_TIMEOUT, GEOIP_TIMEOUT).
+# httpx se importa al primer pago / geo-ip, no al arrancar el worker.
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Las pruebas y el benchmark pueden poner aquí un httpx.MockTransport
+transporte = None
+
+_clientes = weakref.WeakKeyDictionary()
+_pool_por_loop = False
+
+
+class ErrorBanco(Exception):
+    """Fallo hablando con Wompi. 'fase' es la etiqueta de ERRORES_BANCO_TOTAL: auth, enlace o conexion."""
+
+    def __init__(self, fase, http_status=None, respuesta=''):
+        super().__init__(fase)
+        self.fase = fase
+        self.http_status = http_status
+        self.respuesta = respuesta
+
+
+def usar_pool_por_loop(activo=True):
+    """Solo donde el event loop vive lo que el proceso (ASGI): si no, cada loop muerto deja un cliente abierto."""
+    global _pool_por_loop
+    _pool_por_loop = activo
+
+def _nuevo_cliente():
+    import httpx
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.BANCO_TIMEOUT, connect=settings.BANCO_TIMEOUT_CONEXION),
+        limits=httpx.Limits(max_connections=settings.BANCO_MAX_CONEXIONES,
+                            max_keepalive_connections=settings.BANCO_MAX_CONEXIONES),
+        headers={'User-Agent': USER_AGENT, 'Accept': 'application/json'},
+        transport=transporte,
+    )
+
+@asynccontextmanager
+async def cliente_http():
+    """
+    AsyncClient para una llamada: el compartido del event loop actual con
+    usar_pool_por_loop(), o uno propio que se cierra al salir.
+    """
+    if not _pool_por_loop:
+        async with _nuevo_cliente() as cliente:
+            yield cliente
+        return
+    loop = asyncio.get_running_loop()
+    cliente = _clientes.get(loop)
+    if cliente is None:
+        cliente = _clientes[loop] = _nuevo_cliente()
+    yield cliente
+
+async def cerrar_cliente_http():
+    """Cierra el pool del loop actual (al terminar el benchmark o un script)."""
+    cliente = _clientes.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.aclose()
+
+
+async def crear_enlace_pago(payload):
+    """Pide token y crea el enlace de pago en Wompi. Retorna la URL del enlace o lanza ErrorBanco."""
+    import httpx
+    auth_url = config('WOMPI_AUTH_URL', default='https://id.wompi.sv/connect/token')
+    api_url = config('WOMPI_API_URL', default='https://api.wompi.sv/EnlacePago')
+    try:
+        async with cliente_http() as cliente:
+            with medir_http():
+                auth = await cliente.post(auth_url, data={
+                    'grant_type': 'client_credentials', 'client_id': config('WOMPI_APP_ID', default=''),
+                    'client_secret': config('WOMPI_API_SECRET', default=''), 'audience': 'wompi_api',
+                })
+            if auth.status_code != 200:
+                raise ErrorBanco('auth', auth.status_code)
+            access_token = auth.json().get('access_token')
+
+            with medir_http():
+                enlace = await cliente.post(api_url, json=payload, headers={'Authorization': f'Bearer {access_token}'})
+        if enlace.status_code != 200:
+            raise ErrorBanco('enlace', enlace.status_code, enlace.text[:500])
+        return enlace.json().get('urlEnlace')
+    except (httpx.HTTPError, ValueError) as e:
+        raise ErrorBanco('conexion') from e
+
+
+async def ubicacion_ip(ip):
+    """(lat, lng, ciudad) si ip-api ubica la IP en El Salvador; None si no o si no responde."""
+    import httpx
+    try:
+        async with cliente_http() as cliente:
+            with medir_http():
+                respuesta = await cliente.get(f"http://ip-api.com/json/{ip}", timeout=settings.GEOIP_TIMEOUT)
+        data = respuesta.json()
+    except (httpx.HTTPError, ValueError):
+        return None
+    if data.get('status') == 'success' and data.get('countryCode') == 'SV':
+        return data['lat'], data['lon'], data['city']
+    return None
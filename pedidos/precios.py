@@ -0,0 +1,58 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Sum
+
+# --- PRECIOS (SOLO DECIMAL) ---
+# Toda la aritmética de dinero pasa por aquí: Decimal redondeado a centavos,
+# nunca float. Los modelos guardan el resultado; las vistas solo convierten a
+# float al serializar para JSON o APIs externas.
+
+CENTAVOS = Decimal('0.01')
+CERO = Decimal('0.00')
+COMISION_TARJETA = Decimal('0.05')
+
+
+def dinero(valor):
+    """Cualquier monto (Decimal, int, str, float, None) a Decimal con 2 decimales."""
+    if valor is None or valor == '':
+        return CERO
+    if not isinstance(valor, Decimal):
+        valor = Decimal(str(valor))
+    return valor.quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+def subtotal_linea(cantidad, precio_unitario, precio_opcion=CERO, extras_total=CERO):
+    return dinero(cantidad * (dinero(precio_unitario) + dinero(precio_opcion) + dinero(extras_total)))
+
+def comision(total_productos, metodo_pago):
+    """5% de la pasarela solo para pagos con tarjeta."""
+    if metodo_pago != 'TARJETA':
+        return CERO
+    return dinero(dinero(total_productos) * COMISION_TARJETA)
+
+def total_con_comision(total_productos, metodo_pago):
+    total = dinero(total_productos)
+    return total + comision(total, metodo_pago)
+
+# --- RELLENO DE extras_total ---
+
+def rellenar_extras_total(DetallePedido, lote=2000):
+    """
+    Recalcula DetallePedido.extras_total con una consulta agregada por lote y
+    bulk_update (la migración 0018 tiene su propia copia). No toca subtotales
+    ya cobrados. Retorna cuántas líneas cambió.
+    """
+    Enlace = DetallePedido.extras.through
+    cambiadas, ultimo = 0, 0
+    while True:
+        actuales = list(DetallePedido.objects.filter(id__gt=ultimo).order_by('id').values_list('id', 'extras_total')[:lote])
+        if not actuales:
+            return cambiadas
+        ultimo = actuales[-1][0]
+        sumas = dict(
+            Enlace.objects.filter(detallepedido_id__in=[i for i, _ in actuales]).values('detallepedido_id')
+            .annotate(total=Sum('extra__precio')).values_list('detallepedido_id', 'total')
+        )
+        filas = [DetallePedido(id=i, extras_total=dinero(sumas.get(i))) for i, actual in actuales
+                 if actual != dinero(sumas.get(i))]
+        DetallePedido.objects.bulk_update(filas, ['extras_total'])
+        cambiadas += len(filas)
@@ -0,0 +1,128 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+# --- LECTURAS EN LA RÉPLICA ---
+# Con DATABASE_REPLICA_URL hay un segundo alias 'replica'. Solo las vistas y
+# comandos marcados (reportes, exportación, historial, changelist del admin)
+# leen de ahí, solo los modelos de esta app (sesiones y usuarios siempre del
+# primario: un login recién hecho no puede faltar en la réplica), y solo mientras:
+#   - la petición no haya escrito nada (después de escribir, todo va al primario),
+#   - no haya una transacción abierta en el primario,
+#   - el retraso de la réplica no pase de REPLICA_RETRASO_MAXIMO segundos.
+# Sin réplica configurada el router no hace nada.
+
+ALIAS = 'replica'
+CLAVE_RETRASO = 'replica:retraso'
+
+_en_replica = ContextVar('en_replica', default=False)
+_escribio = ContextVar('escribio', default=False)
+
+
+def replica_configurada():
+    return ALIAS in settings.DATABASES
+
+@contextmanager
+def lecturas_en_replica():
+    """Para comandos: las lecturas del bloque pueden ir a la réplica."""
+    token_replica, token_escritura = _en_replica.set(True), _escribio.set(False)
+    try:
+        yield
+    finally:
+        _en_replica.reset(token_replica)
+        _escribio.reset(token_escritura)
+
+def lectura_replica(vista):
+    """
+    Decorador para vistas que toleran datos de hace unos segundos. Renderiza
+    la TemplateResponse dentro del bloque: si no, las consultas del template
+    correrían fuera y volverían al primario.
+    """
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        with lecturas_en_replica():
+            response = vista(*args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+    return envoltura
+
+
+# --- RETRASO DE LA RÉPLICA ---
+
+def _medir_retraso():
+    """Segundos de atraso de la réplica respecto al primario."""
+    conexion = connections[ALIAS]
+    if conexion.vendor == 'postgresql':
+        with conexion.cursor() as cursor:
+            # Si ya aplicó todo lo recibido está al día aunque la última transacción sea vieja
+            # (primario sin escrituras). NULL en un servidor que no es standby: sin retraso
+            cursor.execute(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )
+            return max(0.0, float(cursor.fetchone()[0]))
+    if conexion.vendor == 'sqlite':
+        # Dos archivos locales (sincronizar_replica): si el primario cambió después de
+        # la última copia, a la réplica le falta todo lo escrito desde esa copia
+        copia = os.path.getmtime(conexion.settings_dict['NAME'])
+        if os.path.getmtime(connections['default'].settings_dict['NAME']) <= copia:
+            return 0.0
+        return time.time() - copia
+    return 0.0
+
+def retraso_replica():
+    """Retraso en segundos, medido como mucho cada REPLICA_CHEQUEO_SEGUNDOS. Infinito si la réplica no responde."""
+    retraso = cache.get(CLAVE_RETRASO)
+    if retraso is None:
+        try:
+            retraso = _medir_retraso()
+        except (DatabaseError, OSError):
+            retraso = float('inf')
+        cache.set(CLAVE_RETRASO, retraso, settings.REPLICA_CHEQUEO_SEGUNDOS)
+    return retraso
+
+
+class RouterReplica:
+    app_label = 'pedidos'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        if not (_en_replica.get() and replica_configurada()) or _escribio.get():
+            return None
+        if connections['default'].in_atomic_block:
+            return None
+        if retraso_replica() > settings.REPLICA_RETRASO_MAXIMO:
+            return None
+        return ALIAS
+
+    def db_for_write(self, model, **hints):
+        if _en_replica.get():
+            _escribio.set(True)  # desde aquí la petición lee lo que acaba de escribir
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema del primario, nunca migraciones propias
+        return db != ALIAS
+
+
+def copiar_sqlite(origen, destino):
+    """Copia consistente de un archivo SQLite a otro (API de backup), para probar la réplica en local."""
+    import sqlite3
+    fuente, copia = sqlite3.connect(origen), sqlite3.connect(destino)
+    try:
+        fuente.backup(copia)
+    finally:
+        copia.close()
+        fuente.close()
+    os.utime(destino, (time.time(), time.time()))
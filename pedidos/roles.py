@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .tenencia import negocio_activo
+
+# --- ROLES DEL STAFF (CACHEADOS) ---
+# Cada vista del staff pregunta si el usuario es administrador o repartidor.
+# Con una caché compartida (CACHE_COMPARTIDA) los grupos de cada usuario se
+# guardan con una versión que sube cuando cambia la pertenencia a un grupo
+# (señales en models.py). Usuarios y grupos no son de ningún negocio: las
+# claves van sin el prefijo del negocio, así cualquier petición invalida las
+# de todos. Con LocMem la invalidación solo llegaría al worker que atendió el
+# cambio: ahí no se cachea entre peticiones, solo dentro de la misma.
+
+CLAVE_VERSION = 'roles:version'
+
+
+def version_roles():
+    with negocio_activo(None):
+        version = cache.get(CLAVE_VERSION)
+        if version is None:
+            cache.add(CLAVE_VERSION, int(time.time()), None)
+            version = cache.get(CLAVE_VERSION)
+    return version
+
+def _grupos_en_base(user):
+    return frozenset(user.groups.values_list('name', flat=True))
+
+def grupos_de(user):
+    """Nombres de los grupos del usuario (frozenset vacío si es anónimo)."""
+    if not user.is_authenticated:
+        return frozenset()
+    if not settings.CACHE_COMPARTIDA:
+        # request.user vive lo que la petición: varias preguntas, una consulta
+        if not hasattr(user, '_grupos_pedidos'):
+            user._grupos_pedidos = _grupos_en_base(user)
+        return user._grupos_pedidos
+    clave = f"roles:{version_roles()}:{user.id}"
+    with negocio_activo(None):
+        grupos = cache.get(clave)
+        if grupos is None:
+            grupos = _grupos_en_base(user)
+            cache.set(clave, grupos, settings.ROLES_CACHE_TTL)
+    return grupos
+
+def invalidar_roles():
+    with negocio_activo(None):
+        try:
+            cache.incr(CLAVE_VERSION)
+        except ValueError:
+            cache.add(CLAVE_VERSION, int(time.time()), None)
@@ -0,0 +1,260 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, connections, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Tarea
+from .observabilidad import TAREA_SEGUNDOS
+from .tenencia import negocio_activo
+
+logger = logging.getLogger(__name__)
+
+# --- COLA DE TAREAS EN SEGUNDO PLANO ---
+# Lo lento que no hace falta para responder (miniaturas, recalcular líneas,
+# limpiezas) se encola como una fila de Tarea y lo corre
+# `manage.py procesar_tareas` con un pool de hilos o de procesos. Sin Redis:
+#   - Postgres reserva con SELECT ... FOR UPDATE SKIP LOCKED (varios
+#     trabajadores no se estorban),
+#   - SQLite (sin SKIP LOCKED) reserva con un UPDATE condicionado a
+#     estado='PENDIENTE' y una marca propia: si dos trabajadores eligen la
+#     misma fila, solo uno la cambia.
+# Reintentos con espera exponencial, tareas programadas (en=) y periódicas
+# (@tarea(cada=...)), y duracion_ms por ejecución para las estadísticas.
+# Con TAREAS_EN_COLA=False (por defecto) encolar() corre la tarea ahí mismo,
+# como antes: así un despliegue sin trabajador no pierde nada.
+
+REGISTRO = {}
+
+
+class DefinicionTarea:
+    def __init__(self, funcion, nombre, max_intentos, cada):
+        self.funcion, self.nombre, self.max_intentos, self.cada = funcion, nombre, max_intentos, cada
+
+
+def tarea(nombre=None, max_intentos=3, cada=None):
+    """Registra una función como tarea. 'cada' (timedelta) la vuelve periódica."""
+    def registrar(funcion):
+        definicion = DefinicionTarea(funcion, nombre or funcion.__name__, max_intentos, cada)
+        REGISTRO[definicion.nombre] = definicion
+        funcion.tarea = definicion
+        return funcion
+    return registrar
+
+def encolar(funcion, en=None, **argumentos):
+    """
+    Encola funcion(**argumentos) (argumentos serializables a JSON) para
+    ahora o para 'en' (datetime). Dentro de una transacción la fila solo es
+    visible al confirmarse. Sin TAREAS_EN_COLA corre de inmediato.
+    """
+    definicion = funcion.tarea
+    if not settings.TAREAS_EN_COLA:
+        definicion.funcion(**argumentos)
+        return None
+    return Tarea.objects.create(nombre=definicion.nombre, argumentos=argumentos, ejecutar_en=en or timezone.now(),
+                                max_intentos=definicion.max_intentos)
+
+
+# --- RESERVAR Y EJECUTAR ---
+
+def reservar(cantidad, trabajador):
+    """Marca como CORRIENDO hasta 'cantidad' tareas vencidas y retorna sus ids."""
+    ahora = timezone.now()
+    marca = f"{trabajador}:{uuid.uuid4().hex[:8]}"
+    vencidas = Tarea.objects.filter(estado='PENDIENTE', ejecutar_en__lte=ahora).order_by('ejecutar_en', 'id')
+    reservadas = {'estado': 'CORRIENDO', 'reserva': marca, 'iniciada': ahora, 'intentos': F('intentos') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(vencidas.select_for_update(skip_locked=True).values_list('id', flat=True)[:cantidad])
+            Tarea.objects.filter(id__in=ids).update(**reservadas)
+    else:
+        # Un solo UPDATE ... WHERE id IN (SELECT ... LIMIT n): SQLite serializa las
+        # escrituras y no hay un SELECT previo que tenga que subir de candado
+        Tarea.objects.filter(id__in=vencidas.values('id')[:cantidad], estado='PENDIENTE').update(**reservadas)
+    return list(Tarea.objects.filter(reserva=marca).values_list('id', flat=True))
+
+def _espera_reintento(intentos):
+    base = settings.TAREAS_REINTENTO_SEGUNDOS * 2 ** (intentos - 1)
+    return min(base, 3600) * random.uniform(1, 1.1)
+
+def ejecutar(tarea_id):
+    """Corre una tarea reservada y guarda el resultado. Nunca lanza."""
+    try:
+        t = Tarea.objects.get(id=tarea_id)
+        definicion = REGISTRO.get(t.nombre)
+        inicio = time.perf_counter()
+        try:
+            if definicion is None:
+                raise LookupError(f"Tarea no registrada: {t.nombre}")
+            with negocio_activo(t.negocio_id):
+                definicion.funcion(**t.argumentos)
+        except Exception:
+            t.ultimo_error = traceback.format_exc()[-4000:]
+            if definicion is not None and t.intentos < t.max_intentos:
+                t.estado, t.ejecutar_en = 'PENDIENTE', timezone.now() + timedelta(seconds=_espera_reintento(t.intentos))
+            else:
+                t.estado = 'FALLIDA'
+            logger.warning("Tarea con error", extra={'tarea': t.nombre, 'tarea_id': t.id, 'intento': t.intentos,
+                                                    'reintenta': t.estado == 'PENDIENTE'})
+        else:
+            t.estado = 'LISTA'
+        segundos = time.perf_counter() - inicio
+        TAREA_SEGUNDOS.labels(t.nombre, t.estado.lower()).observe(segundos)
+
+        t.duracion_ms, t.terminada = round(segundos * 1000, 2), timezone.now()
+        with transaction.atomic():
+            t.save(update_fields=['estado', 'ejecutar_en', 'ultimo_error', 'duracion_ms', 'terminada'])
+            if t.periodica and definicion is not None and t.estado != 'PENDIENTE':
+                _programar(definicion, t.terminada + definicion.cada)
+    except Exception:
+        logger.exception("No se pudo ejecutar la tarea", extra={'tarea_id': tarea_id})
+
+def _ejecutar_en_pool(tarea_id):
+    # Cada hilo / proceso del pool tiene su conexión: como en una petición, se revisa antes y después
+    close_old_connections()
+    try:
+        ejecutar(tarea_id)
+    finally:
+        close_old_connections()
+
+def rescatar_colgadas():
+    """Tareas CORRIENDO por más de TAREAS_TIMEOUT (trabajador muerto): se reintentan o fallan."""
+    limite = timezone.now() - timedelta(seconds=settings.TAREAS_TIMEOUT)
+    colgadas = Tarea.objects.filter(estado='CORRIENDO', iniciada__lt=limite)
+    error = "El trabajador no terminó la tarea a tiempo (¿se cayó?)."
+    reintentos = colgadas.filter(intentos__lt=F('max_intentos')).update(estado='PENDIENTE', ultimo_error=error)
+    return reintentos + colgadas.update(estado='FALLIDA', ultimo_error=error, terminada=timezone.now())
+
+
+# --- PERIÓDICAS ---
+
+def _programar(definicion, en):
+    try:
+        with transaction.atomic():
+            Tarea.objects.create(nombre=definicion.nombre, periodica=True, ejecutar_en=en, negocio=None,
+                                 max_intentos=definicion.max_intentos)
+    except IntegrityError:
+        pass  # ya hay una pendiente (tarea_periodica_unica)
+
+def programar_periodicas():
+    """Crea la próxima ejecución de cada periódica que no tenga una pendiente."""
+    for definicion in REGISTRO.values():
+        if definicion.cada and not Tarea.objects.filter(
+                nombre=definicion.nombre, periodica=True, estado__in=['PENDIENTE', 'CORRIENDO']).exists():
+            _programar(definicion, timezone.now())
+
+
+# --- TRABAJADOR ---
+
+def trabajar(hilos=2, procesos=0, intervalo=1.0, una_vez=False, detener=None):
+    """
+    Bucle del trabajador: reserva tantas tareas como lugares libres haya en
+    el pool. 'una_vez' termina cuando no queda nada vencido (cron, pruebas).
+    Retorna cuántas tareas corrió.
+    """
+    detener = detener or threading.Event()
+    trabajador = f"{socket.gethostname()}:{os.getpid()}"
+    if procesos:
+        # Procesos nuevos (spawn): no heredan sockets de la base y cargan Django antes
+        # de importar este módulo para la primera tarea
+        connections.close_all()
+        pool = ProcessPoolExecutor(procesos, mp_context=get_context('spawn'), initializer=django.setup)
+    else:
+        pool = ThreadPoolExecutor(hilos, thread_name_prefix='tarea')
+    capacidad = procesos or hilos
+
+    en_curso, corridas, mantenimiento = set(), 0, 0.0
+    try:
+        while not detener.is_set():
+            if time.monotonic() - mantenimiento > settings.TAREAS_MANTENIMIENTO_SEGUNDOS:
+                rescatar_colgadas()
+                programar_periodicas()
+                mantenimiento = time.monotonic()
+
+            ids = reservar(capacidad - len(en_curso), trabajador) if len(en_curso) < capacidad else []
+            en_curso.update(pool.submit(_ejecutar_en_pool, tarea_id) for tarea_id in ids)
+            corridas += len(ids)
+
+            if una_vez and not ids and not en_curso:
+                break
+            if en_curso:
+                terminadas, _ = wait(en_curso, timeout=intervalo, return_when=FIRST_COMPLETED)
+                en_curso -= terminadas
+            elif not ids:
+                detener.wait(intervalo)
+    finally:
+        pool.shutdown(wait=True)
+    return corridas
+
+
+# --- ESTADÍSTICAS ---
+
+def estadisticas(horas=24):
+    """Por tarea: ejecuciones, fallidas, pendientes y tiempos (ms) de las últimas 'horas'."""
+    desde = timezone.now() - timedelta(hours=horas)
+    filas = (Tarea.objects.filter(Q(terminada__gte=desde) | Q(estado='PENDIENTE'))
+             .values('nombre')
+             .annotate(terminadas=Count('id', filter=Q(terminada__gte=desde)),
+                       fallidas=Count('id', filter=Q(estado='FALLIDA', terminada__gte=desde)),
+                       pendientes=Count('id', filter=Q(estado='PENDIENTE')),
+                       media_ms=Avg('duracion_ms', filter=Q(terminada__gte=desde)),
+                       max_ms=Max('duracion_ms', filter=Q(terminada__gte=desde)))
+             .order_by('nombre'))
+    return [{**fila, 'media_ms': round(fila['media_ms'] or 0, 2)} for fila in filas]
+
+
+# --- TAREAS DEL NEGOCIO ---
+
+@tarea()
+def miniaturas_producto(producto_id, nombre):
+    """Variantes de la foto subida (si sigue siendo la foto actual del producto)."""
+    from .catalogo import invalidar_catalogo
+    from .imagenes import generar_variantes
+    from .models import Producto
+    if not Producto.objects.filter(pk=producto_id, imagen=nombre).exists():
+        return
+    variantes = generar_variantes(nombre)
+    # update() para no volver a disparar post_save
+    Producto.objects.filter(pk=producto_id).update(imagen_variantes=variantes)
+    invalidar_catalogo()
+
+@tarea()
+def recalcular_lineas(ids):
+    """extras_total de cada línea (y con él subtotal y total del pedido) tras cambiar los extras desde el Extra."""
+    from .models import DetallePedido, recalcular_lineas_extras
+    recalcular_lineas_extras(DetallePedido.objects.filter(id__in=ids).select_related('opcion'))
+
+@tarea(cada=timedelta(days=1))
+def archivar_pedidos_viejos():
+    from .archivo import archivar_pedidos
+    archivar_pedidos()
+
+@tarea(cada=timedelta(days=1))
+def limpiar_excepciones():
+    from .horario import limpiar_excepciones_pasadas
+    limpiar_excepciones_pasadas()
+
+@tarea(cada=timedelta(days=1))
+def limpiar_tareas():
+    """Borra las tareas terminadas bien hace más de TAREAS_RETENCION_DIAS (las fallidas quedan para revisar)."""
+    limite = timezone.now() - timedelta(days=settings.TAREAS_RETENCION_DIAS)
+    Tarea.objects.filter(estado='LISTA', terminada__lt=limite).delete()
+
+@tarea(cada=timedelta(days=1))
+def limpiar_posiciones():
+    """Borra el recorrido de los repartidores de hace más de TELEMETRIA_RETENCION_DIAS."""
+    from .models import PosicionRepartidor
+    limite = timezone.now() - timedelta(days=settings.TELEMETRIA_RETENCION_DIAS)
+    PosicionRepartidor.objects.filter(registrada__lt=limite).delete()
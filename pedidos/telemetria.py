@@ -0,0 +1,234 @@
+import atexit
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .models import PosicionRepartidor
+from .observabilidad import TELEMETRIA_PUNTOS_TOTAL
+from .tenencia import negocio_activo
+
+logger = logging.getLogger(__name__)
+
+# --- GPS DE LOS REPARTIDORES ---
+# El teléfono del repartidor manda sus puntos cada pocos segundos. Recibirlos
+# no toca la base:
+#   - el repartidor se identifica con un token firmado (viene en la página de
+#     reparto), sin sesión ni consulta del usuario. Es de un negocio y vence a
+#     los TELEMETRIA_TOKEN_TTL segundos: la página lo renueva en cada refresco,
+#   - la última posición va a la caché (el tracker del cliente la lee de ahí).
+#     Con LocMem cada worker tendría la suya: TELEMETRIA_ACTIVA por defecto
+#     solo con CACHE_COMPARTIDA,
+#   - los puntos quedan en un buffer del proceso y un hilo los guarda en lote
+#     cada TELEMETRIA_VACIAR_SEGUNDOS (o antes si se junta TELEMETRIA_LOTE),
+#     simplificados con Douglas-Peucker: en línea recta basta con los extremos.
+# Si el proceso muere se pierden unos segundos de recorrido, nunca la
+# posición actual. Con TELEMETRIA_VACIAR_SEGUNDOS=0 no hay hilo y se llama a
+# vaciar() a mano (pruebas, benchmark).
+
+SAL_TOKEN = 'pedidos.telemetria'
+MAX_PUNTOS = 100  # por petición
+MAX_ATRASO = 6 * 3600  # segundos: puntos más viejos no se aceptan
+
+
+# --- TOKEN DEL REPARTIDOR ---
+
+def token_repartidor(usuario, negocio_id):
+    return signing.dumps({'r': usuario.id, 'n': negocio_id}, salt=SAL_TOKEN, compress=True)
+
+def repartidor_del_token(token, negocio_id):
+    """Id del repartidor o None si el token es de otro negocio o tiene más de TELEMETRIA_TOKEN_TTL segundos."""
+    try:
+        datos = signing.loads(token, salt=SAL_TOKEN, max_age=settings.TELEMETRIA_TOKEN_TTL)
+    except (signing.BadSignature, TypeError):
+        return None
+    if not isinstance(datos, dict) or datos.get('n') != negocio_id:
+        return None
+    return datos.get('r')
+
+
+# --- VALIDAR LOS PUNTOS ---
+
+def validar_puntos(puntos, ahora=None):
+    """[(ts, lat, lng, precision)] ordenados por ts. Los inválidos se descartan sin error."""
+    ahora = ahora or time.time()
+    if not isinstance(puntos, list):
+        return []
+    validos = []
+    for punto in puntos[:MAX_PUNTOS]:
+        if not isinstance(punto, dict):
+            continue
+        try:
+            lat, lng = float(punto['lat']), float(punto['lng'])
+            ts = float(punto.get('ts') or ahora * 1000) / 1000  # milisegundos, como Date.now()
+            precision = float(punto['precision']) if punto.get('precision') is not None else None
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not math.isfinite(ts):
+            continue
+        if ts > ahora + 60 or ts < ahora - MAX_ATRASO:
+            continue
+        validos.append((ts, lat, lng, precision))
+    validos.sort()
+    return validos
+
+
+# --- SIMPLIFICAR EL RECORRIDO (DOUGLAS-PEUCKER) ---
+
+def _metros(origen, punto):
+    """(x, y) en metros respecto a 'origen' (proyección plana: sobra para unos km)."""
+    _, lat0, lng0, _ = origen
+    _, lat, lng, _ = punto
+    return (lng - lng0) * 111320 * math.cos(math.radians(lat0)), (lat - lat0) * 110540
+
+def _distancia_segmento(p, a, b):
+    (px, py), (ax, ay), (bx, by) = p, a, b
+    dx, dy = bx - ax, by - ay
+    largo2 = dx * dx + dy * dy
+    if largo2 == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / largo2))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+def simplificar(puntos, tolerancia):
+    """Los puntos que separan el recorrido de la recta en más de 'tolerancia' metros (siempre los extremos)."""
+    if len(puntos) < 3:
+        return list(puntos)
+    planos = [_metros(puntos[0], p) for p in puntos]
+    conservar = [False] * len(puntos)
+    conservar[0] = conservar[-1] = True
+    pendientes = [(0, len(puntos) - 1)]  # sin recursión: recorridos largos no agotan la pila
+    while pendientes:
+        inicio, fin = pendientes.pop()
+        peor, indice = 0.0, None
+        for i in range(inicio + 1, fin):
+            distancia = _distancia_segmento(planos[i], planos[inicio], planos[fin])
+            if distancia > peor:
+                peor, indice = distancia, i
+        if indice is not None and peor > tolerancia:
+            conservar[indice] = True
+            pendientes.extend([(inicio, indice), (indice, fin)])
+    return [p for p, queda in zip(puntos, conservar) if queda]
+
+
+# --- ÚLTIMA POSICIÓN (CACHÉ) ---
+
+def _clave_posicion(repartidor_id):
+    return f"repartidor:{repartidor_id}:posicion"
+
+def guardar_ultima_posicion(repartidor_id, punto):
+    ts, lat, lng, precision = punto
+    cache.set(_clave_posicion(repartidor_id), {'lat': lat, 'lng': lng, 'ts': ts, 'precision': precision},
+              settings.TELEMETRIA_POSICION_TTL)
+
+def ultima_posicion(repartidor_id):
+    """{'lat', 'lng', 'precision', 'hace'} (hace = segundos) o None si no reporta hace rato."""
+    posicion = cache.get(_clave_posicion(repartidor_id))
+    if posicion is None:
+        return None
+    return {'lat': posicion['lat'], 'lng': posicion['lng'], 'precision': posicion['precision'],
+            'hace': max(0, round(time.time() - posicion['ts']))}
+
+def posicion_para_pedido(pedido):
+    """Dónde va el repartidor del pedido, solo mientras está en RUTA."""
+    if not settings.TELEMETRIA_ACTIVA or pedido.estado != 'RUTA' or not pedido.repartidor_id:
+        return None
+    return ultima_posicion(pedido.repartidor_id)
+
+
+# --- BUFFER Y ESCRITURA EN LOTE ---
+
+class BufferPosiciones:
+    """Puntos por (negocio, repartidor) esperando ir a la base. Seguro entre hilos."""
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._despertar = threading.Event()
+        self._puntos = {}
+        self._cantidad = 0
+        self._hilo = None
+
+    def __len__(self):
+        return self._cantidad
+
+    def agregar(self, negocio_id, repartidor_id, puntos):
+        """Retorna cuántos puntos entraron (0 si el buffer está lleno)."""
+        with self._candado:
+            if self._cantidad + len(puntos) > settings.TELEMETRIA_MAX_BUFFER:
+                return 0
+            self._puntos.setdefault((negocio_id, repartidor_id), []).extend(puntos)
+            self._cantidad += len(puntos)
+            lleno = self._cantidad >= settings.TELEMETRIA_LOTE
+        self._arrancar()
+        if lleno:
+            self._despertar.set()
+        return len(puntos)
+
+    def vaciar(self):
+        """Simplifica y guarda todo lo pendiente con un bulk_create. Retorna cuántas filas escribió."""
+        with self._candado:
+            puntos, self._puntos, self._cantidad = self._puntos, {}, 0
+        if not puntos:
+            return 0
+
+        filas = []
+        for (negocio_id, repartidor_id), recorrido in puntos.items():
+            recorrido.sort()
+            for ts, lat, lng, precision in simplificar(recorrido, settings.TELEMETRIA_TOLERANCIA_METROS):
+                filas.append(PosicionRepartidor(
+                    negocio_id=negocio_id, repartidor_id=repartidor_id, latitud=lat, longitud=lng,
+                    precision=precision, registrada=datetime.fromtimestamp(ts, dt_timezone.utc),
+                ))
+        PosicionRepartidor.objects.bulk_create(filas, batch_size=500)
+        TELEMETRIA_PUNTOS_TOTAL.labels('simplificado').inc(sum(map(len, puntos.values())) - len(filas))
+        TELEMETRIA_PUNTOS_TOTAL.labels('guardado').inc(len(filas))
+        return len(filas)
+
+    def _arrancar(self):
+        if self._hilo is not None or settings.TELEMETRIA_VACIAR_SEGUNDOS <= 0:
+            return
+        with self._candado:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name='telemetria', daemon=True)
+                self._hilo.start()
+                atexit.register(self._vaciar_seguro)
+
+    def _bucle(self):
+        while True:
+            self._despertar.wait(settings.TELEMETRIA_VACIAR_SEGUNDOS)
+            self._despertar.clear()
+            self._vaciar_seguro()
+
+    def _vaciar_seguro(self):
+        # El hilo tiene su propia conexión: como en una petición, se revisa antes y después
+        close_old_connections()
+        try:
+            self.vaciar()
+        except Exception:
+            # Unos segundos de recorrido no valen tumbar el hilo; la posición actual sigue en la caché
+            logger.exception("No se pudo guardar el recorrido de los repartidores")
+        finally:
+            close_old_connections()
+
+
+BUFFER = BufferPosiciones()
+
+
+def recibir_puntos(negocio_id, repartidor_id, puntos):
+    """Los puntos validados de un repartidor: última posición a la caché y el resto al buffer."""
+    validos = validar_puntos(puntos)
+    if not validos:
+        return 0
+    with negocio_activo(negocio_id):
+        guardar_ultima_posicion(repartidor_id, validos[-1])
+    aceptados = BUFFER.agregar(negocio_id, repartidor_id, validos)
+    TELEMETRIA_PUNTOS_TOTAL.labels('recibido').inc(len(validos))
+    if aceptados < len(validos):
+        TELEMETRIA_PUNTOS_TOTAL.labels('descartado').inc(len(validos) - aceptados)
+    return len(validos)
@@ -0,0 +1,30 @@
+from django import template
+from django.utils.html import format_html
+
+from ..imagenes import srcset, url_miniatura
+
+register = template.Library()
+
+@register.simple_tag
+def imagen_responsiva(producto, clase="", sizes="100vw"):
+    """
+    <picture> con WebP + JPEG en varios anchos. Si el producto todavía no tiene
+    variantes, cae al <img> de siempre con la foto original.
+    """
+    url = producto.imagen.url
+    variantes = producto.imagen_variantes or {}
+    if variantes.get('original') != producto.imagen.name or not variantes.get('jpeg'):
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', url, clase, producto.nombre)
+
+    return format_html(
+        '<picture style="display: contents;">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy">'
+        '</picture>',
+        srcset(variantes, 'webp'), sizes,
+        url, srcset(variantes, 'jpeg', url), sizes, clase, producto.nombre,
+    )
+
+@register.simple_tag
+def miniatura_url(producto, ancho):
+    return url_miniatura(producto, ancho)
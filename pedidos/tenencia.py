@@ -0,0 +1,152 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import logout
+from django.core.cache import cache
+from django.db import models
+from django.http import HttpResponseNotFound
+
+# --- VARIOS RESTAURANTES EN UN MISMO DESPLIEGUE (MULTINEGOCIO) ---
+# Con MULTINEGOCIO=True cada petición se resuelve a un Negocio por el Host
+# (búsqueda cacheada) y queda en un ContextVar mientras dura. Con eso:
+#   - los managers PorNegocioManager filtran catálogo, pedidos, horario y
+#     configuración por ese negocio (y los objetos nuevos lo heredan),
+#   - clave_cache (CACHES['default']['KEY_FUNCTION']) antepone el negocio a
+#     todas las claves, así catálogo, horario, carga de cocina, agotados y el
+#     menú cacheado quedan separados sin tocar esos módulos.
+# Sin negocio activo (MULTINEGOCIO=False, comandos, migraciones) nada filtra y
+# todo funciona como un solo restaurante.
+
+_negocio_actual = ContextVar('negocio_actual', default=None)
+
+def id_negocio_actual():
+    """Id del negocio de esta petición (o None). También es el default de los campos 'negocio'."""
+    return _negocio_actual.get()
+
+@contextmanager
+def negocio_activo(negocio_id):
+    """Para comandos y tareas: corre el bloque como si fuera una petición de ese negocio."""
+    token = _negocio_actual.set(negocio_id)
+    try:
+        yield
+    finally:
+        _negocio_actual.reset(token)
+
+def negocio_por_dominio(dominio):
+    """Id del negocio para la opción --negocio de los comandos (None si no se pidió)."""
+    if not dominio:
+        return None
+    from .models import Negocio
+    return Negocio.objects.get(dominio=dominio.strip().lower()).id
+
+
+class PorNegocioManager(models.Manager):
+    """
+    Manager por defecto que filtra por el negocio activo. 'campo' es el camino
+    hasta Negocio: los modelos que llegan a él por otro modelo usan una
+    subclase que lo cambia. Va como atributo de clase y no como argumento
+    porque Django arma los managers relacionados (producto.opciones,
+    pedido.detalles) heredando de esta clase y llamando __init__() sin nada.
+    """
+    campo = 'negocio'
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        negocio_id = _negocio_actual.get()
+        if negocio_id is None:
+            return qs
+        return qs.filter(**{self.campo: negocio_id})
+
+
+def clave_cache(key, key_prefix, version):
+    """KEY_FUNCTION de la caché: mismas claves de siempre, con el negocio delante si hay uno."""
+    negocio_id = _negocio_actual.get()
+    if negocio_id is None:
+        return f"{key_prefix}:{version}:{key}"
+    return f"{key_prefix}:{version}:n{negocio_id}:{key}"
+
+
+# --- RESOLVER EL NEGOCIO POR HOST ---
+
+def _clave_host(host):
+    return f"negocio:host:{host}"
+
+def buscar_negocio(host):
+    """(negocio_id, ids del staff) para el host, o None. Cacheado NEGOCIO_CACHE_TTL segundos."""
+    # Clave global (sin el prefijo del negocio): se lee antes de saber el
+    # negocio y se borra desde señales que corren dentro de otro
+    with negocio_activo(None):
+        clave = _clave_host(host)
+        encontrado = cache.get(clave)
+        if encontrado is None:
+            from .models import Negocio
+            negocio = Negocio.objects.filter(dominio=host, activo=True).first()
+            encontrado = (negocio.id, frozenset(negocio.usuarios.values_list('id', flat=True))) if negocio else False
+            cache.set(clave, encontrado, settings.NEGOCIO_CACHE_TTL)
+    return encontrado or None
+
+def olvidar_host(host):
+    with negocio_activo(None):
+        cache.delete(_clave_host(host))
+
+
+class NegocioMiddleware:
+    """
+    Va antes de SessionMiddleware para que toda la petición (sesión incluida)
+    corra dentro del negocio. El staff de un negocio no puede entrar en otro.
+    Sirve en WSGI y en ASGI sin forzar la petición a un hilo.
+    """
+    sync_capable = True
+    async_capable = True
+    # El balanceador pregunta por el worker, no por un restaurante: llega con cualquier Host
+    rutas_sin_negocio = frozenset({'/salud/listo/'})
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.MULTINEGOCIO or request.path_info in self.rutas_sin_negocio:
+            return self.get_response(request)
+
+        encontrado = buscar_negocio(self._host(request))
+        if encontrado is None:
+            return HttpResponseNotFound("Restaurante no encontrado.")
+
+        request.negocio_id, request.staff_negocio = encontrado
+        token = _negocio_actual.set(request.negocio_id)
+        try:
+            return self.get_response(request)
+        finally:
+            _negocio_actual.reset(token)
+
+    async def __acall__(self, request):
+        if not settings.MULTINEGOCIO or request.path_info in self.rutas_sin_negocio:
+            return await self.get_response(request)
+
+        encontrado = await sync_to_async(buscar_negocio)(self._host(request))
+        if encontrado is None:
+            return HttpResponseNotFound("Restaurante no encontrado.")
+
+        request.negocio_id, request.staff_negocio = encontrado
+        token = _negocio_actual.set(request.negocio_id)
+        try:
+            return await self.get_response(request)
+        finally:
+            _negocio_actual.reset(token)
+
+    @staticmethod
+    def _host(request):
+        return request.get_host().split(':')[0].lower()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        usuario = getattr(request, 'user', None)
+        if (settings.MULTINEGOCIO and hasattr(request, 'staff_negocio') and usuario is not None and usuario.is_authenticated
+                and not usuario.is_superuser and usuario.id not in request.staff_negocio):
+            logout(request)
+        return None
@@ -1,3 +1,1251 @@
-from django.test import TestCase
+import asyncio
+import json
+import logging
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
+from django.db import connection
+import httpx
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.db import router
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import arranque, busqueda, instrumentacion, mostrador, pasarela, replica, tareas, telemetria
+from .benchmark import comparar, medir_busqueda, percentil
+from .admin import PaginadorEstimado
+from .archivo import archivar_pedidos, top_productos
+from .capacidad import obtener_carga
+from .cocina import tablero_cocina, version_cocina
+from .catalogo import version_catalogo
+from .clientes import COOKIE_DISPOSITIVO, guardar_cliente, normalizar_telefono, prefijo_telefono, recordar_dispositivo
+from .disponibilidad import obtener_disponibilidad
+from .importacion import catalogo_a_csv, catalogo_desde_csv, exportar_catalogo, importar_catalogo
+from .horario import compilar_indice, construir_agenda, limpiar_excepciones_pasadas, resolver_dias
+from .imagenes import url_miniatura
+from .models import (
+    Categoria, Cliente, ConfiguracionNegocio, DetallePedido, DiaEspecial, Extra, Negocio, OpcionProducto, Pedido, Producto,
+    PedidoArchivado, ReglaHorario, Tarea, TurnoHorario,
+)
+from .observabilidad import FormatoJSON
+from .precios import rellenar_extras_total
+from .roles import grupos_de
+from .tenencia import buscar_negocio, negocio_activo
+from .views import wompi_webhook_view
+
+
+class MenuCacheadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ConfiguracionNegocio.objects.create()
+        categoria = Categoria.objects.create(nombre="Hamburguesas", orden=1)
+        Producto.objects.create(categoria=categoria, nombre="Super Hamburguesa", precio="5.50")
+
+    @override_settings(MENU_CACHE_PUBLICO=True)
+    def test_menu_publico_es_cacheable_y_responde_304(self):
+        response = self.client.get(reverse('menu'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertContains(response, "Super Hamburguesa")
+
+        response_304 = self.client.get(reverse('menu'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_304.status_code, 304)
+        # Sin Last-Modified: abrir o cerrar no sube la versión del catálogo, solo cambia el ETag
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(reverse('menu'), HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT").status_code, 200)
+
+    @override_settings(MENU_CACHE_PUBLICO=True)
+    def test_cambio_de_catalogo_cambia_etag(self):
+        etag = self.client.get(reverse('menu'))['ETag']
+        version = version_catalogo()
+        Producto.objects.update(nombre="X")  # update() no dispara señales
+        Producto.objects.first().save()
+        self.assertGreater(version_catalogo(), version)
+        self.assertNotEqual(self.client.get(reverse('menu'))['ETag'], etag)
+
+    def test_api_menu_cliente_devuelve_carrito(self):
+        session = self.client.session
+        session['cart'] = {'1-0-0': 2, '1-0-3': 1}
+        session.save()
+        data = self.client.get(reverse('api_menu_cliente')).json()
+        self.assertEqual(data['cantidad_carrito'], 3)
+        self.assertIsNone(data['pedido_activo'])
+        self.assertTrue(data['csrf_token'])
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class MiniaturasTests(TestCase):
+    def _foto(self, ancho=700, alto=500):
+        buffer = BytesIO()
+        Image.new('RGB', (ancho, alto), 'orange').save(buffer, 'JPEG')
+        return SimpleUploadedFile('burger.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_subir_foto_genera_variantes_sin_agrandar(self):
+        categoria = Categoria.objects.create(nombre="Hamburguesas")
+        producto = Producto.objects.create(categoria=categoria, nombre="Burger", precio="5.00", imagen=self._foto())
+        producto.refresh_from_db()
+
+        variantes = producto.imagen_variantes
+        self.assertEqual(variantes['original'], producto.imagen.name)
+        self.assertEqual(sorted(variantes['webp'], key=int), ['80', '160', '320', '640'])
+        self.assertTrue(default_storage.exists(variantes['jpeg']['320']))
+
+        html = Template('{% load imagenes %}{% imagen_responsiva p "card-img" %}').render(Context({'p': producto}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('640w', html)
+        self.assertIn('700w', html)
+
+    def test_si_fallan_las_variantes_el_producto_igual_se_guarda(self):
+        categoria = Categoria.objects.create(nombre="Hamburguesas")
+        with mock.patch('pedidos.imagenes.generar_variantes', side_effect=OSError("storage caído")), \
+                self.assertLogs('pedidos.models', 'ERROR'):
+            producto = Producto.objects.create(categoria=categoria, nombre="Burger", precio="5.00", imagen=self._foto())
+        producto.refresh_from_db()
+        self.assertEqual(producto.imagen_variantes, {})
+        self.assertEqual(url_miniatura(producto, 320), producto.imagen.url)
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_percentil_interpola(self):
+        self.assertEqual(percentil([1, 2, 3, 4], 50), 2.5)
+        self.assertEqual(percentil([5], 99), 5)
+
+    def test_comparar_detecta_regresiones(self):
+        base = {'escenarios': {'menu': {'p95_ms': 10.0, 'consultas_por_peticion': 5}}}
+        actual = {'escenarios': {'menu': {'p95_ms': 13.0, 'consultas_por_peticion': 6}}}
+        self.assertEqual(len(comparar(actual, base, tolerancia=0.2)), 2)
+        self.assertEqual(comparar(actual, base, tolerancia=0.5)[0], "menu: consultas 5 -> 6")
+
+    def test_medir_busqueda_reporta_latencias(self):
+        res = medir_busqueda(productos=200, consultas=50)
+        self.assertEqual(res['productos'], 200)
+        self.assertLessEqual(res['p50_ms'], res['p99_ms'])
+
+
+class InstrumentacionTests(TestCase):
+    def setUp(self):
+        instrumentacion.limpiar()
+        ConfiguracionNegocio.objects.create()
+        categoria = Categoria.objects.create(nombre="Hamburguesas")
+        for i in range(6):
+            Producto.objects.create(categoria=categoria, nombre=f"Burger {i}", precio="5.00")
+
+    @override_settings(PERFIL_MUESTREO=1)
+    def test_detecta_n_mas_1_y_muestra_panel(self):
+        self.client.get(reverse('menu'))
+        resumen = instrumentacion.resumen_por_vista()
+        self.assertEqual(resumen[0]['vista'], 'menu')
+        self.assertGreater(resumen[0]['consultas'], 6)
+        self.assertTrue(resumen[0]['n_mas_1'])
+
+        admin = User.objects.create_superuser('jefe', 'jefe@example.com', 'x')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('dashboard_rendimiento'))
+        self.assertContains(response, 'menu')
+
+    @override_settings(PERFIL_MUESTREO=0)
+    def test_sin_muestreo_no_registra(self):
+        self.client.get(reverse('menu'))
+        self.assertEqual(instrumentacion.muestras(), [])
+
+
+class ObservabilidadTests(TestCase):
+    def test_webhook_y_estados_aparecen_en_metrics(self):
+        ConfiguracionNegocio.objects.create()
+        cliente = Cliente.objects.create(telefono="70000000", nombre="Ana", apellido="Pérez")
+        pedido = Pedido.objects.create(cliente=cliente, metodo_pago='TARJETA')
+
+        # La vista no tiene ruta (sin verificar la firma de Wompi cualquiera marcaría pedidos pagados)
+        self.assertEqual(self.client.post('/wompi-webhook/').status_code, 404)
+        request = RequestFactory().post(
+            '/wompi-webhook/',
+            data=json.dumps({'transaccion': {'identificadorEnlaceComercio': f"ORDEN-{pedido.id}", 'esAprobada': True}}),
+            content_type='application/json',
+        )
+        response = wompi_webhook_view(request)
+        self.assertEqual(json.loads(response.content)['msg'], 'Pedido procesado')
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.estado, 'RECIBIDO')
+
+        texto = self.client.get(reverse('metricas_prometheus'), REMOTE_ADDR='127.0.0.1').content.decode()
+        self.assertIn('foodback_pedidos_estado_total{estado="RECIBIDO"}', texto)
+        self.assertIn('foodback_webhook_segundos_count{resultado="pedido"}', texto)
+
+    def test_metrics_rechaza_fuera_de_la_maquina(self):
+        response = self.client.get(reverse('metricas_prometheus'), REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(response.status_code, 403)
+
+    def test_formato_json_incluye_campos_extra(self):
+        record = logging.LogRecord('pedidos', logging.INFO, __file__, 1, "Pago %s", ('ok',), None)
+        record.pedido_id = 7
+        linea = json.loads(FormatoJSON().format(record))
+        self.assertEqual(linea['msg'], "Pago ok")
+        self.assertEqual(linea['pedido_id'], 7)
+
+
+class AgendaTests(TestCase):
+    def setUp(self):
+        self.config = ConfiguracionNegocio.objects.create(domingo_abierto=False)
+        self.config.refresh_from_db()
+
+    def test_agenda_larga_en_una_consulta(self):
+        hoy = date(2026, 12, 20)
+        DiaEspecial.objects.create(fecha=date(2026, 12, 24), abierto=False, motivo="Nochebuena")
+        DiaEspecial.objects.create(fecha=date(2026, 12, 27), abierto=True, hora_apertura=time(10, 0))
+        with self.assertNumQueries(3):  # excepciones, reglas y turnos: no depende de los días
+            agenda = construir_agenda(self.config, hoy, 90, hoy=hoy)
+
+        self.assertEqual(len(agenda), 90)
+        self.assertEqual(agenda[0]['nombre_dia'], "HOY")
+        nochebuena, domingo = agenda[4], agenda[7]
+        self.assertFalse(nochebuena['abierto'])
+        self.assertEqual(nochebuena['motivo'], "Nochebuena")
+        self.assertTrue(domingo['abierto'])  # excepción gana al domingo cerrado
+        self.assertEqual(domingo['hora_ini'], time(10, 0))
+
+    def test_calendario_json_y_get_no_borra_excepciones(self):
+        pasado = date.today() - timedelta(days=3)
+        DiaEspecial.objects.create(fecha=pasado, abierto=False)
+        admin = User.objects.create_superuser('jefe', 'jefe@example.com', 'x')
+        self.client.force_login(admin)
+
+        self.client.get(reverse('admin_settings'))
+        self.assertTrue(DiaEspecial.objects.filter(fecha=pasado).exists())
+
+        data = self.client.get(reverse('api_calendario'), {'mes': '2027-02'}).json()
+        self.assertEqual(len(data['dias']), 28)
+        self.assertEqual(self.client.get(reverse('api_calendario'), {'mes': 'x'}).status_code, 400)
+
+        self.assertEqual(limpiar_excepciones_pasadas(), 1)
+
+
+class IndiceHorarioTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.config = ConfiguracionNegocio.objects.create(
+            fecha_vencimiento=date(2030, 1, 1), mensaje_cierre="Cerrado",
+        )
+        self.config.refresh_from_db()
+
+    def test_turnos_almuerzo_y_cena(self):
+        lunes = date(2026, 11, 2)
+        TurnoHorario.objects.create(configuracion=self.config, dia_semana=0, hora_apertura=time(11), hora_cierre=time(14))
+        TurnoHorario.objects.create(configuracion=self.config, dia_semana=0, hora_apertura=time(18), hora_cierre=time(1))
+        indice = compilar_indice(self.config, lunes, 2)
+
+        self.assertTrue(indice.abierto_en(datetime(2026, 11, 2, 12, 30)))
+        self.assertFalse(indice.abierto_en(datetime(2026, 11, 2, 16, 0)))
+        self.assertTrue(indice.abierto_en(datetime(2026, 11, 3, 0, 30)))  # cena cruza la medianoche
+        abierto, mensaje = indice.estado_en(datetime(2026, 11, 2, 16, 0))
+        self.assertFalse(abierto)
+        self.assertIn("11:00 am - 02:00 pm, 06:00 pm - 01:00 am", mensaje)
+
+    def test_reglas_recurrentes(self):
+        ReglaHorario.objects.create(tipo='ANUAL', mes=12, dia=24, motivo="Nochebuena")
+        ReglaHorario.objects.create(tipo='NESIMO', dia_semana=0, ordinal=1, motivo="Inventario")
+        ReglaHorario.objects.create(tipo='RANGO', fecha_inicio=date(2027, 1, 10), fecha_fin=date(2027, 1, 12), motivo="Vacaciones")
+        dias = resolver_dias(self.config, date(2026, 12, 1), date(2027, 1, 31))
+
+        self.assertEqual(dias[date(2026, 12, 24)]['motivo'], "Nochebuena")
+        self.assertFalse(dias[date(2026, 12, 7)]['abierto'])   # primer lunes de diciembre
+        self.assertTrue(dias[date(2026, 12, 14)]['abierto'])   # segundo lunes
+        self.assertFalse(dias[date(2027, 1, 11)]['abierto'])
+        DiaEspecial.objects.create(fecha=date(2026, 12, 24), abierto=True)  # la fecha puntual gana
+        self.assertTrue(resolver_dias(self.config, date(2026, 12, 24), date(2026, 12, 24))[date(2026, 12, 24)]['abierto'])
+
+    def test_verificar_estado_sin_consultas_con_indice_caliente(self):
+        from .views import verificar_estado_negocio
+        verificar_estado_negocio()
+        with self.assertNumQueries(0):
+            verificar_estado_negocio()
+        self.config.mensaje_cierre = "Nuevo mensaje"
+        self.config.save()  # la señal invalida el índice
+        self.assertIsNone(cache.get('horario:indice'))
+
+
+class CapacidadCocinaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.config = ConfiguracionNegocio.objects.create(
+            hora_apertura=time(0, 0), hora_cierre=time(23, 59, 59), fecha_vencimiento=date(2030, 1, 1),
+            cocina_minutos_base=25, cocina_pedidos_hora=20,
+        )
+        categoria = Categoria.objects.create(nombre="Pupusas")
+        self.producto = Producto.objects.create(categoria=categoria, nombre="Revuelta", precio=Decimal("1.00"))
+        self.cliente = Cliente.objects.create(telefono="77778888", nombre="Ana", apellido="López")
+
+    def crear_pedido(self, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = Pedido.objects.create(cliente=self.cliente, estado='RECIBIDO')
+            DetallePedido.objects.create(pedido=pedido, producto=self.producto, cantidad=cantidad)
+        return pedido
+
+    def test_carga_cacheada_y_espera_estimada(self):
+        self.crear_pedido(3)
+        self.crear_pedido(2)
+        carga = obtener_carga()
+        self.assertEqual((carga.en_cola, carga.unidades_en_cola), (2, 5))
+        self.assertEqual(carga.espera_minutos, 25 + 6)  # 2 pedidos a 20/hora
+        with self.assertNumQueries(0):
+            obtener_carga()
+
+        pedido = self.crear_pedido(1)
+        self.assertEqual(obtener_carga().en_cola, 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.estado = 'RUTA'
+            pedido.save()
+        self.assertEqual(obtener_carga().en_cola, 2)
+
+    def test_checkout_pausado_al_superar_el_limite(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.config.cocina_max_unidades = 4
+            self.config.save()
+        self.crear_pedido(4)
+        session = self.client.session
+        session['cart'] = {f"{self.producto.id}-0-0": 1}
+        session.save()
+
+        response = self.client.get(reverse('checkout'))
+        self.assertRedirects(response, reverse('menu'), fetch_redirect_response=False)
+        self.assertFalse(obtener_carga().admite()[0])
+
+
+class PantallaCocinaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        parrilla = Categoria.objects.create(nombre="Hamburguesas", estacion="Parrilla")
+        bebidas = Categoria.objects.create(nombre="Bebidas", estacion="Barra")
+        self.burger = Producto.objects.create(categoria=parrilla, nombre="Super Hamburguesa", precio=Decimal("5.00"))
+        self.pollo = OpcionProducto.objects.create(producto=self.burger, nombre="Pollo", precio_extra=Decimal("0.50"))
+        self.soda = Producto.objects.create(categoria=bebidas, nombre="Soda", precio=Decimal("1.00"))
+        self.queso = Extra.objects.create(nombre="Queso", precio=Decimal("0.50"))
+        self.tocino = Extra.objects.create(nombre="Tocino", precio=Decimal("0.75"))
+        self.cliente = Cliente.objects.create(telefono="77778888", nombre="Ana", apellido="López")
+
+    def pedido(self, estado, lineas):
+        pedido = Pedido.objects.create(cliente=self.cliente, estado=estado)
+        for producto, opcion, cantidad, extras in lineas:
+            detalle = DetallePedido.objects.create(pedido=pedido, producto=producto, opcion=opcion, cantidad=cantidad)
+            detalle.extras.add(*extras)
+        return pedido
+
+    def test_agrupa_por_estacion_producto_opcion_y_extras(self):
+        self.pedido('COCINA', [(self.burger, self.pollo, 2, [self.queso]), (self.soda, None, 1, [])])
+        self.pedido('COCINA', [(self.burger, self.pollo, 3, [self.queso]), (self.burger, self.pollo, 1, [self.tocino, self.queso])])
+        self.pedido('RECIBIDO', [(self.burger, self.pollo, 9, [self.queso])])  # aún no entra a cocina
+
+        with self.assertNumQueries(1):
+            tablero = tablero_cocina()
+        self.assertEqual([e['estacion'] for e in tablero], ["Barra", "Parrilla"])
+        parrilla = tablero[1]['items']
+        self.assertEqual((parrilla[0]['cantidad'], parrilla[0]['opcion'], parrilla[0]['extras'], parrilla[0]['pedidos']),
+                         (5, "Pollo", ["Queso"], 2))
+        self.assertEqual((parrilla[1]['cantidad'], parrilla[1]['extras']), (1, ["Queso", "Tocino"]))
+
+    def test_version_sube_al_entrar_y_salir_de_cocina(self):
+        pedido = self.pedido('RECIBIDO', [(self.soda, None, 1, [])])
+        version = version_cocina()
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.estado = 'COCINA'
+            pedido.save()
+        self.assertGreater(version_cocina(), version)
+
+        self.client.force_login(User.objects.create_superuser('chef', 'chef@example.com', 'x'))
+        actual = version_cocina()
+        with self.assertNumQueries(2):  # sesión y usuario (superusuario, sin grupos): el tablero no se consulta
+            data = self.client.get(reverse('api_cocina'), {'version': actual}).json()
+        self.assertFalse(data['cambios'])
+        data = self.client.get(reverse('api_cocina'), {'version': actual - 1}).json()
+        self.assertEqual(data['estaciones'][0]['items'][0]['producto'], "Soda")
+        self.assertContains(self.client.get(reverse('dashboard_cocina')), "1×")
+
+
+class ArchivoPedidosTests(TestCase):
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Pupusas")
+        self.revuelta = Producto.objects.create(categoria=categoria, nombre="Revuelta", precio=Decimal("1.00"))
+        self.queso = Extra.objects.create(nombre="Queso", precio=Decimal("0.25"))
+        self.cliente = Cliente.objects.create(telefono="77778888", nombre="Ana", apellido="López")
+
+    def pedido(self, estado, cantidad, dias_atras):
+        pedido = Pedido.objects.create(cliente=self.cliente, estado=estado)
+        detalle = DetallePedido.objects.create(pedido=pedido, producto=self.revuelta, cantidad=cantidad)
+        detalle.extras.add(self.queso)
+        Pedido.objects.filter(id=pedido.id).update(fecha_creacion=timezone.now() - timedelta(days=dias_atras))
+        return pedido
+
+    def test_archiva_viejos_y_conserva_top_productos(self):
+        viejo = self.pedido('ENTREGADO', 3, 120)
+        cancelado = self.pedido('CANCELADO', 9, 120)
+        reciente = self.pedido('ENTREGADO', 2, 5)
+        activo_viejo = self.pedido('RUTA', 1, 120)
+        antes = top_productos()
+
+        self.assertEqual(archivar_pedidos(dias=90, lote=1), 2)
+        self.assertEqual(set(Pedido.objects.values_list('id', flat=True)), {reciente.id, activo_viejo.id})
+        self.assertFalse(DetallePedido.objects.filter(pedido_id__in=[viejo.id, cancelado.id]).exists())
+
+        archivado = PedidoArchivado.objects.get(id=viejo.id)
+        self.assertEqual(archivado.lineas[0]['extras'], ["Queso"])
+        self.assertEqual(archivado.total_final, viejo.total_final)
+        self.assertEqual(top_productos(), antes)  # el cancelado nunca contó
+
+    def test_historial_del_cliente_y_estado_leen_el_archivo(self):
+        viejo = self.pedido('ENTREGADO', 1, 120)
+        session = self.client.session
+        session['historial_pedidos'] = [viejo.id]
+        session.save()
+        archivar_pedidos(dias=90)
+
+        self.assertContains(self.client.get(reverse('perfil_usuario')), f"Pedido #{viejo.id}")
+        data = self.client.get(reverse('api_order_status', args=[viejo.id])).json()
+        self.assertEqual(data['estado_codigo'], 'ENTREGADO')
+
+
+class ClientesQueVuelvenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Cliente.objects.create(telefono="+50377778888", nombre="Ana", apellido="López", direccion_ultima="Col. Escalón")
+
+    def test_normaliza_formatos_de_el_salvador(self):
+        for texto in ("7777-8888", "503 7777 8888", "+503 7777-8888", "0050377778888"):
+            self.assertEqual(normalizar_telefono(texto), "+50377778888")
+        self.assertEqual(normalizar_telefono("+1 (415) 555-0100"), "+14155550100")
+        self.assertIsNone(normalizar_telefono("1234"))
+        self.assertIsNone(normalizar_telefono("5777-8888"))
+
+    def test_guardar_solo_escribe_si_cambia(self):
+        with self.assertNumQueries(1):  # solo el SELECT
+            guardar_cliente("+50377778888", "Ana", "López", "Col. Escalón")
+        with CaptureQueriesContext(connection) as consultas:
+            cliente = guardar_cliente("+50377778888", "Ana María", "", "Santa Tecla")
+        self.assertEqual(len(consultas), 2)  # SELECT y un solo upsert
+        self.assertIn("ON CONFLICT", consultas[1]['sql'])
+        guardado = Cliente.objects.get()
+        self.assertEqual((guardado.id, guardado.apellido, guardado.direccion_ultima), (cliente.id, "López", "Santa Tecla"))
+        self.assertEqual(guardado.nombre_busqueda, "ana maria lopez")
+
+        with self.assertNumQueries(2):
+            nuevo = guardar_cliente("+50370001111", "Luis", "Mejía", "Centro")
+        self.assertEqual(Cliente.objects.get(telefono="+50370001111").id, nuevo.id)
+        self.assertEqual(Pedido.objects.create(cliente=nuevo).cliente.nombre_busqueda, "luis mejia")
+
+    def test_prefijo_del_telefono(self):
+        self.assertEqual(prefijo_telefono("7777 8"), "+50377778")
+        self.assertEqual(prefijo_telefono("+503 7777"), "+5037777")
+        self.assertEqual(prefijo_telefono("7777-8888"), "+50377778888")
+        self.assertIsNone(prefijo_telefono("777"))
+        self.assertIsNone(prefijo_telefono("5777 8"))
+
+    @override_settings(CLIENTE_BUSQUEDA_LIMITE=3)
+    def test_busqueda_autocompleta_y_tiene_limite(self):
+        data = self.client.get(reverse('api_buscar_cliente'), {'telefono': "7777 8888"}).json()
+        self.assertEqual(data, {'status': 'ok', 'encontrado': True, 'nombre': "Ana"})  # sin apellido ni dirección
+        self.assertTrue(self.client.get(reverse('api_buscar_cliente'), {'telefono': "7777 8"}).json()['encontrado'])
+        self.assertFalse(self.client.get(reverse('api_buscar_cliente'), {'telefono': "7000 0000"}).json()['encontrado'])
+        self.assertEqual(self.client.get(reverse('api_buscar_cliente'), {'telefono': "7777 8888"}).status_code, 429)
+
+    def test_prefijo_con_varios_clientes_no_elige(self):
+        Cliente.objects.create(telefono="+50377779999", nombre="Beto", apellido="Ramos")
+        self.assertFalse(self.client.get(reverse('api_buscar_cliente'), {'telefono': "7777"}).json()['encontrado'])
+        self.assertEqual(self.client.get(reverse('api_buscar_cliente'), {'telefono': "77779"}).json()['nombre'], "Beto")
+
+    def test_direccion_solo_desde_el_dispositivo_del_cliente(self):
+        from django.http import HttpResponse
+        Pedido.objects.create(cliente=Cliente.objects.get(), dispositivo="c" * 32)
+        self.client.cookies[COOKIE_DISPOSITIVO] = recordar_dispositivo(HttpResponse(), "d" * 32).cookies[COOKIE_DISPOSITIVO].value
+        self.assertNotIn('direccion', self.client.get(reverse('api_buscar_cliente'), {'telefono': "7777 8888"}).json())
+        self.client.cookies[COOKIE_DISPOSITIVO] = recordar_dispositivo(HttpResponse(), "c" * 32).cookies[COOKIE_DISPOSITIVO].value
+        data = self.client.get(reverse('api_buscar_cliente'), {'telefono': "7777 8888"}).json()
+        self.assertEqual((data['apellido'], data['direccion']), ("López", "Col. Escalón"))
+
+    @override_settings(CLIENTE_BUSQUEDA_LIMITE=2, PROXIES_CONFIABLES=1)
+    def test_limite_no_se_salta_cambiando_x_forwarded_for(self):
+        for i in range(3):
+            response = self.client.get(reverse('api_buscar_cliente'), {'telefono': "7000 000%d" % i},
+                                       HTTP_X_FORWARDED_FOR=f"10.0.0.{i}, 203.0.113.7")
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(CLIENTE_BUSQUEDA_POR_TELEFONO=2)
+    def test_limite_por_telefono_aunque_cambie_la_ip(self):
+        for i in range(3):
+            response = self.client.get(reverse('api_buscar_cliente'), {'telefono': "7777 8888"}, REMOTE_ADDR=f"10.0.0.{i}")
+        self.assertEqual(response.status_code, 429)
+
+
+class HistorialClienteTests(TestCase):
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Pupusas")
+        self.producto = Producto.objects.create(categoria=categoria, nombre="Revuelta", precio=Decimal("1.00"))
+        self.cliente = Cliente.objects.create(telefono="+50377778888", nombre="Ana", apellido="López")
+        self.dispositivo = "a" * 32
+
+    def crear_pedidos(self, n, estado='ENTREGADO'):
+        pedidos = Pedido.objects.bulk_create([
+            Pedido(cliente=self.cliente, estado=estado, dispositivo=self.dispositivo) for _ in range(n)
+        ])
+        DetallePedido.objects.bulk_create([
+            DetallePedido(pedido=p, producto=self.producto, cantidad=1, precio_unitario=1, subtotal=1) for p in pedidos
+        ])
+
+    def entrar_como_cliente(self):
+        from django.http import HttpResponse
+        self.client.cookies[COOKIE_DISPOSITIVO] = recordar_dispositivo(HttpResponse(), self.dispositivo).cookies[COOKIE_DISPOSITIVO].value
+
+    def test_mismo_costo_con_3_o_300_pedidos_y_paginacion(self):
+        self.entrar_como_cliente()
+        self.crear_pedidos(3)
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.get(reverse('perfil_usuario'))
+        self.crear_pedidos(297)
+        with CaptureQueriesContext(connection) as muchos:
+            response = self.client.get(reverse('perfil_usuario'))
+        self.assertEqual(len(pocos), len(muchos))
+        self.assertEqual(len(response.context['historial']), 20)
+
+        siguiente = response.context['siguiente']
+        pagina_2 = self.client.get(reverse('perfil_usuario'), {'antes': siguiente}).context['historial']
+        self.assertTrue(all(p.id < siguiente for p in pagina_2))
+
+    def test_cookie_alterada_no_muestra_nada(self):
+        self.crear_pedidos(2)
+        self.client.cookies[COOKIE_DISPOSITIVO] = f"{self.dispositivo}:firma-falsa"
+        self.assertEqual(list(self.client.get(reverse('perfil_usuario')).context['historial']), [])
+
+    def test_pedir_con_el_telefono_de_otro_no_muestra_su_historial(self):
+        ConfiguracionNegocio.objects.create(hora_apertura=time(0, 0), hora_cierre=time(23, 59, 59), fecha_vencimiento=date(2030, 1, 1))
+        self.crear_pedidos(2)
+        session = self.client.session
+        session['cart'] = {f"{self.producto.id}-0-0": 1}
+        session.save()
+        self.client.post(reverse('checkout'), {'telefono': "7777 8888", 'nombre': "Otro", 'direccion': "Col. Centro",
+                                               'metodo_pago': 'EFECTIVO'})
+
+        nuevo = Pedido.objects.latest('id')
+        self.assertEqual(nuevo.cliente_id, self.cliente.id)
+        perfil = self.client.get(reverse('perfil_usuario')).context
+        self.assertEqual([p.id for p in perfil['activos']], [nuevo.id])
+        self.assertEqual(list(perfil['historial']), [])
+
+
+class RepetirPedidoTests(TestCase):
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Hamburguesas")
+        self.burger = Producto.objects.create(categoria=categoria, nombre="Super Hamburguesa", precio=Decimal("5.00"))
+        self.pollo = OpcionProducto.objects.create(producto=self.burger, nombre="Pollo", precio_extra=Decimal("0.50"))
+        self.papas = Producto.objects.create(categoria=categoria, nombre="Papas", precio=Decimal("2.00"))
+        self.queso = Extra.objects.create(nombre="Queso", precio=Decimal("0.50"))
+        self.cliente = Cliente.objects.create(telefono="+50377778888", nombre="Ana", apellido="López")
+        self.pedido = Pedido.objects.create(cliente=self.cliente, estado='ENTREGADO', dispositivo="b" * 32)
+        detalle = DetallePedido.objects.create(pedido=self.pedido, producto=self.burger, opcion=self.pollo, cantidad=2)
+        detalle.extras.add(self.queso)
+        DetallePedido.objects.create(pedido=self.pedido, producto=self.papas, cantidad=1)
+        from django.http import HttpResponse
+        self.client.cookies[COOKIE_DISPOSITIVO] = recordar_dispositivo(HttpResponse(), "b" * 32).cookies[COOKIE_DISPOSITIVO].value
+
+    def test_repite_y_omite_lo_agotado(self):
+        Producto.objects.filter(id=self.papas.id).update(disponible=False)
+        response = self.client.post(reverse('repetir_pedido', args=[self.pedido.id]))
+        self.assertRedirects(response, reverse('checkout'), fetch_redirect_response=False)
+        self.assertEqual(self.client.session['cart'], {f"{self.burger.id}-{self.pollo.id}-{self.queso.id}": 2})
+
+    def test_funciona_con_pedidos_archivados(self):
+        Pedido.objects.filter(id=self.pedido.id).update(fecha_creacion=timezone.now() - timedelta(days=200))
+        archivar_pedidos(dias=90)
+        self.client.post(reverse('repetir_pedido', args=[self.pedido.id]))
+        self.assertEqual(self.client.session['cart'], {
+            f"{self.burger.id}-{self.pollo.id}-{self.queso.id}": 2, f"{self.papas.id}-0-0": 1,
+        })
+
+    def test_no_se_puede_repetir_el_pedido_de_otro(self):
+        self.client.cookies.pop(COOKIE_DISPOSITIVO)
+        self.assertEqual(self.client.post(reverse('repetir_pedido', args=[self.pedido.id])).status_code, 404)
+
+
+class DisponibilidadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ConfiguracionNegocio.objects.create(
+            hora_apertura=time(0, 0), hora_cierre=time(23, 59, 59), fecha_vencimiento=date(2030, 1, 1),
+        )
+        categoria = Categoria.objects.create(nombre="Hamburguesas")
+        self.burger = Producto.objects.create(categoria=categoria, nombre="Super Hamburguesa", precio=Decimal("5.00"))
+        self.pollo = OpcionProducto.objects.create(producto=self.burger, nombre="Pollo", precio_extra=Decimal("0.50"))
+        self.queso = Extra.objects.create(nombre="Queso", precio=Decimal("0.50"))
+        self.papas = Producto.objects.create(categoria=categoria, nombre="Papas", precio=Decimal("2.00"))
+
+    def agotar(self, obj):
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.disponible = False
+            obj.save()
+
+    def test_bitmaps_versionados_y_cacheados(self):
+        data = self.client.get(reverse('api_disponibilidad')).json()
+        self.assertEqual(data['productos'], '0')
+        with self.assertNumQueries(0):
+            self.assertFalse(self.client.get(reverse('api_disponibilidad'), {'version': data['version']}).json()['cambios'])
+
+        self.agotar(self.queso)
+        nuevo = self.client.get(reverse('api_disponibilidad'), {'version': data['version']}).json()
+        self.assertTrue(nuevo['cambios'])
+        self.assertEqual(int(nuevo['extras'], 16), 1 << self.queso.id)
+
+    def test_checkout_quita_lo_agotado_antes_de_escribir(self):
+        session = self.client.session
+        session['cart'] = {f"{self.burger.id}-{self.pollo.id}-{self.queso.id}": 1, f"{self.papas.id}-0-0": 2}
+        session.save()
+        self.agotar(self.pollo)
+
+        obtener_disponibilidad()  # 3 consultas; luego sale de la caché
+        with self.assertNumQueries(0):
+            self.assertEqual(obtener_disponibilidad().claves_agotadas(session['cart']), [f"{self.burger.id}-{self.pollo.id}-{self.queso.id}"])
+        response = self.client.post(reverse('checkout'), {'telefono': "7777 8888", 'nombre': "Ana", 'metodo_pago': 'EFECTIVO'})
+        self.assertRedirects(response, reverse('checkout'), fetch_redirect_response=False)
+        self.assertEqual(self.client.session['cart'], {f"{self.papas.id}-0-0": 2})
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_no_agrega_un_producto_agotado(self):
+        self.agotar(self.papas)
+        self.client.get(reverse('add_to_cart', args=[self.papas.id]))
+        self.assertNotIn('cart', self.client.session)
+
+    def test_opcion_o_extras_que_no_son_ids(self):
+        for datos in ({'opcion_id': 'abc'}, {'opcion_id': '-1'}, {'extras': ['1', 'x']}):
+            response = self.client.post(reverse('add_to_cart', args=[self.papas.id]), datos)
+            self.assertEqual(response.status_code, 302)
+        self.assertNotIn('cart', self.client.session)
+
+    def test_carrito_viejo_con_claves_raras_no_rompe_el_checkout(self):
+        cart = {f"{self.papas.id}-abc-0": 1, f"{self.papas.id}--1-0": 1, f"{self.papas.id}-0-0": 2}
+        self.assertEqual(obtener_disponibilidad().claves_agotadas(cart), list(cart)[:2])
+
+
+class ImportarCatalogoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.categoria = Categoria.objects.create(nombre="Hamburguesas")
+        self.burger = Producto.objects.create(categoria=self.categoria, nombre="Super Hamburguesa", precio=Decimal("5.00"))
+        OpcionProducto.objects.create(producto=self.burger, nombre="Pollo", precio_extra=Decimal("0.50"))
+        self.burger.extras.add(Extra.objects.create(nombre="Queso", precio=Decimal("0.50")))
+
+    def test_exportar_e_importar_sin_cambios_no_escribe(self):
+        datos = catalogo_desde_csv(catalogo_a_csv(exportar_catalogo()))
+        with self.assertNumQueries(7):  # savepoint, 3 mapas, opciones, enlaces, release
+            resumen = importar_catalogo(datos)
+        self.assertEqual(resumen['productos'], {'nuevos': 0, 'cambiados': 0})
+        self.assertEqual(resumen['enlaces_extras'], {'nuevos': 0, 'quitados': 0})
+
+    def test_aplica_diferencias_y_sube_la_version_una_vez(self):
+        version = version_catalogo()
+        datos = exportar_catalogo()
+        datos['extras'].append({'nombre': "Tocino", 'precio': "1.00"})
+        datos['productos'][0]['precio'] = "5.50"
+        datos['productos'][0]['extras'] = ["Tocino"]
+        datos['productos'].append({'nombre': "Doble", 'categoria': "Hamburguesas", 'precio': "7",
+                                   'opciones': [{'nombre': "Res", 'precio_extra': "0"}], 'extras': ["Queso", "Tocino"]})
+        with self.captureOnCommitCallbacks(execute=True):
+            resumen = importar_catalogo(datos)
+
+        self.assertEqual(resumen['productos'], {'nuevos': 1, 'cambiados': 1})
+        self.assertEqual(resumen['enlaces_extras'], {'nuevos': 3, 'quitados': 1})
+        self.burger.refresh_from_db()
+        self.assertEqual(self.burger.precio, Decimal("5.50"))
+        self.assertEqual(sorted(Producto.objects.get(nombre="Doble").extras.values_list('nombre', flat=True)), ["Queso", "Tocino"])
+        self.assertGreater(version_catalogo(), version)
+
+    def test_simular_y_retirar(self):
+        resumen = importar_catalogo({'categorias': [], 'extras': [], 'productos': []}, retirar=True, simular=True)
+        self.assertEqual(resumen['productos']['retirados'], 1)
+        self.assertTrue(Producto.objects.get().disponible)
+
+    def test_extra_inexistente_no_guarda_nada(self):
+        datos = exportar_catalogo()
+        datos['productos'][0]['precio'] = "9.00"
+        datos['productos'][0]['extras'] = ["Aguacate"]
+        with self.assertRaises(ValidationError):
+            importar_catalogo(datos)
+        self.assertEqual(Producto.objects.get().precio, Decimal("5.00"))
+
+    def test_formas_invalidas_son_validation_error(self):
+        for datos in ([], {'categorias': [{'nombre': "Bebidas", 'orden': "x"}]}, {'productos': ["Soda"]},
+                      {'extras': {'nombre': "Queso"}}):
+            with self.assertRaises(ValidationError):
+                importar_catalogo(datos)
+
+
+class AdminPedidosTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@a.com', 'x'))
+        ana = Cliente.objects.create(telefono="+50377778888", nombre="Ána", apellido="López")
+        beto = Cliente.objects.create(telefono="+50370001111", nombre="Beto", apellido="Díaz")
+        self.pedidos = [Pedido.objects.create(cliente=c) for c in (ana, beto, ana)]
+
+    def ids(self, **params):
+        response = self.client.get(reverse('admin:pedidos_pedido_changelist'), params)
+        return sorted(p.id for p in response.context['cl'].result_list)
+
+    def test_busqueda_por_telefono_nombre_e_id(self):
+        ana = [self.pedidos[0].id, self.pedidos[2].id]
+        self.assertEqual(self.ids(q="7777-8888"), ana)
+        self.assertEqual(self.ids(q="ana lo"), ana)
+        self.assertEqual(self.ids(q=str(self.pedidos[1].id)), [self.pedidos[1].id])
+        self.assertEqual(Cliente.objects.get(telefono="+50377778888").nombre_busqueda, "ana lopez")
+
+    def test_aviso_de_archivados_sin_like_sobre_el_archivo(self):
+        ana = Cliente.objects.get(telefono="+50377778888")
+        PedidoArchivado.objects.create(id=9001, cliente=ana, telefono=ana.telefono, nombre_cliente="Ána López",
+                                       fecha_creacion=timezone.now(), estado='ENTREGADO', metodo_pago='EFECTIVO')
+        for termino in ("ana lo", "7777-8888"):
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(reverse('admin:pedidos_pedido_changelist'), {'q': termino}, follow=True)
+            self.assertContains(response, "1 pedido(s) archivado(s)")
+            self.assertFalse([q for q in consultas.captured_queries if 'archivado' in q['sql'] and 'LIKE' in q['sql']])
+        archivo = self.client.get(reverse('admin:pedidos_pedidoarchivado_changelist'), {'q': "ana"})
+        self.assertEqual([p.id for p in archivo.context['cl'].result_list], [9001])
+
+    def test_cursor_antes_y_conteo_acotado(self):
+        self.assertEqual(self.ids(antes=self.pedidos[2].id), [self.pedidos[0].id, self.pedidos[1].id])
+
+        class Acotado(PaginadorEstimado):
+            LIMITE = 2
+        self.assertEqual(Acotado(Pedido.objects.order_by('-id'), 1).count, 2)
+        self.assertEqual(PaginadorEstimado(Pedido.objects.order_by('-id'), 1).count, 3)
+        detalle = reverse('admin:pedidos_pedido_change', args=[self.pedidos[0].id])
+        self.assertEqual(self.client.get(detalle).status_code, 200)
+
+
+class PreciosTests(TestCase):
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Hamburguesas")
+        self.burger = Producto.objects.create(categoria=categoria, nombre="Super Hamburguesa", precio=Decimal("5.00"))
+        self.pollo = OpcionProducto.objects.create(producto=self.burger, nombre="Pollo", precio_extra=Decimal("0.50"))
+        self.extras = [Extra.objects.create(nombre=n, precio=Decimal(p)) for n, p in (("Queso", "0.50"), ("Tocino", "1.25"))]
+        self.pedido = Pedido.objects.create(cliente=Cliente.objects.create(telefono="+50377778888", nombre="Ana", apellido="López"),
+                                            metodo_pago='TARJETA')
+
+    def test_extras_total_se_mantiene_y_guardar_no_lee_la_tabla_m2m(self):
+        detalle = DetallePedido.objects.create(pedido=self.pedido, producto=self.burger, opcion=self.pollo, cantidad=2)
+        detalle.extras.add(*self.extras)
+        detalle.refresh_from_db()
+        self.assertEqual((detalle.extras_total, detalle.subtotal), (Decimal("1.75"), Decimal("14.50")))
+
+        detalle.cantidad = 3
+        with CaptureQueriesContext(connection) as consultas:
+            detalle.save()
+        self.assertFalse(any('detallepedido_extras' in q['sql'] for q in consultas.captured_queries))
+
+        detalle.extras.remove(self.extras[1])
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.total_productos, Decimal("18.00"))
+
+    def test_comision_en_decimal(self):
+        DetallePedido.objects.create(pedido=self.pedido, producto=self.burger, cantidad=1, precio_unitario=Decimal("10.01"))
+        self.pedido.refresh_from_db()
+        self.assertEqual((self.pedido.comision_plataforma, self.pedido.total_final), (Decimal("0.50"), Decimal("10.51")))
+
+    def test_relleno_por_lotes(self):
+        detalle = DetallePedido.objects.create(pedido=self.pedido, producto=self.burger, cantidad=1)
+        detalle.extras.add(*self.extras)
+        DetallePedido.objects.update(extras_total=0)
+        self.assertEqual(rellenar_extras_total(DetallePedido, lote=1), 1)
+        self.assertEqual(DetallePedido.objects.get().extras_total, Decimal("1.75"))
+
+
+@override_settings(MULTINEGOCIO=True, ALLOWED_HOSTS=['*'])
+class MultinegocioTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.a = Negocio.objects.create(nombre="Pupusería", dominio="pupuseria.test")
+        self.b = Negocio.objects.create(nombre="Tacos", dominio="tacos.test")
+        for negocio, producto in ((self.a, "Revuelta"), (self.b, "Taco al pastor")):
+            with negocio_activo(negocio.id):
+                categoria = Categoria.objects.create(nombre="Platos")
+                Producto.objects.create(categoria=categoria, nombre=producto, precio=Decimal("1.00"))
+
+    def test_cada_host_ve_solo_su_catalogo(self):
+        response = self.client.get(reverse('menu'), HTTP_HOST="pupuseria.test")
+        self.assertContains(response, "Revuelta")
+        self.assertNotContains(response, "Taco al pastor")
+        self.assertEqual(self.client.get(reverse('menu'), HTTP_HOST="otro.test").status_code, 404)
+        with negocio_activo(self.b.id):
+            self.assertEqual(list(Producto.objects.values_list('nombre', flat=True)), ["Taco al pastor"])
+            self.assertEqual(ConfiguracionNegocio.objects.count(), 0)  # la del otro negocio no se ve
+
+    def test_caches_separadas_por_negocio(self):
+        with negocio_activo(self.a.id):
+            cache.set('prueba:negocio', 1)
+        with negocio_activo(self.b.id):
+            self.assertIsNone(cache.get('prueba:negocio'))
+
+    def test_el_staff_de_un_negocio_no_entra_a_otro(self):
+        usuario = User.objects.create_user('cajero', password='x')
+        usuario.groups.create(name='Administradores')
+        self.a.usuarios.add(usuario)
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.get(reverse('dashboard_admin'), HTTP_HOST="pupuseria.test").status_code, 200)
+        response = self.client.get(reverse('dashboard_admin'), HTTP_HOST="tacos.test")
+        self.assertEqual(response.status_code, 302)
+
+    def test_cambios_en_un_negocio_se_ven_aunque_se_hagan_desde_otro(self):
+        self.assertEqual(buscar_negocio("tacos.test")[0], self.b.id)
+        with negocio_activo(self.a.id):  # el admin siempre corre en el host de algún negocio
+            self.b.activo = False
+            self.b.save()
+        self.assertIsNone(buscar_negocio("tacos.test"))
+
+    def test_opciones_turnos_y_lineas_de_un_negocio(self):
+        # Modelos sin campo 'negocio' propio: llegan a él por su producto, configuración o pedido
+        with negocio_activo(self.a.id):
+            revuelta = Producto.objects.get()
+            loroco = OpcionProducto.objects.create(producto=revuelta, nombre="Con loroco", precio_extra=Decimal("0.25"))
+            queso = Extra.objects.create(nombre="Queso extra", precio=Decimal("0.50"))
+            revuelta.extras.add(queso)
+            config = ConfiguracionNegocio.objects.create()
+            TurnoHorario.objects.create(configuracion=config, dia_semana=0, hora_apertura=time(11), hora_cierre=time(15))
+            cliente = Cliente.objects.create(telefono="70000000", nombre="Ana", apellido="Pérez")
+            pedido = Pedido.objects.create(cliente=cliente, direccion_entrega="Centro")
+            detalle = DetallePedido.objects.create(pedido=pedido, producto=revuelta, opcion=loroco, cantidad=2)
+            detalle.extras.add(queso)
+            pedido.refresh_from_db()
+            self.assertEqual(pedido.total_productos, Decimal("3.50"))  # 2 × (1 + 0.25 + 0.50)
+            self.assertEqual([d.opcion.nombre for d in pedido.detalles.all()], ["Con loroco"])
+            self.assertEqual(list(revuelta.opciones.values_list('nombre', flat=True)), ["Con loroco"])
+            self.assertEqual(config.turnos.count(), 1)
+
+        response = self.client.get(reverse('menu'), HTTP_HOST="pupuseria.test")
+        self.assertContains(response, "Con loroco")
+        self.assertContains(response, "Queso extra")
+        with negocio_activo(self.b.id):
+            self.assertFalse(OpcionProducto.objects.exists())
+            self.assertFalse(TurnoHorario.objects.exists())
+            self.assertFalse(DetallePedido.objects.exists())
+
+        usuario = User.objects.create_user('cajero', password='x')
+        usuario.groups.create(name='Administradores')
+        self.a.usuarios.add(usuario)
+        self.client.force_login(usuario)
+        self.assertContains(self.client.get(reverse('dashboard_admin'), HTTP_HOST="pupuseria.test"), f"#{pedido.id}")
+
+    def test_el_mismo_telefono_es_otro_cliente_en_otro_negocio(self):
+        with negocio_activo(self.a.id):
+            ana = guardar_cliente("+50377778888", "Ana", "López", "Centro")
+            self.assertEqual(guardar_cliente("+50377778888", "Ana", "López", "Escalón").id, ana.id)
+        with negocio_activo(self.b.id):
+            otra = guardar_cliente("+50377778888", "Ana", "Ruiz", "Santa Ana")
+        self.assertNotEqual(otra.id, ana.id)
+        self.assertEqual(Cliente.objects.get(id=ana.id).direccion_ultima, "Escalón")
+
+    def test_readiness_responde_con_cualquier_host(self):
+        self.assertEqual(self.client.get(reverse('listo'), HTTP_HOST="10.0.0.7").status_code, 200)
+
+
+def banco_falso(latencia=0, auth_status=200):
+    """Transporte httpx que responde como Wompi (token y enlace) tras 'latencia' segundos."""
+    async def responder(request):
+        await asyncio.sleep(latencia)
+        if request.url.path.endswith('/token'):
+            return httpx.Response(auth_status, json={'access_token': 'tok'})
+        if request.url.host == 'ip-api.com':
+            return httpx.Response(200, json={'status': 'success', 'countryCode': 'SV', 'lat': 13.7, 'lon': -89.2, 'city': 'San Salvador'})
+        datos = json.loads(request.content)
+        return httpx.Response(200, json={'urlEnlace': f"https://pago.test/{datos['IdentificadorEnlaceComercio']}"})
+    return httpx.MockTransport(responder)
+
+
+class PasarelaAsyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ConfiguracionNegocio.objects.create()
+        cliente = Cliente.objects.create(telefono="70000000", nombre="Ana", apellido="Pérez")
+        self.pedido = Pedido.objects.create(cliente=cliente, metodo_pago='TARJETA')
+
+    async def test_pago_redirige_al_enlace_del_banco(self):
+        with mock.patch.object(pasarela, 'transporte', banco_falso()):
+            response = await self.async_client.get(reverse('pagar_wompi', args=[self.pedido.id]))
+        self.assertRedirects(response, f"https://pago.test/ORDEN-{self.pedido.id}", fetch_redirect_response=False)
+
+    async def test_banco_rechaza_auth_vuelve_al_menu(self):
+        with mock.patch.object(pasarela, 'transporte', banco_falso(auth_status=401)):
+            response = await self.async_client.get(reverse('pagar_wompi', args=[self.pedido.id]))
+        self.assertRedirects(response, reverse('menu'), fetch_redirect_response=False)
+
+    async def test_geo_ip_y_suscripcion_sin_login(self):
+        with mock.patch.object(pasarela, 'transporte', banco_falso()):
+            response = await self.async_client.get(reverse('geo_ip'))
+            self.assertEqual(json.loads(response.content)['city'], 'San Salvador')
+            response = await self.async_client.get(reverse('pagar_suscripcion'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login_custom'), response['Location'])
+
+    async def test_banco_lento_no_bloquea_el_menu(self):
+        terminadas = []
+
+        async def pedir(nombre, url):
+            await self.async_client.get(url)
+            terminadas.append(nombre)
+
+        with mock.patch.object(pasarela, 'transporte', banco_falso(latencia=0.5)):
+            await asyncio.gather(pedir('pago', reverse('pagar_wompi', args=[self.pedido.id])), pedir('menu', reverse('menu')))
+        self.assertEqual(terminadas, ['menu', 'pago'])
+
+    def test_bajo_wsgi_no_queda_un_cliente_por_loop(self):
+        # Cada petición WSGI corre en un loop que muere con ella: el cliente se cierra al terminar
+        abiertos = []
+        nuevo = pasarela._nuevo_cliente
+        with mock.patch.object(pasarela, 'transporte', banco_falso()), \
+                mock.patch.object(pasarela, '_nuevo_cliente', lambda: abiertos.append(nuevo()) or abiertos[-1]):
+            for _ in range(3):
+                response = self.client.get(reverse('pagar_wompi', args=[self.pedido.id]))
+                self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(abiertos), 3)
+        self.assertTrue(all(cliente.is_closed for cliente in abiertos))
+
+
+class BusquedaMenuTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        busqueda._indices.clear()
+        hamburguesas = Categoria.objects.create(nombre="Hamburguesas")
+        bebidas = Categoria.objects.create(nombre="Bebidas")
+        self.clasica = Producto.objects.create(categoria=hamburguesas, nombre="Hamburguesa Clásica", precio=Decimal("5.00"))
+        OpcionProducto.objects.create(producto=self.clasica, nombre="Carne de Res", precio_extra=Decimal("0"))
+        self.jalapeno = Producto.objects.create(categoria=hamburguesas, nombre="Súper Jalapeño", precio=Decimal("6.00"),
+                                                descripcion="Carne, queso y chile jalapeño.")
+        self.horchata = Producto.objects.create(categoria=bebidas, nombre="Horchata", precio=Decimal("1.50"),
+                                                descripcion="Con un toque de canela.")
+        Producto.objects.create(categoria=bebidas, nombre="Café Oculto", precio=Decimal("1.00"), disponible=False)
+
+    def ids(self, texto):
+        return [r['id'] for r in busqueda.obtener_indice_busqueda().buscar(texto)]
+
+    def test_tildes_prefijos_errores_y_campos(self):
+        self.assertEqual(self.ids("jalapeno"), [self.jalapeno.id])
+        self.assertEqual(self.ids("SUPER jala"), [self.jalapeno.id])
+        self.assertEqual(self.ids("hamburgesa"), [self.clasica.id, self.jalapeno.id])  # nombre pesa más que categoría
+        self.assertEqual(self.ids("res"), [self.clasica.id])  # por la opción
+        self.assertEqual(self.ids("canela"), [self.horchata.id])  # por la descripción
+        self.assertEqual(self.ids("horchata jalapeño"), [])  # todas las palabras deben coincidir
+        self.assertEqual(self.ids("cafe"), [])  # lo oculto del menú no aparece
+
+    def test_endpoint_sin_consultas_y_se_reconstruye_con_el_catalogo(self):
+        busqueda.obtener_indice_busqueda()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api_buscar_menu'), {'q': 'horchta'})
+        self.assertEqual(response.json()['resultados'][0]['nombre'], "Horchata")
+        self.assertIn('max-age', response['Cache-Control'])
+
+        self.horchata.nombre = "Horchata de Morro"
+        self.horchata.save()
+        self.assertEqual(self.ids("morro"), [self.horchata.id])
+
+
+class MostradorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        mostrador._indices.clear()
+        hamburguesas = Categoria.objects.create(nombre="Hamburguesas")
+        self.burger = Producto.objects.create(categoria=hamburguesas, nombre="Súper Hamburguesa", precio=Decimal("5.00"))
+        self.pollo = OpcionProducto.objects.create(producto=self.burger, nombre="Pollo", precio_extra=Decimal("0.50"))
+        self.queso = Extra.objects.create(nombre="Queso", precio=Decimal("0.75"))
+        self.burger.extras.add(self.queso)
+        self.soda = Producto.objects.create(categoria=hamburguesas, nombre="Soda", precio=Decimal("1.00"))
+        self.client.force_login(User.objects.create_superuser('cajero', 'cajero@example.com', 'x'))
+
+    def enviar(self, **datos):
+        pedido = {'telefono': '7777-8888', 'nombre': 'Ana', 'apellido': 'López', 'direccion': 'Col. Escalón',
+                  'lineas': [{'producto': self.burger.id, 'opcion': self.pollo.id, 'extras': [self.queso.id], 'cantidad': 2},
+                             {'producto': self.soda.id, 'cantidad': 3}]}
+        pedido.update(datos)
+        return self.client.post(reverse('api_mostrador_pedido'), json.dumps(pedido), content_type='application/json')
+
+    def test_indice_en_memoria_busca_sin_consultas(self):
+        indice = mostrador.obtener_indice_catalogo()
+        with self.assertNumQueries(0):
+            self.assertIs(mostrador.obtener_indice_catalogo(), indice)
+            self.assertEqual([p['nombre'] for p in indice.buscar("super ham")], ["Súper Hamburguesa"])
+        self.soda.nombre = "Soda Light"
+        self.soda.save()
+        self.assertEqual(mostrador.obtener_indice_catalogo().buscar("light")[0]['id'], self.soda.id)
+
+    def test_pedido_completo_en_un_post_con_inserts_masivos(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.enviar()
+        self.assertEqual(response.status_code, 201)
+        inserts = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 4)  # cliente, pedido, líneas, extras de las líneas
+
+        pedido = Pedido.objects.get(id=response.json()['pedido_id'])
+        self.assertTrue(pedido.es_pedido_whatsapp)
+        self.assertEqual((pedido.estado, pedido.cliente.telefono), ('RECIBIDO', '+50377778888'))
+        self.assertEqual(pedido.total_productos, Decimal("15.50"))  # 2 × (5 + 0.50 + 0.75) + 3 × 1
+        linea = pedido.detalles.get(producto=self.burger)
+        self.assertEqual((linea.extras_total, linea.subtotal), (Decimal("0.75"), Decimal("12.50")))
+        self.assertEqual(list(linea.extras.all()), [self.queso])
+
+        autocompletar = self.client.get(reverse('api_mostrador_cliente'), {'telefono': '77778888'}).json()
+        self.assertEqual((autocompletar['nombre'], autocompletar['direccion']), ('Ana', 'Col. Escalón'))
+
+    def test_rechaza_agotados_y_extras_ajenos_sin_escribir(self):
+        respuesta = self.enviar(lineas=[{'producto': self.soda.id, 'extras': [self.queso.id]}])
+        self.assertEqual(respuesta.status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soda.disponible = False
+            self.soda.save()
+        respuesta = self.enviar()
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn("agotado", respuesta.json()['msg'])
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_indice_de_otro_proceso_con_precio_viejo_no_guarda(self):
+        mostrador.obtener_indice_catalogo()
+        # update() no dispara las señales: como un cambio hecho en otro worker con LocMem
+        Extra.objects.filter(id=self.queso.id).update(precio=Decimal("1.00"))
+        respuesta = self.enviar()
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn("catálogo cambió", respuesta.json()['msg'])
+        self.assertFalse(Pedido.objects.exists())
+
+
+EJECUCIONES = []
+
+@tareas.tarea(nombre='prueba_anotar')
+def tarea_anotar(valor):
+    EJECUCIONES.append(valor)
+
+@tareas.tarea(nombre='prueba_falla', max_intentos=2)
+def tarea_falla():
+    raise ValueError("sin banco")
+
+
+@override_settings(TAREAS_EN_COLA=True, TAREAS_REINTENTO_SEGUNDOS=30)
+class ColaTareasTests(TestCase):
+    def setUp(self):
+        EJECUCIONES.clear()
+
+    def test_encolar_reservar_y_ejecutar_una_sola_vez(self):
+        tareas.encolar(tarea_anotar, valor=1)
+        tareas.encolar(tarea_anotar, en=timezone.now() + timedelta(hours=1), valor=2)  # programada
+        self.assertEqual(EJECUCIONES, [])
+
+        ids = tareas.reservar(10, 'prueba')
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(tareas.reservar(10, 'otro'), [])
+        tareas.ejecutar(ids[0])
+        self.assertEqual(EJECUCIONES, [1])
+        hecha = Tarea.objects.get(id=ids[0])
+        self.assertEqual((hecha.estado, hecha.intentos), ('LISTA', 1))
+        self.assertIsNotNone(hecha.duracion_ms)
+        self.assertEqual(tareas.estadisticas()[0]['terminadas'], 1)
+
+    def test_reintenta_con_espera_y_luego_falla(self):
+        t = tareas.encolar(tarea_falla)
+        tareas.ejecutar(tareas.reservar(1, 'prueba')[0])
+        t.refresh_from_db()
+        self.assertEqual(t.estado, 'PENDIENTE')
+        self.assertGreaterEqual(t.ejecutar_en, timezone.now() + timedelta(seconds=29))
+        self.assertIn("sin banco", t.ultimo_error)
+
+        Tarea.objects.filter(id=t.id).update(ejecutar_en=timezone.now())
+        tareas.ejecutar(tareas.reservar(1, 'prueba')[0])
+        t.refresh_from_db()
+        self.assertEqual((t.estado, t.intentos), ('FALLIDA', 2))
+
+    def test_periodicas_sin_duplicados_y_la_siguiente_al_terminar(self):
+        tareas.programar_periodicas()
+        tareas.programar_periodicas()
+        periodicas = Tarea.objects.filter(periodica=True)
+        self.assertEqual(periodicas.filter(nombre='limpiar_tareas').count(), 1)
+
+        limpiar = periodicas.get(nombre='limpiar_tareas')
+        Tarea.objects.filter(periodica=True).exclude(id=limpiar.id).delete()
+        tareas.ejecutar(tareas.reservar(1, 'prueba')[0])
+        siguiente = Tarea.objects.get(nombre='limpiar_tareas', estado='PENDIENTE')
+        self.assertGreater(siguiente.ejecutar_en, timezone.now() + timedelta(hours=23))
+
+    def test_sin_cola_corre_en_el_momento(self):
+        with override_settings(TAREAS_EN_COLA=False):
+            self.assertIsNone(tareas.encolar(tarea_anotar, valor=3))
+        self.assertEqual(EJECUCIONES, [3])
+        self.assertFalse(Tarea.objects.exists())
+
+
+@override_settings(TAREAS_EN_COLA=True)
+class TrabajadorTareasTests(TransactionTestCase):
+    # Sin la transacción de TestCase: los hilos del pool deben ver las filas
+    def test_pool_de_hilos_procesa_lo_vencido(self):
+        EJECUCIONES.clear()
+        for valor in range(5):
+            tareas.encolar(tarea_anotar, valor=valor)
+        with mock.patch.object(tareas, 'programar_periodicas'):
+            self.assertEqual(tareas.trabajar(hilos=3, intervalo=0.05, una_vez=True), 5)
+        self.assertEqual(sorted(EJECUCIONES), [0, 1, 2, 3, 4])
+        self.assertEqual(Tarea.objects.filter(estado='LISTA').count(), 5)
+
+    def test_trabajador_no_arranca_sin_cache_compartida(self):
+        with self.assertRaisesMessage(CommandError, "CACHE_BACKEND compartida"):
+            call_command('procesar_tareas', '--una-vez')
+
+
+class ArranqueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        arranque._estado.update(listo=False, ms=None)
+        self.cajero = User.objects.create_user('cajero', password='x')
+        self.cajero.groups.create(name='Administradores')
+
+    def test_calentar_llena_caches_y_listo_responde(self):
+        with override_settings(MENU_CACHE_PUBLICO=True, CACHE_COMPARTIDA=True):
+            self.assertTrue(arranque.calentar())
+            self.assertEqual(ConfiguracionNegocio.objects.count(), 1)
+            with self.assertNumQueries(0):
+                obtener_disponibilidad()
+                self.assertIn('Administradores', grupos_de(self.cajero))
+                self.assertEqual(self.client.get(reverse('menu')).status_code, 200)
+
+        response = self.client.get(reverse('listo'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['listo'])
+
+    @override_settings(CACHE_COMPARTIDA=True)
+    def test_roles_se_invalidan_al_cambiar_grupos(self):
+        self.assertEqual(grupos_de(self.cajero), {'Administradores'})
+        self.cajero.groups.clear()
+        self.assertEqual(grupos_de(self.cajero), frozenset())
+
+    @override_settings(CACHE_COMPARTIDA=True)
+    def test_roles_se_invalidan_para_todos_los_negocios(self):
+        with negocio_activo(1):
+            self.assertEqual(grupos_de(self.cajero), {'Administradores'})
+        with negocio_activo(2):
+            self.cajero.groups.clear()
+        with negocio_activo(1):
+            self.assertEqual(grupos_de(self.cajero), frozenset())
+
+    def test_sin_cache_compartida_los_roles_salen_de_la_base(self):
+        self.assertEqual(grupos_de(User.objects.get(id=self.cajero.id)), {'Administradores'})
+        self.cajero.groups.clear()
+        usuario = User.objects.get(id=self.cajero.id)  # como request.user: uno nuevo por petición
+        with self.assertNumQueries(1):
+            self.assertEqual(grupos_de(usuario), frozenset())
+            self.assertEqual(grupos_de(usuario), frozenset())
+
+
+@override_settings(REPLICA_RETRASO_MAXIMO=10)
+class RouterReplicaTests(SimpleTestCase):
+    # Sin TestCase: su transacción abierta mandaría todo al primario
+    def setUp(self):
+        cache.set(replica.CLAVE_RETRASO, 0)
+        parche = mock.patch.object(replica, 'replica_configurada', return_value=True)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_solo_lecturas_marcadas_y_hasta_escribir(self):
+        self.assertEqual(router.db_for_read(Pedido), 'default')
+        with replica.lecturas_en_replica():
+            self.assertEqual(router.db_for_read(Pedido), 'replica')
+            self.assertEqual(router.db_for_write(Pedido), 'default')
+            self.assertEqual(router.db_for_read(Pedido), 'default')
+        with replica.lecturas_en_replica():
+            self.assertEqual(router.db_for_read(Cliente), 'replica')
+
+    def test_sesiones_y_usuarios_siempre_del_primario(self):
+        with replica.lecturas_en_replica():
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_read(Pedido), 'replica')
+
+    def test_replica_atrasada_o_caida_vuelve_al_primario(self):
+        for retraso in (30, float('inf')):
+            cache.set(replica.CLAVE_RETRASO, retraso)
+            with replica.lecturas_en_replica():
+                self.assertEqual(router.db_for_read(Pedido), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'pedidos'))
+
+
+@override_settings(TELEMETRIA_VACIAR_SEGUNDOS=0, TELEMETRIA_ACTIVA=True)
+class TelemetriaRepartidorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        telemetria.BUFFER.vaciar()
+        self.repartidor = User.objects.create_user('moto1', password='x')
+        cliente = Cliente.objects.create(telefono="70000000", nombre="Ana", apellido="Pérez")
+        self.pedido = Pedido.objects.create(cliente=cliente, estado='RUTA', repartidor=self.repartidor)
+        self.token = telemetria.token_repartidor(self.repartidor, None)
+
+    def _pings(self, puntos, token=None):
+        return self.client.post(reverse('api_reparto_posicion'), json.dumps({'token': token or self.token, 'puntos': puntos}),
+                                content_type='application/json')
+
+    def test_recibir_no_toca_la_base_y_el_tracker_ve_la_ultima_posicion(self):
+        ahora = timezone.now().timestamp()
+        # Recta hacia el norte (con un desvío de 2 m) y luego un giro al este
+        puntos = [{'lat': 13.70 + i * 0.0001, 'lng': -89.20 + (0.00002 if i == 5 else 0), 'ts': (ahora - 20 + i) * 1000}
+                  for i in range(10)]
+        puntos += [{'lat': 13.7009, 'lng': -89.20 + i * 0.0001, 'ts': (ahora - 10 + i) * 1000} for i in range(1, 10)]
+        puntos.append({'lat': 200, 'lng': 0})  # inválido: se descarta
+        with self.assertNumQueries(0):
+            response = self._pings(puntos)
+        self.assertEqual((response.status_code, response.json()['recibidos']), (202, 19))
+
+        sesion = self.client.session
+        sesion['ultimo_pedido_id'] = self.pedido.id  # quien hizo el pedido
+        sesion.save()
+        estado = self.client.get(reverse('api_order_status', args=[self.pedido.id])).json()
+        self.assertAlmostEqual(estado['repartidor']['lng'], -89.1991)
+        self.assertLessEqual(estado['repartidor']['hace'], 2)
+
+        # Inicio, esquina y final: lo demás está a menos de TELEMETRIA_TOLERANCIA_METROS de la recta
+        self.assertEqual(telemetria.BUFFER.vaciar(), 3)
+        esquina = self.repartidor.posiciones.order_by('registrada')[1]
+        self.assertAlmostEqual(esquina.latitud, 13.7009)
+        self.assertEqual(esquina.longitud, -89.2)
+
+        Pedido.objects.filter(id=self.pedido.id).update(estado='ENTREGADO')
+        estado = self.client.get(reverse('api_order_status', args=[self.pedido.id])).json()
+        self.assertIsNone(estado['repartidor'])
+
+    def test_token_invalido_o_buffer_lleno(self):
+        punto = [{'lat': 13.7, 'lng': -89.2}]
+        self.assertEqual(self._pings(punto, token='falso').status_code, 403)
+        with override_settings(TELEMETRIA_MAX_BUFFER=0):
+            self.assertEqual(self._pings(punto).status_code, 202)
+        self.assertEqual(len(telemetria.BUFFER), 0)
+        # La posición actual igual llega al tracker
+        self.assertIsNotNone(telemetria.ultima_posicion(self.repartidor.id))
+
+    def test_token_de_otro_negocio_o_vencido(self):
+        punto = [{'lat': 13.7, 'lng': -89.2}]
+        self.assertEqual(self._pings(punto, token=telemetria.token_repartidor(self.repartidor, 99)).status_code, 403)
+        with override_settings(TELEMETRIA_TOKEN_TTL=-1):
+            self.assertEqual(self._pings(punto).status_code, 403)
+        self.assertIsNone(telemetria.ultima_posicion(self.repartidor.id))
+
+    def test_solo_quien_hizo_el_pedido_ve_al_repartidor(self):
+        self.assertEqual(self._pings([{'lat': 13.7, 'lng': -89.2}]).status_code, 202)
+        self.assertIsNone(self.client.get(reverse('api_order_status', args=[self.pedido.id])).json()['repartidor'])
+        from django.http import HttpResponse
+        Pedido.objects.filter(id=self.pedido.id).update(dispositivo='a' * 32)
+        self.client.cookies[COOKIE_DISPOSITIVO] = recordar_dispositivo(HttpResponse(), 'a' * 32).cookies[COOKIE_DISPOSITIVO].value
+        self.assertAlmostEqual(self.client.get(reverse('api_order_status', args=[self.pedido.id])).json()['repartidor']['lat'], 13.7)
+
+    def test_sin_cache_compartida_el_gps_no_se_activa(self):
+        with override_settings(TELEMETRIA_ACTIVA=False):
+            self.assertEqual(self._pings([{'lat': 13.7, 'lng': -89.2}]).status_code, 404)
+            self.assertIsNone(telemetria.posicion_para_pedido(self.pedido))
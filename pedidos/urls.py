@@ -5,6 +5,10 @@ from .views import pagar_suscripcion_view, wompi_suscripcion_respuesta_view
 
 urlpatterns = [
     path('', views.menu_view, name='menu'),
+    path('api/menu/cliente/', views.api_menu_cliente, name='api_menu_cliente'),
+    path('api/menu/disponibilidad/', views.api_disponibilidad, name='api_disponibilidad'),
+    path('api/menu/buscar/', views.api_buscar_menu, name='api_buscar_menu'),
+    path('api/cliente/', views.api_buscar_cliente, name='api_buscar_cliente'),
     # Rutas para acciones del carrito
     path('agregar/<int:producto_id>/', views.cart_add, name='add_to_cart'),
     path('limpiar/', views.cart_clear, name='clean_cart'),
@@ -18,17 +22,31 @@ urlpatterns = [
     # Dashboards (Ahora protegidos)
     path('dashboard/', views.dashboard_admin_view, name='dashboard_admin'),
     path('reparto/', views.dashboard_delivery_view, name='dashboard_delivery'),
+    path('api/reparto/posicion/', views.api_reparto_posicion, name='api_reparto_posicion'),
     
     path('eliminar-item/<str:producto_id>/', views.eliminar_item_carrito, name='eliminar_item'),
     path('api/geo-ip/', obtener_ubicacion_ip, name='geo_ip'),
     path('pagar/<int:pedido_id>/', views.pagar_wompi_view, name='pagar_wompi'),
     path('wompi-respuesta/', views.wompi_respuesta_view, name='wompi_respuesta'),
     path('dashboard/settings/', views.admin_settings_view, name='admin_settings'),
+    path('dashboard/settings/calendario/', views.api_calendario_view, name='api_calendario'),
     path('dashboard/settings/eliminar/<int:excepcion_id>/', views.eliminar_excepcion_view, name='eliminar_excepcion'),
     path('pedido/<int:pedido_id>/rastrear/', views.order_tracker_view, name='order_tracker'),
     path('api/pedido/<int:pedido_id>/status/', views.api_order_status, name='api_order_status'),
     path('dashboard/metricas/', views.dashboard_metrics_view, name='dashboard_metrics'),
+    path('metrics', views.metricas_prometheus_view, name='metricas_prometheus'),
+    path('salud/listo/', views.listo_view, name='listo'),
+    path('dashboard/rendimiento/', views.dashboard_rendimiento_view, name='dashboard_rendimiento'),
+    path('dashboard/cocina/', views.dashboard_cocina_view, name='dashboard_cocina'),
+    path('dashboard/cocina/api/', views.api_cocina_view, name='api_cocina'),
+    path('dashboard/mostrador/', views.mostrador_view, name='mostrador'),
+    path('dashboard/mostrador/api/catalogo/', views.api_mostrador_catalogo, name='api_mostrador_catalogo'),
+    path('dashboard/mostrador/api/cliente/', views.api_mostrador_cliente, name='api_mostrador_cliente'),
+    path('dashboard/mostrador/api/pedido/', views.api_mostrador_pedido, name='api_mostrador_pedido'),
+    path('dashboard/catalogo/exportar/', views.exportar_catalogo_view, name='exportar_catalogo'),
+    path('dashboard/catalogo/importar/', views.importar_catalogo_view, name='importar_catalogo'),
     path('mi-perfil/', views.perfil_usuario_view, name='perfil_usuario'),
+    path('mi-perfil/repetir/<int:pedido_id>/', views.repetir_pedido_view, name='repetir_pedido'),
     path('pagar-suscripcion/', pagar_suscripcion_view, name='pagar_suscripcion'),
     path('wompi-suscripcion-respuesta/', wompi_suscripcion_respuesta_view, name='wompi_suscripcion_respuesta'),
 
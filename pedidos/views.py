@@ -1,23 +1,55 @@
 import hashlib
 import json
-import urllib.request
-import requests 
+import logging
 import time # Necesario para generar referencias únicas
 from datetime import datetime, date, timedelta
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Categoria, Producto, Pedido, DetallePedido, Cliente, ConfiguracionNegocio, DiaEspecial, OpcionProducto, Extra
-from django.db import transaction
+from .models import Categoria, Producto, Pedido, DetallePedido, Cliente, ConfiguracionNegocio, DiaEspecial, OpcionProducto, Extra, PedidoArchivado
+from django.db import connection, transaction
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from decouple import config
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt # IMPORTANTE PARA EL WEBHOOK
-from django.contrib.auth.views import LoginView
+from django.views.decorators.http import require_POST
+from django.contrib.auth.views import LoginView, redirect_to_login
 from django.contrib.auth import logout
-from django.http import JsonResponse 
+from django.http import Http404, JsonResponse, HttpResponse
 from django.template.loader import render_to_string 
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.db.models import Sum, Count, F, Q
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
+from .capacidad import obtener_carga
+from . import archivo
+from . import arranque
+from .busqueda import obtener_indice_busqueda
+from .carrito import carrito_desde_pedido, clave_carrito, ids_validos
+from .catalogo import version_catalogo
+from .clientes import (
+    activos_dispositivo, buscar_cliente, buscar_cliente_por_prefijo, dispositivo_del_request, guardar_cliente,
+    historial_dispositivo, normalizar_telefono, nuevo_dispositivo, pidio_desde, prefijo_telefono, recordar_dispositivo,
+)
+from .cocina import tablero_cocina, version_cocina
+from .disponibilidad import obtener_disponibilidad, version_disponibilidad
+from .horario import calendario_mes, construir_agenda, obtener_indice
+from . import importacion
+from . import instrumentacion
+from .limites import ip_cliente, limite_excedido
+from .observabilidad import ENLACE_PAGO_SEGUNDOS, ERRORES_BANCO_TOTAL, METRICAS, WEBHOOK_SEGUNDOS
+from . import mostrador
+from . import pasarela
+from .precios import total_con_comision
+from .replica import lectura_replica
+from .roles import grupos_de
+from . import telemetria
+from .tenencia import id_negocio_actual
+
+logger = logging.getLogger(__name__)
 
 # --- LÓGICA DE LOGIN Y SEGURIDAD ---
 
@@ -27,9 +59,9 @@ class CustomLoginView(LoginView):
 
     def get_success_url(self):
         user = self.request.user
-        if user.groups.filter(name='Administradores').exists() or user.is_superuser:
+        if es_admin(user):
             return '/dashboard/' 
-        elif user.groups.filter(name='Repartidores').exists():
+        elif es_repartidor(user):
             return '/reparto/'   
         else:
             return '/' 
@@ -39,113 +71,188 @@ def logout_view(request):
     return redirect('login_custom')
 
 def es_admin(user):
-    return user.groups.filter(name='Administradores').exists() or user.is_superuser
+    return user.is_superuser or 'Administradores' in grupos_de(user)
 
 def es_repartidor(user):
-    return user.groups.filter(name='Repartidores').exists()
+    return 'Repartidores' in grupos_de(user)
 
 # --- VALIDACIÓN DE SUSCRIPCIÓN (EL GUARDIA DE SEGURIDAD) ---
 def suscripcion_activa():
     """Retorna True si está al día, False si venció."""
-    config_negocio = ConfiguracionNegocio.objects.first()
-    if not config_negocio: return True 
-    
-    hoy = date.today()
-    vencimiento = config_negocio.fecha_vencimiento
-
-    # Si tiene fecha y la fecha de hoy es MAYOR o IGUAL al vencimiento, CORTAMOS.
-    if vencimiento and hoy >= vencimiento:
-        return False
-    return True
+    # La fecha de vencimiento viaja en el índice de horario cacheado: sin consulta
+    return obtener_indice().suscripcion_activa(date.today())
 
 # --- CEREBRO DEL TIEMPO ---
 
-def verificar_estado_negocio():
-    ahora = datetime.now()
-    fecha_hoy = ahora.date()
-    hora_actual = ahora.time()
-    dia_semana = ahora.weekday() 
+def obtener_configuracion():
+    """La configuración única del negocio (se crea la primera vez)."""
+    config_negocio = ConfiguracionNegocio.objects.first()
+    if not config_negocio:
+        config_negocio = ConfiguracionNegocio.objects.create()
+        config_negocio.refresh_from_db()  # los defaults de hora llegan como texto hasta releer
+    return config_negocio
 
-    config = ConfiguracionNegocio.objects.first()
-    if not config:
-        config = ConfiguracionNegocio.objects.create()
+def verificar_estado_negocio():
+    """(abierto, mensaje). Responde desde el índice compilado en caché (ver horario.py)."""
+    indice = obtener_indice()
 
     # KILL SWITCH INTERNO
-    if not suscripcion_activa():
+    if not indice.suscripcion_activa(date.today()):
         return False, "Servicio en mantenimiento administrativo."
 
-    apertura_efectiva = config.hora_apertura
-    cierre_efectivo = config.hora_cierre
-    mensaje_base = config.mensaje_cierre
-    
-    dias_globales = [
-        config.lunes_abierto, config.martes_abierto, config.miercoles_abierto,
-        config.jueves_abierto, config.viernes_abierto, config.sabado_abierto,
-        config.domingo_abierto
-    ]
-    esta_habilitado = dias_globales[dia_semana]
-
-    excepcion = DiaEspecial.objects.filter(fecha=fecha_hoy).first()
-    
-    if excepcion:
-        if excepcion.abierto:
-            esta_habilitado = True
-            if excepcion.hora_apertura: apertura_efectiva = excepcion.hora_apertura
-            if excepcion.hora_cierre: cierre_efectivo = excepcion.hora_cierre
-        else:
-            motivo = excepcion.motivo or ""
-            return False, f"{mensaje_base} ({motivo})"
+    return indice.estado_en(datetime.now())
 
-    if esta_habilitado:
-        if apertura_efectiva < cierre_efectivo:
-            if apertura_efectiva <= hora_actual <= cierre_efectivo:
-                return True, ""
-        else:
-            if hora_actual >= apertura_efectiva or hora_actual <= cierre_efectivo:
-                return True, ""
+def verificar_admision():
+    """(abierto, mensaje, espera_minutos): horario + capacidad de la cocina, sin consultas si hay caché."""
+    abierto, mensaje = verificar_estado_negocio()
+    if not abierto:
+        return False, mensaje, None
 
-        ap_str = apertura_efectiva.strftime('%I:%M %p').lower()
-        ci_str = cierre_efectivo.strftime('%I:%M %p').lower()
-        return False, f"{mensaje_base} (Hoy: {ap_str} - {ci_str})"
-    
-    return False, mensaje_base
+    carga = obtener_carga()
+    admite, mensaje = carga.admite()
+    return admite, mensaje, carga.espera_minutos
 
 
 # --- VISTAS PÚBLICAS ---
 
+def obtener_ultimo_pedido_activo(request):
+    """Pedido en curso de esta sesión (o None). Limpia la sesión si ya terminó."""
+    ultimo_pedido_id = request.session.get('ultimo_pedido_id')
+    if not ultimo_pedido_id:
+        return None
+
+    try:
+        ped = Pedido.objects.get(id=ultimo_pedido_id)
+        if ped.estado not in ['ENTREGADO', 'CANCELADO']:
+            return ped
+    except Pedido.DoesNotExist:
+        pass
+
+    if 'ultimo_pedido_id' in request.session:
+        del request.session['ultimo_pedido_id']
+    return None
+
 def menu_view(request):
     if not suscripcion_activa():
         return render(request, 'pedidos/suspendido.html')
 
+    abierto, mensaje_estado, _ = verificar_admision()
+
+    if settings.MENU_CACHE_PUBLICO:
+        return menu_publico_cacheado(request, abierto, mensaje_estado)
+
     categorias = Categoria.objects.all().order_by('orden')
     cart = request.session.get('cart', {})
     cantidad_total = sum(cart.values())
-    
-    abierto, mensaje_estado = verificar_estado_negocio()
-
-    ultimo_pedido_id = request.session.get('ultimo_pedido_id')
-    ultimo_pedido_activo = None
-
-    if ultimo_pedido_id:
-        try:
-            ped = Pedido.objects.get(id=ultimo_pedido_id)
-            if ped.estado not in ['ENTREGADO', 'CANCELADO']:
-                ultimo_pedido_activo = ped
-            else:
-                if 'ultimo_pedido_id' in request.session:
-                    del request.session['ultimo_pedido_id']
-        except Pedido.DoesNotExist:
-            if 'ultimo_pedido_id' in request.session:
-                del request.session['ultimo_pedido_id']
 
     return render(request, 'pedidos/menu.html', {
         'categorias': categorias, 
         'cantidad_carrito': cantidad_total,
         'abierto': abierto,
         'mensaje_estado': mensaje_estado,
-        'ultimo_pedido_activo': ultimo_pedido_activo
+        'ultimo_pedido_activo': obtener_ultimo_pedido_activo(request),
+        'disponibilidad_poll': settings.DISPONIBILIDAD_POLL_SEGUNDOS,
+    })
+
+def menu_publico_cacheado(request, abierto, mensaje_estado):
+    """
+    Menú público idéntico para todos: se guarda entero en caché y se sirve con
+    ETag para que el proxy lo absorba. Sin Last-Modified: la versión del
+    catálogo no cambia al abrir o cerrar, y un If-Modified-Since devolvería
+    304 con el aviso de abierto/cerrado viejo. No toca la sesión (sin
+    Vary: Cookie); carrito, pedido activo, mensajes y CSRF los rellena el
+    navegador con api_menu_cliente.
+    """
+    huella = huella_menu_publico(abierto, mensaje_estado)
+    etag = f'"menu-{huella}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(html_menu_publico(huella, abierto, mensaje_estado))
+
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.MENU_CACHE_MAX_AGE)
+    return response
+
+def huella_menu_publico(abierto, mensaje_estado):
+    return hashlib.md5(f"{version_catalogo()}|{abierto}|{mensaje_estado}".encode()).hexdigest()
+
+def html_menu_publico(huella, abierto, mensaje_estado):
+    """HTML del menú público desde la caché (se renderiza solo si falta). También lo usa arranque.calentar."""
+    clave = f"menu:html:{huella}"
+    html = cache.get(clave)
+    if html is None:
+        categorias = Categoria.objects.all().order_by('orden')
+        html = render_to_string('pedidos/menu.html', {
+            'categorias': categorias,
+            'cantidad_carrito': 0,
+            'abierto': abierto,
+            'mensaje_estado': mensaje_estado,
+            'ultimo_pedido_activo': None,
+            'modo_cache': True,
+            'disponibilidad_poll': settings.DISPONIBILIDAD_POLL_SEGUNDOS,
+        })
+        cache.set(clave, html, settings.MENU_CACHE_TTL)
+    return html
+
+@never_cache
+def api_menu_cliente(request):
+    """Huecos personalizados del menú cacheado (pocos bytes, nunca se cachea)."""
+    cart = request.session.get('cart', {})
+    pedido = obtener_ultimo_pedido_activo(request)
+    mensajes = [{'tags': m.tags, 'texto': str(m)} for m in messages.get_messages(request)]
+    return JsonResponse({
+        'status': 'ok',
+        'cantidad_carrito': sum(cart.values()),
+        'pedido_activo': {
+            'id': pedido.id, 'url': reverse('order_tracker', args=[pedido.id])
+        } if pedido else None,
+        'mensajes': mensajes,
+        'csrf_token': get_token(request),
     })
 
+@never_cache
+def api_disponibilidad(request):
+    """Agotados en bitmaps hex. Con ?version= igual a la actual responde sin consultar nada."""
+    version = version_disponibilidad()
+    if request.GET.get('version') == str(version):
+        return JsonResponse({'status': 'ok', 'cambios': False, 'version': version})
+    return JsonResponse({'status': 'ok', 'cambios': True, **obtener_disponibilidad().para_json()})
+
+def api_buscar_menu(request):
+    """Búsqueda del menú (?q=): índice en memoria, sin consultas (ver pedidos/busqueda.py)."""
+    indice = obtener_indice_busqueda()
+    resultados = indice.buscar(request.GET.get('q', ''))
+    response = JsonResponse({'status': 'ok', 'version': indice.version, 'resultados': resultados})
+    patch_cache_control(response, public=True, max_age=settings.MENU_CACHE_MAX_AGE)
+    return response
+
+@never_cache
+def api_buscar_cliente(request):
+    """
+    Autocompletar del checkout por teléfono completo o por sus primeros
+    dígitos (con límite por IP y por teléfono). El teléfono lo teclea
+    cualquiera: sin más, solo dice si existe y el primer nombre. Apellido y
+    dirección solo si el cliente ya pidió desde este dispositivo (cookie firmada).
+    """
+    demasiadas = JsonResponse({'status': 'error', 'msg': 'Demasiadas búsquedas, intenta más tarde.'}, status=429)
+    if limite_excedido(f"buscar_cliente:{ip_cliente(request)}", settings.CLIENTE_BUSQUEDA_LIMITE, settings.CLIENTE_BUSQUEDA_VENTANA):
+        return demasiadas
+
+    prefijo = prefijo_telefono(request.GET.get('telefono', ''))
+    if not prefijo:
+        return JsonResponse({'status': 'error', 'msg': 'Teléfono inválido'}, status=400)
+    if limite_excedido(f"buscar_cliente:tel:{prefijo}", settings.CLIENTE_BUSQUEDA_POR_TELEFONO, settings.CLIENTE_BUSQUEDA_VENTANA):
+        return demasiadas
+
+    cliente = buscar_cliente_por_prefijo(prefijo)
+    if not cliente:
+        return JsonResponse({'status': 'ok', 'encontrado': False})
+    datos = {'status': 'ok', 'encontrado': True, 'nombre': (cliente.nombre.split() or [''])[0]}
+    if pidio_desde(cliente, dispositivo_del_request(request)):
+        datos.update(nombre=cliente.nombre, apellido=cliente.apellido, direccion=cliente.direccion_ultima or "")
+    return JsonResponse(datos)
+
 def cart_add(request, producto_id):
     if not suscripcion_activa():
         return render(request, 'pedidos/suspendido.html')
@@ -154,17 +261,16 @@ def cart_add(request, producto_id):
     producto = get_object_or_404(Producto, id=producto_id)
     opcion_id = request.POST.get('opcion_id')
     extras_ids = request.POST.getlist('extras') 
+    if not ids_validos(([opcion_id] if opcion_id else []) + extras_ids):
+        messages.error(request, f"No pudimos agregar {producto.nombre}: la opción o los extras no son válidos.")
+        return redirect(request.META.get('HTTP_REFERER', 'menu'))
     
-    key_parts = [str(producto_id)]
-    key_parts.append(str(opcion_id) if opcion_id else "0")
-    if extras_ids:
-        extras_ids.sort()
-        key_parts.append(",".join(extras_ids))
-    else:
-        key_parts.append("0")
+    key = clave_carrito(producto_id, opcion_id, extras_ids)
+    # El menú abierto pudo quedar viejo: el bitmap de agotados decide sin consultas
+    if obtener_disponibilidad().claves_agotadas([key]):
+        messages.error(request, f"Lo sentimos, {producto.nombre} (o algo de lo que elegiste) se acaba de agotar.")
+        return redirect(request.META.get('HTTP_REFERER', 'menu'))
 
-    key = "-".join(key_parts)
-    
     if key in cart:
         cart[key] += 1
     else:
@@ -186,6 +292,30 @@ def cart_add(request, producto_id):
     messages.success(request, f"¡{nombre_mostrar} agregado!")
     return redirect(request.META.get('HTTP_REFERER', 'menu'))
 
+@require_POST
+def repetir_pedido_view(request, pedido_id):
+    """Arma el carrito con las líneas de un pedido anterior de este dispositivo y va directo al checkout."""
+    dispositivo = dispositivo_del_request(request)
+    if dispositivo is None:
+        raise Http404
+    archivado = False
+    if not Pedido.objects.filter(id=pedido_id, dispositivo=dispositivo).exists():
+        if not PedidoArchivado.objects.filter(id=pedido_id, dispositivo=dispositivo).exists():
+            raise Http404
+        archivado = True
+
+    cart, omitidos = carrito_desde_pedido(pedido_id, archivado=archivado)
+    if not cart:
+        messages.error(request, "Ninguno de los productos de ese pedido está disponible hoy.")
+        return redirect('menu')
+
+    request.session['cart'] = cart
+    request.session.modified = True
+    if omitidos:
+        messages.warning(request, "No disponible ahora: " + ", ".join(omitidos))
+    messages.info(request, "Listo, armamos tu pedido de nuevo con los precios de hoy 🔁")
+    return redirect('checkout')
+
 def cart_clear(request):
     request.session['cart'] = {}
     request.session.modified = True
@@ -248,9 +378,12 @@ def checkout_view(request):
     if not suscripcion_activa():
         return render(request, 'pedidos/suspendido.html')
 
-    abierto, mensaje = verificar_estado_negocio()
+    abierto, mensaje, espera_minutos = verificar_admision()
     if not abierto:
-        messages.error(request, f"⛔ El restaurante ha cerrado. {mensaje}")
+        if espera_minutos is None:
+            messages.error(request, f"⛔ El restaurante ha cerrado. {mensaje}")
+        else:
+            messages.warning(request, mensaje)
         return redirect('menu')
     cart = request.session.get('cart', {})
     
@@ -267,28 +400,32 @@ def checkout_view(request):
              messages.error(request, "El carrito está vacío.")
              return redirect('menu')
 
-        if not telefono or len(telefono) < 8:
+        telefono = normalizar_telefono(telefono)
+        if not telefono:
             messages.error(request, "Revisa tu teléfono.")
             return redirect('checkout')
 
+        # Todo el carrito contra los agotados de una vez, antes de escribir nada
+        agotadas = obtener_disponibilidad().claves_agotadas(cart)
+        if agotadas:
+            for clave in agotadas:
+                del cart[clave]
+            request.session['cart'] = cart
+            request.session.modified = True
+            messages.error(request, f"Se agotó algo de tu carrito ({len(agotadas)} producto(s)); lo quitamos. Revisa tu pedido.")
+            return redirect('checkout' if cart else 'menu')
+
+        dispositivo = dispositivo_del_request(request) or nuevo_dispositivo()
         try:
             with transaction.atomic():
-                cliente, created = Cliente.objects.get_or_create(
-                    telefono=telefono,
-                    defaults={'nombre': nombre, 'apellido': apellido, 'direccion_ultima': direccion}
-                )
-                if not created:
-                    cliente.nombre = nombre
-                    cliente.apellido = apellido
-                    cliente.direccion_ultima = direccion
-                    cliente.save()
+                cliente = guardar_cliente(telefono, nombre, apellido, direccion)
 
                 estado_inicial = 'PENDIENTE' if metodo_pago == 'TARJETA' else 'RECIBIDO'
 
                 pedido = Pedido.objects.create(
                     cliente=cliente, direccion_entrega=direccion, metodo_pago=metodo_pago,
                     latitud=lat, longitud=lng, es_pedido_whatsapp=False,
-                    estado=estado_inicial
+                    estado=estado_inicial, dispositivo=dispositivo
                 )
 
                 for key, cantidad in cart.items():
@@ -308,28 +445,19 @@ def checkout_view(request):
                     )
 
                     if extras_str != "0":
-                        ids_ext = extras_str.split(',')
-                        for eid in ids_ext:
-                            extra_obj = Extra.objects.filter(id=eid).first()
-                            if extra_obj:
-                                detalle.extras.add(extra_obj)
-                    detalle.save()
+                        # Un solo add: recalcular_extras_total suma y guarda la línea una vez
+                        detalle.extras.add(*Extra.objects.filter(id__in=extras_str.split(',')))
                 
                 pedido.save()
                 
                 request.session['ultimo_pedido_id'] = pedido.id
-                historial = request.session.get('historial_pedidos', [])
-                if pedido.id not in historial:
-                    historial.append(pedido.id)
-                request.session['historial_pedidos'] = historial
-
                 request.session['cart'] = {}
                 request.session.modified = True
                 
                 if metodo_pago == 'TARJETA':
-                    return redirect('pagar_wompi', pedido_id=pedido.id)
+                    return recordar_dispositivo(redirect('pagar_wompi', pedido_id=pedido.id), dispositivo)
                 else:
-                    return redirect('order_tracker', pedido_id=pedido.id)
+                    return recordar_dispositivo(redirect('order_tracker', pedido_id=pedido.id), dispositivo)
                 
         except Exception as e:
             messages.error(request, f"Error procesando: {e}")
@@ -370,67 +498,55 @@ def checkout_view(request):
     
     context = {
         'items': productos_en_carrito, 'total_productos': total_productos,
-        'total_wompi': float(total_productos) * 1.05,
+        'total_wompi': total_con_comision(total_productos, 'TARJETA'),
+        'espera_minutos': espera_minutos,
         'GOOGLE_MAPS_API_KEY': config('GOOGLE_MAPS_API_KEY', default=''),
     }
     return render(request, 'pedidos/checkout.html', context)
 
 # --- VISTAS DE PAGO WOMPI (CLIENTES PAGANDO PEDIDOS) ---
 
-def pagar_wompi_view(request, pedido_id):
-    pedido = get_object_or_404(Pedido, id=pedido_id)
-    # AQUI DEBERÍAN IR LAS LLAVES DEL CLIENTE (FUTURO)
-    CLIENT_ID = config('WOMPI_APP_ID')
-    CLIENT_SECRET = config('WOMPI_API_SECRET')
-    AUTH_URL = config('WOMPI_AUTH_URL', default='https://id.wompi.sv/connect/token')
-    API_URL = config('WOMPI_API_URL', default='https://api.wompi.sv/EnlacePago')
-
-    headers_seguridad = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'application/json'
-    }
+# Mensaje para el cliente según la fase que falló (ver pasarela.ErrorBanco)
+MENSAJES_BANCO_PEDIDO = {
+    'auth': "Error de comunicación con el Banco (Auth).",
+    'enlace': "El banco rechazó la solicitud de enlace.",
+    'conexion': "Error interno de conexión.",
+}
 
+async def pagar_wompi_view(request, pedido_id):
     try:
-        auth_payload = {
-            'grant_type': 'client_credentials', 'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET, 'audience': 'wompi_api'
-        }
-        auth_response = requests.post(AUTH_URL, data=auth_payload, headers=headers_seguridad)
-        if auth_response.status_code != 200:
-            messages.error(request, "Error de comunicación con el Banco (Auth).")
-            return redirect('menu')
-            
-        access_token = auth_response.json().get('access_token')
-        headers_api = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json',
-            'User-Agent': headers_seguridad['User-Agent']
-        }
-        base_url = request.build_absolute_uri('/')[:-1] 
-        redirect_url = f"{base_url}/wompi-respuesta/?pedido_ref={pedido.id}"
-        
-        payment_payload = {
-            "IdentificadorEnlaceComercio": f"ORDEN-{pedido.id}", # PREFIJO ORDEN IMPORTANTE
-            "Monto": float(pedido.total_final),
-            "NombreProducto": f"FoodBack Pedido #{pedido.id}",
-            "FormaPago": {
-                "PermitirTarjetaCreditoDebito": True, "PermitirTarjetaCreditoDebido": True, "PermitirPagoConPuntoAgricola": True
-            },
-            "Configuracion": {
-                "UrlRedirect": redirect_url, "EsMontoEditable": False, "EsCantidadEditable": False,
-                "EmailsNotificacion": "marlini.aleman2014@gmail.com" 
-            }
+        pedido = await Pedido.objects.aget(id=pedido_id)
+    except Pedido.DoesNotExist:
+        raise Http404
+    base_url = request.build_absolute_uri('/')[:-1]
+    redirect_url = f"{base_url}/wompi-respuesta/?pedido_ref={pedido.id}"
+
+    payment_payload = {
+        "IdentificadorEnlaceComercio": f"ORDEN-{pedido.id}", # PREFIJO ORDEN IMPORTANTE
+        "Monto": float(pedido.total_final),
+        "NombreProducto": f"FoodBack Pedido #{pedido.id}",
+        "FormaPago": {
+            "PermitirTarjetaCreditoDebito": True, "PermitirTarjetaCreditoDebido": True, "PermitirPagoConPuntoAgricola": True
+        },
+        "Configuracion": {
+            "UrlRedirect": redirect_url, "EsMontoEditable": False, "EsCantidadEditable": False,
+            "EmailsNotificacion": "marlini.aleman2014@gmail.com" 
         }
-        link_response = requests.post(API_URL, json=payment_payload, headers=headers_api)
-        if link_response.status_code == 200:
-            data = link_response.json()
-            return redirect(data.get('urlEnlace'))
+    }
+
+    inicio = time.perf_counter()
+    try:
+        url_enlace = await pasarela.crear_enlace_pago(payment_payload)
+    except pasarela.ErrorBanco as e:
+        ERRORES_BANCO_TOTAL.labels('pedido', e.fase).inc()
+        if e.fase == 'conexion':
+            logger.exception("Error de conexión con Wompi", extra={'pedido_id': pedido.id})
         else:
-            messages.error(request, "El banco rechazó la solicitud de enlace.")
-            return redirect('menu')
-    except Exception as e:
-        messages.error(request, "Error interno de conexión.")
+            logger.warning("Wompi rechazó la solicitud", extra={'pedido_id': pedido.id, 'fase': e.fase, 'http_status': e.http_status})
+        messages.error(request, MENSAJES_BANCO_PEDIDO[e.fase])
         return redirect('menu')
+    ENLACE_PAGO_SEGUNDOS.labels('pedido').observe(time.perf_counter() - inicio)
+    return redirect(url_enlace)
 
 def wompi_respuesta_view(request):
     pedido_ref = request.GET.get('pedido_ref')
@@ -441,9 +557,6 @@ def wompi_respuesta_view(request):
     pedido = get_object_or_404(Pedido, id=pedido_ref)
     
     request.session['ultimo_pedido_id'] = pedido.id
-    historial = request.session.get('historial_pedidos', [])
-    if pedido.id not in historial: historial.append(pedido.id)
-    request.session['historial_pedidos'] = historial
 
     if id_transaccion:
         if pedido.estado == 'PENDIENTE':
@@ -510,10 +623,8 @@ def admin_settings_view(request):
         messages.error(request, "⛔ Acceso denegado a Configuración. Suscripción vencida.")
         return redirect('dashboard_admin') 
 
-    DiaEspecial.objects.filter(fecha__lt=date.today()).delete()
-    config_negocio = ConfiguracionNegocio.objects.first()
-    if not config_negocio:
-        config_negocio = ConfiguracionNegocio.objects.create()
+    # Las excepciones pasadas se limpian con 'manage.py limpiar_excepciones' (cron), no en cada GET
+    config_negocio = obtener_configuracion()
 
     if request.method == 'POST':
         tipo_accion = request.POST.get('tipo_accion')
@@ -550,48 +661,30 @@ def admin_settings_view(request):
             messages.success(request, f"Horario para {fecha_str} actualizado ✅")
             return redirect('admin_settings')
 
-    agenda = []
-    hoy = date.today()
-    nombres_dias = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    defaults_globales = [
-        config_negocio.lunes_abierto, config_negocio.martes_abierto, 
-        config_negocio.miercoles_abierto, config_negocio.jueves_abierto, 
-        config_negocio.viernes_abierto, config_negocio.sabado_abierto, 
-        config_negocio.domingo_abierto
-    ]
-
-    for i in range(7):
-        fecha_iter = hoy + timedelta(days=i)
-        idx = fecha_iter.weekday()
-        es_abierto = defaults_globales[idx]
-        h_inicio = config_negocio.hora_apertura
-        h_fin = config_negocio.hora_cierre
-        motivo = ""
-        es_excepcion = False
-        excepcion = DiaEspecial.objects.filter(fecha=fecha_iter).first()
-        id_db = None 
-        if excepcion:
-            es_abierto = excepcion.abierto
-            motivo = excepcion.motivo
-            if excepcion.hora_apertura: h_inicio = excepcion.hora_apertura
-            if excepcion.hora_cierre: h_fin = excepcion.hora_cierre
-            es_excepcion = True
-            id_db = excepcion.id
-
-        agenda.append({
-            'fecha_str': fecha_iter.strftime("%Y-%m-%d"),
-            'nombre_dia': "HOY" if i == 0 else ("MAÑANA" if i == 1 else nombres_dias[idx]),
-            'fecha_fmt': fecha_iter.strftime("%d/%m"),
-            'abierto': es_abierto,
-            'hora_ini': h_inicio,
-            'hora_fin': h_fin,
-            'motivo': motivo,
-            'id_db': id_db, 
-            'es_excepcion': es_excepcion
-        })
+    try:
+        dias = min(max(int(request.GET.get('dias', 7)), 1), 90)
+    except ValueError:
+        dias = 7
+    agenda = construir_agenda(config_negocio, date.today(), dias)
 
     return render(request, 'pedidos/admin_settings.html', {'config': config_negocio, 'agenda': agenda})
 
+@never_cache
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def api_calendario_view(request):
+    """Horario de un mes (?mes=2026-12) para paginar el calendario de Configuración."""
+    try:
+        anio, mes = map(int, request.GET.get('mes', date.today().strftime('%Y-%m')).split('-'))
+        date(anio, mes, 1)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'msg': 'Formato de mes inválido (AAAA-MM)'}, status=400)
+
+    return JsonResponse({
+        'status': 'ok', 'mes': f"{anio:04d}-{mes:02d}",
+        'dias': calendario_mes(obtener_configuracion(), anio, mes),
+    })
+
 @login_required(login_url='login_custom')
 @user_passes_test(es_admin, login_url='login_custom')
 def eliminar_excepcion_view(request, excepcion_id):
@@ -623,35 +716,63 @@ def dashboard_delivery_view(request):
             pedido.repartidor = None
             pedido.save()
         return redirect('dashboard_delivery')
-    return render(request, 'pedidos/dashboard_delivery.html', {'disponibles': disponibles, 'mis_pedidos': mis_pedidos, 'GOOGLE_MAPS_API_KEY': config('GOOGLE_MAPS_API_KEY', default='')})
-
-def obtener_ubicacion_ip(request):
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for: ip = x_forwarded_for.split(',')[0]
-    else: ip = request.META.get('REMOTE_ADDR')
-    if ip == '127.0.0.1': pass 
+    token_gps = telemetria.token_repartidor(request.user, id_negocio_actual()) if settings.TELEMETRIA_ACTIVA else ''
+    return render(request, 'pedidos/dashboard_delivery.html', {'disponibles': disponibles, 'mis_pedidos': mis_pedidos, 'GOOGLE_MAPS_API_KEY': config('GOOGLE_MAPS_API_KEY', default=''),
+                                                               'token_gps': token_gps})
+
+# --- GPS DEL REPARTIDOR (ver telemetria.py) ---
+# Sin sesión ni CSRF: el token firmado dice quién es y la petición no toca la base.
+@csrf_exempt
+@require_POST
+def api_reparto_posicion(request):
+    if not settings.TELEMETRIA_ACTIVA:
+        return JsonResponse({'status': 'error', 'msg': 'GPS desactivado'}, status=404)
     try:
-        with urllib.request.urlopen(f"http://ip-api.com/json/{ip}") as url:
-            data = json.loads(url.read().decode())
-            if data.get('status') == 'success' and data.get('countryCode') == 'SV':
-                return JsonResponse({'status': 'ok', 'lat': data['lat'], 'lng': data['lon'], 'city': data['city']})
-    except: pass
+        datos = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'status': 'error', 'msg': 'JSON inválido'}, status=400)
+    if not isinstance(datos, dict):
+        return JsonResponse({'status': 'error', 'msg': 'JSON inválido'}, status=400)
+    repartidor_id = telemetria.repartidor_del_token(datos.get('token'), id_negocio_actual())
+    if repartidor_id is None:
+        return JsonResponse({'status': 'error', 'msg': 'Token inválido o vencido'}, status=403)
+    recibidos = telemetria.recibir_puntos(id_negocio_actual(), repartidor_id, datos.get('puntos'))
+    return JsonResponse({'status': 'ok', 'recibidos': recibidos}, status=202)
+
+async def obtener_ubicacion_ip(request):
+    ubicacion = await pasarela.ubicacion_ip(ip_cliente(request))
+    if ubicacion:
+        lat, lng, ciudad = ubicacion
+        return JsonResponse({'status': 'ok', 'lat': lat, 'lng': lng, 'city': ciudad})
     return JsonResponse({'status': 'error', 'lat': 13.6929, 'lng': -89.2182})
 
+def posicion_si_es_suyo(request, pedido):
+    """Dónde va el repartidor, solo para quien hizo el pedido (su sesión o su dispositivo) o el staff."""
+    dispositivo = dispositivo_del_request(request)
+    if (request.session.get('ultimo_pedido_id') == pedido.id or (dispositivo and pedido.dispositivo == dispositivo)
+            or es_admin(request.user)):
+        return telemetria.posicion_para_pedido(pedido)
+    return None
+
 def order_tracker_view(request, pedido_id):
     pedido = get_object_or_404(Pedido, id=pedido_id)
-    return render(request, 'pedidos/order_tracker.html', {'pedido': pedido})
+    return render(request, 'pedidos/order_tracker.html', {'pedido': pedido, 'repartidor': posicion_si_es_suyo(request, pedido)})
 
 def api_order_status(request, pedido_id):
     try:
         pedido = Pedido.objects.get(id=pedido_id)
-        return JsonResponse({'status': 'ok', 'estado_codigo': pedido.estado, 'estado_texto': pedido.get_estado_display()})
+        return JsonResponse({'status': 'ok', 'estado_codigo': pedido.estado, 'estado_texto': pedido.get_estado_display(),
+                             'repartidor': posicion_si_es_suyo(request, pedido)})
     except Pedido.DoesNotExist:
+        archivado = PedidoArchivado.objects.filter(id=pedido_id).first()
+        if archivado:
+            return JsonResponse({'status': 'ok', 'estado_codigo': archivado.estado, 'estado_texto': archivado.get_estado_display()})
         return JsonResponse({'status': 'error', 'msg': 'Pedido no encontrado'}, status=404)
 
 @never_cache 
 @login_required(login_url='login_custom')
 @user_passes_test(es_admin, login_url='login_custom')
+@lectura_replica
 def dashboard_metrics_view(request):
     if not suscripcion_activa():
         messages.error(request, "⛔ Acceso denegado a Finanzas. Suscripción vencida.")
@@ -679,7 +800,8 @@ def dashboard_metrics_view(request):
         fechas_grafica.append(f"{nombres_dias[fecha.weekday()]} {fecha.day}")
         montos_grafica.append(float(venta_dia))
 
-    top_productos = DetallePedido.objects.filter(pedido__estado__in=['RECIBIDO', 'COCINA', 'RUTA', 'ENTREGADO']).values('producto__nombre').annotate(total_vendido=Sum('cantidad'), dinero_generado=Sum('subtotal')).order_by('-total_vendido')[:5]
+    # Incluye lo vendido en pedidos ya archivados (archivo.py)
+    top_productos = archivo.top_productos(5)
 
     context = {
         'total_ventas_hoy': total_ventas_hoy, 'dinero_en_caja': dinero_en_caja, 'dinero_banco': dinero_banco,
@@ -689,12 +811,191 @@ def dashboard_metrics_view(request):
     }
     return render(request, 'pedidos/dashboard_metrics.html', context)
 
+@never_cache
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def dashboard_rendimiento_view(request):
+    if request.method == 'POST':
+        instrumentacion.limpiar()
+        messages.info(request, "Muestras borradas 🧹")
+        return redirect('dashboard_rendimiento')
+
+    lista = instrumentacion.muestras()
+    lentas = sorted(lista, key=lambda m: m['ms'], reverse=True)[:20]
+    return render(request, 'pedidos/dashboard_rendimiento.html', {
+        'resumen': instrumentacion.resumen_por_vista(lista),
+        'lentas': lentas,
+        'total_muestras': len(lista),
+        'muestreo': settings.PERFIL_MUESTREO,
+    })
+
+@never_cache
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def dashboard_cocina_view(request):
+    version = version_cocina()
+    return render(request, 'pedidos/dashboard_cocina.html', {
+        'estaciones': tablero_cocina(), 'version': version,
+    })
+
+@never_cache
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def api_cocina_view(request):
+    """Tablero de cocina. Con ?version= igual a la actual responde sin consultar la base."""
+    version = version_cocina()
+    if request.GET.get('version') == str(version):
+        return JsonResponse({'status': 'ok', 'cambios': False, 'version': version})
+    return JsonResponse({'status': 'ok', 'cambios': True, 'version': version, 'estaciones': tablero_cocina()})
+
+# --- MOSTRADOR (PEDIDOS POR TELÉFONO / WHATSAPP) ---
+
+@never_cache
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def mostrador_view(request):
+    return render(request, 'pedidos/mostrador.html')
+
+@never_cache
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def api_mostrador_catalogo(request):
+    """Índice del catálogo para el cajero (?q= busca en el servidor). Con ?version= igual responde sin cambios."""
+    indice = mostrador.obtener_indice_catalogo()
+    disponibilidad = obtener_disponibilidad()
+    if 'q' in request.GET:
+        productos = indice.productos_json(indice.buscar(request.GET['q']), disponibilidad)
+        return JsonResponse({'status': 'ok', 'productos': productos})
+    version = f"{indice.version}.{disponibilidad.version}"
+    if request.GET.get('version') == version:
+        return JsonResponse({'status': 'ok', 'cambios': False, 'version': version})
+    return JsonResponse({'status': 'ok', 'cambios': True, 'version': version, 'catalogo': indice.para_json(disponibilidad)})
+
+@never_cache
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def api_mostrador_cliente(request):
+    """Autocompletar del cajero por teléfono exacto: al staff sí se le dan apellido y dirección, sin límite por IP."""
+    telefono = normalizar_telefono(request.GET.get('telefono', ''))
+    if not telefono:
+        return JsonResponse({'status': 'error', 'msg': 'Teléfono inválido'}, status=400)
+    cliente = buscar_cliente(telefono)
+    if not cliente:
+        return JsonResponse({'status': 'ok', 'encontrado': False, 'telefono': telefono})
+    return JsonResponse({
+        'status': 'ok', 'encontrado': True, 'telefono': telefono,
+        'nombre': cliente.nombre, 'apellido': cliente.apellido, 'direccion': cliente.direccion_ultima or "",
+    })
+
+@require_POST
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def api_mostrador_pedido(request):
+    """Crea el pedido completo a partir de un JSON (ver pedidos/mostrador.py)."""
+    try:
+        datos = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'msg': 'JSON inválido'}, status=400)
+    if not isinstance(datos, dict):
+        return JsonResponse({'status': 'error', 'msg': 'JSON inválido'}, status=400)
+    try:
+        pedido = mostrador.crear_pedido_mostrador(datos, mostrador.obtener_indice_catalogo(), obtener_disponibilidad())
+    except ValidationError as e:
+        return JsonResponse({'status': 'error', 'msg': e.messages[0]}, status=400)
+    return JsonResponse({'status': 'ok', 'pedido_id': pedido.id, 'total': str(pedido.total_final)}, status=201)
+
+@never_cache
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+@lectura_replica
+def exportar_catalogo_view(request):
+    """Descarga el catálogo completo (?formato=json|csv)."""
+    datos = importacion.exportar_catalogo()
+    if request.GET.get('formato') == 'csv':
+        response = HttpResponse(importacion.catalogo_a_csv(datos), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="catalogo.csv"'
+    else:
+        response = HttpResponse(json.dumps(datos, ensure_ascii=False, indent=2), content_type='application/json; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="catalogo.json"'
+    return response
+
+@require_POST
+@login_required(login_url='login_custom')
+@user_passes_test(es_admin, login_url='login_custom')
+def importar_catalogo_view(request):
+    """Sube un catálogo JSON/CSV y aplica solo las diferencias (o las muestra con 'simular')."""
+    archivo = request.FILES.get('archivo')
+    if not archivo:
+        messages.error(request, "Elige un archivo .json o .csv.")
+        return redirect('admin_settings')
+
+    simular = request.POST.get('simular') == 'on'
+    formato = 'csv' if archivo.name.lower().endswith('.csv') else 'json'
+    try:
+        datos = importacion.leer_catalogo(archivo.read().decode('utf-8-sig'), formato)
+        resumen = importacion.importar_catalogo(datos, retirar=request.POST.get('retirar') == 'on', simular=simular)
+    except (UnicodeDecodeError, ValidationError) as e:
+        messages.error(request, f"No se importó nada: {e.messages[0] if isinstance(e, ValidationError) else 'el archivo no es UTF-8'}")
+        return redirect('admin_settings')
+
+    prefijo = "Simulación (nada guardado) — " if simular else "Catálogo importado ✅ "
+    messages.success(request, prefijo + importacion.describir_resumen(resumen))
+    return redirect('admin_settings')
+
+@never_cache
+def metricas_prometheus_view(request):
+    """Métricas en texto Prometheus. Solo desde la misma máquina o con METRICAS_TOKEN."""
+    token = config('METRICAS_TOKEN', default='')
+    autorizado = request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+    if token:
+        autorizado = request.headers.get('Authorization') == f"Bearer {token}"
+    if not autorizado:
+        raise PermissionDenied
+    return HttpResponse(METRICAS.texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@never_cache
+def listo_view(request):
+    """Readiness para el balanceador: 200 cuando el worker ya calentó y la base responde."""
+    if not arranque.estado()['listo']:
+        arranque.calentar()
+    try:
+        connection.ensure_connection()
+        base_ok = True
+    except Exception:
+        base_ok = False
+    estado = arranque.estado()
+    listo = estado['listo'] and base_ok
+    return JsonResponse({'listo': listo, 'base': base_ok, 'calentado_ms': estado['ms']}, status=200 if listo else 503)
+
+@lectura_replica
 def perfil_usuario_view(request):
-    ids_historial = request.session.get('historial_pedidos', [])
-    mis_pedidos = Pedido.objects.filter(id__in=ids_historial).order_by('-id')
-    activos = mis_pedidos.exclude(estado__in=['ENTREGADO', 'CANCELADO'])
-    historial = mis_pedidos.filter(estado__in=['ENTREGADO', 'CANCELADO'])
-    return render(request, 'pedidos/perfil.html', {'activos': activos, 'historial': historial})
+    dispositivo = dispositivo_del_request(request)
+    migrado = False
+    ids_viejos = request.session.get('historial_pedidos') or []
+    if ids_viejos:
+        # Sesiones de antes de la cookie: sus pedidos (solo los de esta sesión) pasan al dispositivo
+        dispositivo = dispositivo or nuevo_dispositivo()
+        Pedido.objects.filter(id__in=ids_viejos, dispositivo="").update(dispositivo=dispositivo)
+        PedidoArchivado.objects.filter(id__in=ids_viejos, dispositivo="").update(dispositivo=dispositivo)
+        migrado = True
+
+    activos, historial, siguiente = [], [], None
+    if dispositivo:
+        try:
+            antes = int(request.GET.get('antes', 0)) or None
+        except ValueError:
+            antes = None
+        if not antes:
+            activos = activos_dispositivo(dispositivo)
+        historial, siguiente = historial_dispositivo(dispositivo, antes)
+
+    response = render(request, 'pedidos/perfil.html', {
+        'activos': activos, 'historial': historial, 'siguiente': siguiente,
+    })
+    if migrado:
+        request.session.pop('historial_pedidos', None)
+        recordar_dispositivo(response, dispositivo)
+    return response
 
 # --- PAGO DE SUSCRIPCIÓN (TU DINERO - EL CLIENTE TE PAGA A TI) ---
 
@@ -702,88 +1003,61 @@ def perfil_usuario_view(request):
 
 # --- PAGO DE SUSCRIPCIÓN (TU DINERO) - CORREGIDO ---
 
-@login_required(login_url='login_custom')
-@user_passes_test(es_admin, login_url='login_custom')
-def pagar_suscripcion_view(request):
+MENSAJES_BANCO_SUSCRIPCION = {
+    'auth': "Error de credenciales con el Banco.",
+    'enlace': "El banco rechazó la solicitud.",
+    'conexion': "Error interno.",
+}
+
+def _es_admin_autenticado(request):
+    return request.user.is_authenticated and es_admin(request.user)
+
+async def pagar_suscripcion_view(request):
+    # login_required/user_passes_test de Django 4.2 no envuelven vistas async: se valida aquí
+    if not await sync_to_async(_es_admin_autenticado)(request):
+        return redirect_to_login(request.get_full_path(), 'login_custom')
+
     # 1. Configuración
     PRECIO_MENSUAL = 50.00 
-    config_negocio = ConfiguracionNegocio.objects.first()
-    
-    import time
+    config_negocio = await ConfiguracionNegocio.objects.afirst()
     ref_suscripcion = f"SUBS-{config_negocio.id}-{int(time.time())}"
 
-    # USAMOS TUS LLAVES DEL .ENV
-    CLIENT_ID = config('WOMPI_APP_ID')
-    CLIENT_SECRET = config('WOMPI_API_SECRET')
-    AUTH_URL = config('WOMPI_AUTH_URL', default='https://id.wompi.sv/connect/token')
-    API_URL = config('WOMPI_API_URL', default='https://api.wompi.sv/EnlacePago')
-
-    headers_seguridad = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'application/json'
+    base_url = request.build_absolute_uri('/')[:-1]
+    redirect_url = f"{base_url}/wompi-suscripcion-respuesta/"
+
+    payment_payload = {
+        "IdentificadorEnlaceComercio": ref_suscripcion,
+        "Monto": PRECIO_MENSUAL,
+        "NombreProducto": "Suscripción Mensual FoodBack Pro",
+        # --- AQUÍ ESTABA EL DETALLE: IGUALAMOS AL DE PEDIDOS ---
+        "FormaPago": {
+            "PermitirTarjetaCreditoDebito": True,
+            "PermitirTarjetaCreditoDebido": True, # Agregado para forzar tarjeta
+            "PermitirPagoConPuntoAgricola": True
+        },
+        # -------------------------------------------------------
+        "Configuracion": {
+            "UrlRedirect": redirect_url,
+            "EsMontoEditable": False,
+            "EsCantidadEditable": False,
+            "EmailsNotificacion": "tu_email@gmail.com" 
+        }
     }
 
+    inicio = time.perf_counter()
     try:
-        # A. Autenticación
-        auth_payload = {
-            'grant_type': 'client_credentials',
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'audience': 'wompi_api'
-        }
-        
-        # print("1. Autenticando...")
-        auth_response = requests.post(AUTH_URL, data=auth_payload, headers=headers_seguridad)
-        
-        if auth_response.status_code != 200:
-            messages.error(request, "Error de credenciales con el Banco.")
-            return redirect('dashboard_admin')
-            
-        access_token = auth_response.json().get('access_token')
-        
-        # B. Crear Enlace
-        headers_api = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        base_url = request.build_absolute_uri('/')[:-1]
-        redirect_url = f"{base_url}/wompi-suscripcion-respuesta/"
-        
-        payment_payload = {
-            "IdentificadorEnlaceComercio": ref_suscripcion,
-            "Monto": PRECIO_MENSUAL,
-            "NombreProducto": "Suscripción Mensual FoodBack Pro",
-            # --- AQUÍ ESTABA EL DETALLE: IGUALAMOS AL DE PEDIDOS ---
-            "FormaPago": {
-                "PermitirTarjetaCreditoDebito": True,
-                "PermitirTarjetaCreditoDebido": True, # Agregado para forzar tarjeta
-                "PermitirPagoConPuntoAgricola": True
-            },
-            # -------------------------------------------------------
-            "Configuracion": {
-                "UrlRedirect": redirect_url,
-                "EsMontoEditable": False,
-                "EsCantidadEditable": False,
-                "EmailsNotificacion": "tu_email@gmail.com" 
-            }
-        }
-
-        # print("2. Solicitando Link...")
-        link_response = requests.post(API_URL, json=payment_payload, headers=headers_api)
-        
-        if link_response.status_code == 200:
-            data = link_response.json()
-            return redirect(data.get('urlEnlace'))
+        url_enlace = await pasarela.crear_enlace_pago(payment_payload)
+    except pasarela.ErrorBanco as e:
+        ERRORES_BANCO_TOTAL.labels('suscripcion', e.fase).inc()
+        if e.fase == 'conexion':
+            logger.exception("Error de conexión con Wompi (suscripción)", extra={'referencia': ref_suscripcion})
         else:
-            # print(link_response.text)
-            messages.error(request, "El banco rechazó la solicitud.")
-            return redirect('dashboard_admin')
-
-    except Exception as e:
-        # print(f"Error: {e}")
-        messages.error(request, "Error interno.")
+            logger.warning("Wompi rechazó la solicitud de suscripción", extra={
+                'referencia': ref_suscripcion, 'fase': e.fase, 'http_status': e.http_status, 'respuesta': e.respuesta})
+        messages.error(request, MENSAJES_BANCO_SUSCRIPCION[e.fase])
         return redirect('dashboard_admin')
+    ENLACE_PAGO_SEGUNDOS.labels('suscripcion').observe(time.perf_counter() - inicio)
+    return redirect(url_enlace)
     
 # --- FUNCIÓN NUCLEAR (API + HASH EXTENDIDO) ---
 
@@ -794,17 +1068,14 @@ def pagar_suscripcion_view(request):
 
 @login_required(login_url='login_custom')
 def wompi_suscripcion_respuesta_view(request):
-    print("\n🚀 --- MODO CONFIANZA ACTIVADO ---")
-    
     # 1. Capturamos los datos básicos
     id_transaccion = request.GET.get('idTransaccion', '').strip()
     id_enlace = request.GET.get('idEnlace', '')
     monto = request.GET.get('monto', '')
     
-    print(f"📥 Datos recibidos de Wompi:")
-    print(f"   - ID Transacción: {id_transaccion}")
-    print(f"   - ID Enlace:      {id_enlace}")
-    print(f"   - Monto:          {monto}")
+    logger.info("Respuesta de Wompi (suscripción)", extra={
+        'id_transaccion': id_transaccion, 'id_enlace': id_enlace, 'monto': monto
+    })
 
     # 2. VALIDACIÓN SIMPLIFICADA
     # Si trae un ID de transacción, asumimos que Wompi hizo su trabajo.
@@ -812,8 +1083,6 @@ def wompi_suscripcion_respuesta_view(request):
     #  pero por ahora necesitamos que esto funcione).
     
     if id_transaccion:
-        print("✅ ID de transacción detectado. Procediendo a activar.")
-        
         # --- ACTIVAR SUSCRIPCIÓN ---
         config_negocio = ConfiguracionNegocio.objects.first()
         if not config_negocio:
@@ -831,11 +1100,13 @@ def wompi_suscripcion_respuesta_view(request):
         
         config_negocio.save()
         
-        print(f"🎉 ¡EXITO! Suscripción renovada hasta: {config_negocio.fecha_vencimiento}")
+        logger.info("Suscripción renovada", extra={
+            'id_transaccion': id_transaccion, 'vence': config_negocio.fecha_vencimiento.isoformat()
+        })
         return render(request, 'pedidos/pago_exitoso_suscripcion.html')
         
     else:
-        print("❌ Error: Wompi no envió ID de transacción.")
+        logger.warning("Wompi no envió ID de transacción (suscripción)", extra={'id_enlace': id_enlace})
         messages.error(request, "Error: No se recibió confirmación del pago.")
         return redirect('dashboard_admin')
 
@@ -849,53 +1120,63 @@ def activar_suscripcion(request):
         config_negocio.fecha_vencimiento += timedelta(days=30)
     config_negocio.save()
     return render(request, 'pedidos/pago_exitoso_suscripcion.html')
+# Sin ruta a propósito: antes de publicarla hay que verificar la firma de Wompi;
+# sin eso cualquiera podría marcar pedidos como pagados o renovar la suscripción.
 @csrf_exempt 
 @never_cache
 def wompi_webhook_view(request):
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            transaccion = data.get('transaccion', {})
-            id_enlace = transaccion.get('identificadorEnlaceComercio') or data.get('identificadorEnlaceComercio')
-            es_aprobada = transaccion.get('esAprobada', False) or data.get('esAprobada', False)
-
-            print(f"📩 WEBHOOK RECIBIDO. Ref: {id_enlace} | Aprobada: {es_aprobada}")
-
-            if es_aprobada and id_enlace:
-                
-                # CASO A: ES PAGO DE SUSCRIPCIÓN (TU DINERO) -> SUBS-
-                if id_enlace.startswith('SUBS-'):
-                    config_negocio = ConfiguracionNegocio.objects.first()
-                    hoy = date.today()
-                    
-                    base_fecha = config_negocio.fecha_vencimiento
-                    if not base_fecha or base_fecha < hoy:
-                        base_fecha = hoy
-                    
-                    nueva_fecha = base_fecha + timedelta(days=30)
-                    config_negocio.fecha_vencimiento = nueva_fecha
-                    config_negocio.save()
-                    print(f"💰 SUSCRIPCIÓN RENOVADA hasta {nueva_fecha}")
-                    return JsonResponse({'status': 'ok', 'msg': 'Suscripcion procesada'})
-
-                # CASO B: ES PAGO DE COMIDA (DINERO DEL CLIENTE) -> ORDEN-
-                elif id_enlace.startswith('ORDEN-'):
-                    try:
-                        pedido_id = int(id_enlace.split('-')[1])
-                        pedido = Pedido.objects.get(id=pedido_id)
-                        
-                        if pedido.estado == 'PENDIENTE':
-                            pedido.estado = 'RECIBIDO'
-                            pedido.save()
-                            print(f"🍔 PEDIDO #{pedido.id} PAGADO Y CONFIRMADO")
-                        return JsonResponse({'status': 'ok', 'msg': 'Pedido procesado'})
-                    except Exception as ex:
-                        print(f"Error procesando orden webhook: {ex}")
-
-            return JsonResponse({'status': 'ok', 'msg': 'Recibido'})
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error'}, status=405)
 
-        except Exception as e:
-            print(f"⚠️ Error Webhook: {e}")
-            return JsonResponse({'status': 'error'}, status=500)
-            
-    return JsonResponse({'status': 'error'}, status=405)
\ No newline at end of file
+    inicio = time.perf_counter()
+    resultado = 'ignorado'
+    try:
+        data = json.loads(request.body)
+        transaccion = data.get('transaccion', {})
+        id_enlace = transaccion.get('identificadorEnlaceComercio') or data.get('identificadorEnlaceComercio')
+        es_aprobada = transaccion.get('esAprobada', False) or data.get('esAprobada', False)
+
+        logger.info("Webhook de Wompi recibido", extra={'referencia': id_enlace, 'aprobada': es_aprobada})
+
+        if es_aprobada and id_enlace:
+
+            # CASO A: ES PAGO DE SUSCRIPCIÓN (TU DINERO) -> SUBS-
+            if id_enlace.startswith('SUBS-'):
+                config_negocio = ConfiguracionNegocio.objects.first()
+                hoy = date.today()
+
+                base_fecha = config_negocio.fecha_vencimiento
+                if not base_fecha or base_fecha < hoy:
+                    base_fecha = hoy
+
+                nueva_fecha = base_fecha + timedelta(days=30)
+                config_negocio.fecha_vencimiento = nueva_fecha
+                config_negocio.save()
+                resultado = 'suscripcion'
+                logger.info("Suscripción renovada por webhook", extra={'referencia': id_enlace, 'vence': nueva_fecha.isoformat()})
+                return JsonResponse({'status': 'ok', 'msg': 'Suscripcion procesada'})
+
+            # CASO B: ES PAGO DE COMIDA (DINERO DEL CLIENTE) -> ORDEN-
+            elif id_enlace.startswith('ORDEN-'):
+                try:
+                    pedido_id = int(id_enlace.split('-')[1])
+                    pedido = Pedido.objects.get(id=pedido_id)
+
+                    if pedido.estado == 'PENDIENTE':
+                        pedido.estado = 'RECIBIDO'
+                        pedido.save()
+                        logger.info("Pedido pagado y confirmado por webhook", extra={'pedido_id': pedido.id})
+                    resultado = 'pedido'
+                    return JsonResponse({'status': 'ok', 'msg': 'Pedido procesado'})
+                except Exception:
+                    resultado = 'error_pedido'
+                    logger.exception("Error procesando orden del webhook", extra={'referencia': id_enlace})
+
+        return JsonResponse({'status': 'ok', 'msg': 'Recibido'})
+
+    except Exception:
+        resultado = 'error'
+        logger.exception("Error en el webhook de Wompi")
+        return JsonResponse({'status': 'error'}, status=500)
+    finally:
+        WEBHOOK_SEGUNDOS.labels(resultado).observe(time.perf_counter() - inicio)